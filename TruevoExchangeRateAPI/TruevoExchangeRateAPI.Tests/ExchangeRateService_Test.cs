@@ -350,6 +350,203 @@ public class ExchangeRateService_Test
         Assert.Equal(Convert.ToDateTime(ratesToImport.HeaderRecord.Date), importedRates[0].ValidityDate);
     }
 
+    [Fact]
+    public async Task CommitImportSessionAsync_Should_Throw_Exception_On_Missing_Batches()
+    {
+        // Arrange
+        await _exchangeRateService.AddImportBatchAsync(new ImportExchangeRatesBatchDto
+        {
+            SessionId = "missing-batches",
+            SequenceNumber = 1,
+            DetailRecords = new List<DetailRecord>()
+        });
+        var commit = new CommitImportSessionDto
+        {
+            SessionId = "missing-batches",
+            BatchCount = 3,
+            HeaderRecord = new HeaderRecord { Date = "2017-10-21 14:00:19" }
+        };
+
+        // Act
+        Task task() => _exchangeRateService.CommitImportSessionAsync(commit);
+
+        // Assert
+        var exception = await Assert.ThrowsAsync<ArgumentException>(task);
+        Assert.Equal("Import session missing-batches is missing batches 0, 2", exception.Message);
+        Assert.Equal(new[] { 1 }, (await _exchangeRateService.GetImportSessionStatusAsync("missing-batches")).ReceivedSequenceNumbers);
+    }
+
+    [Fact]
+    public async Task CommitImportSessionAsync_Should_Import_Exchange_Rates_From_All_Batches()
+    {
+        // Arrange
+        await _exchangeRateService.AddImportBatchAsync(new ImportExchangeRatesBatchDto
+        {
+            SessionId = "all-batches",
+            SequenceNumber = 1,
+            DetailRecords = new List<DetailRecord>()
+            {
+                new DetailRecord
+                {
+                    SourceCurrencyNumber = _exchangeRatesSettingsOptions.BaseCurrencyNumber,
+                    SourceCurrencyExponent = 2,
+                    BuyCurrencyConversionRate = 12.56m,
+                    MidCurrencyConversionRate = 15.56m,
+                    SellCurrencyConversionRate = 17.56m
+                }
+            }
+        });
+        await _exchangeRateService.AddImportBatchAsync(new ImportExchangeRatesBatchDto
+        {
+            SessionId = "all-batches",
+            SequenceNumber = 0,
+            DetailRecords = new List<DetailRecord>()
+            {
+                new DetailRecord
+                {
+                    SourceCurrencyNumber = 840,                 // USD
+                    SourceCurrencyExponent = 2,
+                    BuyCurrencyConversionRate = 1m,
+                    MidCurrencyConversionRate = 1m,
+                    SellCurrencyConversionRate = 1m
+                }
+            }
+        });
+
+        // Act
+        var result = await _exchangeRateService.CommitImportSessionAsync(new CommitImportSessionDto
+        {
+            SessionId = "all-batches",
+            BatchCount = 2,
+            HeaderRecord = new HeaderRecord { Date = "2017-10-21 14:00:19" }
+        });
+
+        // Assert
+        var importedRates = (await _exchangeRateService.GetAllExchangeRatesAsync()).ToList();
+        Assert.Equal(2, importedRates.Count);
+        Assert.Equal("USD", importedRates[0].CurrencyCode);
+        Assert.Equal("EUR", importedRates[1].CurrencyCode);
+        Assert.Equal(2, result.ImportedRates);
+        var status = await _exchangeRateService.GetImportSessionStatusAsync("all-batches");
+        Assert.True(status.Committed);
+        Assert.Equal(new[] { 0, 1 }, status.ReceivedSequenceNumbers);
+    }
+
+    [Fact]
+    public async Task CommitImportSessionAsync_Should_Return_Original_Result_On_Repeated_Commit()
+    {
+        // Arrange
+        await _exchangeRateService.AddImportBatchAsync(new ImportExchangeRatesBatchDto
+        {
+            SessionId = "repeated-commit",
+            SequenceNumber = 0,
+            DetailRecords = new List<DetailRecord>()
+            {
+                new DetailRecord
+                {
+                    SourceCurrencyNumber = _exchangeRatesSettingsOptions.BaseCurrencyNumber,
+                    SourceCurrencyExponent = 2,
+                    BuyCurrencyConversionRate = 12.56m,
+                    MidCurrencyConversionRate = 15.56m,
+                    SellCurrencyConversionRate = 17.56m
+                }
+            }
+        });
+        var commit = new CommitImportSessionDto
+        {
+            SessionId = "repeated-commit",
+            BatchCount = 1,
+            HeaderRecord = new HeaderRecord { Date = "2017-10-21 14:00:19" }
+        };
+        var firstResult = await _exchangeRateService.CommitImportSessionAsync(commit);
+        await _exchangeRateRepository.DeleteAllAsync();
+
+        // Act
+        var repeatedResult = await _exchangeRateService.CommitImportSessionAsync(commit);
+
+        // Assert
+        Assert.Equal(firstResult.ImportedRates, repeatedResult.ImportedRates);
+        Assert.Equal(firstResult.CommittedAt, repeatedResult.CommittedAt);
+        Assert.Empty(await _exchangeRateService.GetAllExchangeRatesAsync());
+    }
+
+    [Fact]
+    public async Task ImportExchangeRatesDeltaAsync_Should_Update_Add_And_Remove_Changed_Exchange_Rates()
+    {
+        // Arrange
+        var baseRecord = new DetailRecord
+        {
+            SourceCurrencyNumber = _exchangeRatesSettingsOptions.BaseCurrencyNumber,
+            SourceCurrencyExponent = 2,
+            BuyCurrencyConversionRate = 12.56m,
+            MidCurrencyConversionRate = 15.56m,
+            SellCurrencyConversionRate = 17.56m
+        };
+        await _exchangeRateService.ImportExchangeRatesAsync(new ImportExchangeRatesDto
+        {
+            HeaderRecord = new HeaderRecord { Date = "2017-10-21 14:00:19" },
+            DetailRecords = new List<DetailRecord>()
+            {
+                new DetailRecord
+                {
+                    SourceCurrencyNumber = 840,                 // USD
+                    SourceCurrencyExponent = 2,
+                    BuyCurrencyConversionRate = 1m,
+                    MidCurrencyConversionRate = 1m,
+                    SellCurrencyConversionRate = 1m
+                },
+                new DetailRecord
+                {
+                    SourceCurrencyNumber = 826,                 // GBP
+                    SourceCurrencyExponent = 2,
+                    BuyCurrencyConversionRate = 2m,
+                    MidCurrencyConversionRate = 2m,
+                    SellCurrencyConversionRate = 2m
+                },
+                baseRecord
+            }
+        });
+        var delta = new ImportExchangeRatesDeltaDto
+        {
+            HeaderRecord = new HeaderRecord { Date = "2017-10-22 14:00:19" },
+            DetailRecords = new List<DetailRecord>()
+            {
+                new DetailRecord
+                {
+                    SourceCurrencyNumber = 840,                 // USD
+                    SourceCurrencyExponent = 2,
+                    BuyCurrencyConversionRate = 4m,
+                    MidCurrencyConversionRate = 4m,
+                    SellCurrencyConversionRate = 4m
+                },
+                new DetailRecord
+                {
+                    SourceCurrencyNumber = 392,                 // JPY
+                    SourceCurrencyExponent = 0,
+                    BuyCurrencyConversionRate = 8m,
+                    MidCurrencyConversionRate = 8m,
+                    SellCurrencyConversionRate = 8m
+                },
+                baseRecord
+            },
+            RemovedCurrencyNumbers = new List<int> { 826 }
+        };
+
+        // Act
+        await _exchangeRateService.ImportExchangeRatesDeltaAsync(delta);
+
+        // Assert
+        var importedRates = (await _exchangeRateService.GetAllExchangeRatesAsync()).ToList();
+        var usdRate = importedRates.Single(x => x.CurrencyCode == "USD");
+        var jpyRate = importedRates.Single(x => x.CurrencyCode == "JPY");
+        Assert.Equal(3, importedRates.Count);
+        Assert.DoesNotContain(importedRates, x => x.CurrencyCode == "GBP");
+        Assert.Equal((1 / 4m) * baseRecord.BuyCurrencyConversionRate, usdRate.MastercardBuyRate);
+        Assert.Equal((1 / 8m) * baseRecord.BuyCurrencyConversionRate, jpyRate.MastercardBuyRate);
+        Assert.Equal(1m, importedRates.Single(x => x.CurrencyCode == "EUR").MastercardBuyRate);
+        Assert.All(importedRates, x => Assert.Equal(Convert.ToDateTime(delta.HeaderRecord.Date), x.ValidityDate));
+    }
+
     [Fact]
     public async Task GetExchangeRateByCurrencyCodeAsync_Should_Return_Correct_Curreny()
     {
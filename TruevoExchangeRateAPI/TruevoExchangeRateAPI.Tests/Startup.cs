@@ -43,6 +43,7 @@ namespace TruevoExchangeRateAPI.Tests
             });
             services.AddScoped(typeof(IRepository<,>), typeof(Repository<,>));
             services.AddTransient<IExchangeRateService, ExchangeRateService>();
+            services.AddScoped<IImportSessionStore, ImportSessionStore>();
         }
     }
 }
@@ -72,5 +72,33 @@ namespace TruevoExchangeRateAPI.Controllers
         {
             await _exchangeRateService.ImportExchangeRatesAsync(importExchangeRatesDto);
         }
+
+
+        [HttpPost("import/delta")]
+        public async Task ImportDelta([FromBody] ImportExchangeRatesDeltaDto importExchangeRatesDeltaDto)
+        {
+            await _exchangeRateService.ImportExchangeRatesDeltaAsync(importExchangeRatesDeltaDto);
+        }
+
+
+        [HttpPost("import/batch")]
+        public async Task ImportBatch([FromBody] ImportExchangeRatesBatchDto importExchangeRatesBatchDto)
+        {
+            await _exchangeRateService.AddImportBatchAsync(importExchangeRatesBatchDto);
+        }
+
+
+        [HttpGet("import/sessions/{sessionId}")]
+        public async Task<ImportSessionStatusDto> GetImportSession(string sessionId)
+        {
+            return await _exchangeRateService.GetImportSessionStatusAsync(sessionId);
+        }
+
+
+        [HttpPost("import/commit")]
+        public async Task<CommitImportSessionResultDto> CommitImport([FromBody] CommitImportSessionDto commitImportSessionDto)
+        {
+            return await _exchangeRateService.CommitImportSessionAsync(commitImportSessionDto);
+        }
     }
 }
\ No newline at end of file
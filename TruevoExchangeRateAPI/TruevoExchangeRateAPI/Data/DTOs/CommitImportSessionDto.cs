@@ -0,0 +1,19 @@
+﻿using System.Text.Json.Serialization;
+
+namespace TruevoExchangeRateAPI.Data.DTOs
+{
+    public class CommitImportSessionDto
+    {
+        [JsonPropertyName("session_id")]
+        public string? SessionId { get; set; }
+
+        [JsonPropertyName("batch_count")]
+        public int BatchCount { get; set; }
+
+        [JsonPropertyName("header")]
+        public HeaderRecord? HeaderRecord { get; set; }
+
+        [JsonPropertyName("trailer")]
+        public TrailerRecord? TrailerRecord { get; set; }
+    }
+}
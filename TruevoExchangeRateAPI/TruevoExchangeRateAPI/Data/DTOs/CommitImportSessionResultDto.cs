@@ -0,0 +1,16 @@
+﻿using System.Text.Json.Serialization;
+
+namespace TruevoExchangeRateAPI.Data.DTOs
+{
+    public class CommitImportSessionResultDto
+    {
+        [JsonPropertyName("session_id")]
+        public string? SessionId { get; set; }
+
+        [JsonPropertyName("imported_rates")]
+        public int ImportedRates { get; set; }
+
+        [JsonPropertyName("committed_at")]
+        public DateTime CommittedAt { get; set; }
+    }
+}
@@ -0,0 +1,16 @@
+﻿using System.Text.Json.Serialization;
+
+namespace TruevoExchangeRateAPI.Data.DTOs
+{
+    public class ImportExchangeRatesBatchDto
+    {
+        [JsonPropertyName("session_id")]
+        public string? SessionId { get; set; }
+
+        [JsonPropertyName("sequence_number")]
+        public int SequenceNumber { get; set; }
+
+        [JsonPropertyName("detail_records")]
+        public IEnumerable<DetailRecord>? DetailRecords { get; set; } = new List<DetailRecord>();
+    }
+}
@@ -0,0 +1,24 @@
+﻿using System.Text.Json.Serialization;
+
+namespace TruevoExchangeRateAPI.Data.DTOs
+{
+    /// <summary>
+    /// Exchange rates which changed since the last import.
+    /// Detail records contain changed and added currencies, and always the base currency,
+    /// whose rate has to be unchanged since the last import.
+    /// </summary>
+    public class ImportExchangeRatesDeltaDto
+    {
+        [JsonPropertyName("header")]
+        public HeaderRecord? HeaderRecord { get; set; }
+
+        [JsonPropertyName("detail_records")]
+        public IEnumerable<DetailRecord>? DetailRecords { get; set; } = new List<DetailRecord>();
+
+        [JsonPropertyName("removed_currency_codes")]
+        public IEnumerable<int>? RemovedCurrencyNumbers { get; set; } = new List<int>();
+
+        [JsonPropertyName("trailer")]
+        public TrailerRecord? TrailerRecord { get; set; }
+    }
+}
@@ -0,0 +1,16 @@
+﻿using System.Text.Json.Serialization;
+
+namespace TruevoExchangeRateAPI.Data.DTOs
+{
+    public class ImportSessionStatusDto
+    {
+        [JsonPropertyName("session_id")]
+        public string? SessionId { get; set; }
+
+        [JsonPropertyName("committed")]
+        public bool Committed { get; set; }
+
+        [JsonPropertyName("received_sequence_numbers")]
+        public IEnumerable<int> ReceivedSequenceNumbers { get; set; } = new List<int>();
+    }
+}
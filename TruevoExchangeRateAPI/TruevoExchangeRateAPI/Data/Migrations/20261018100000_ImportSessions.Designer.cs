@@ -0,0 +1,142 @@
+﻿// <auto-generated />
+using System;
+using Microsoft.EntityFrameworkCore;
+using Microsoft.EntityFrameworkCore.Infrastructure;
+using Microsoft.EntityFrameworkCore.Migrations;
+using Microsoft.EntityFrameworkCore.Storage.ValueConversion;
+using Npgsql.EntityFrameworkCore.PostgreSQL.Metadata;
+using TruevoExchangeRateAPI.Data;
+
+#nullable disable
+
+namespace TruevoExchangeRateAPI.Data.Migrations
+{
+    [DbContext(typeof(TruevoExchangeRateDbContext))]
+    [Migration("20261018100000_ImportSessions")]
+    partial class ImportSessions
+    {
+        protected override void BuildTargetModel(ModelBuilder modelBuilder)
+        {
+#pragma warning disable 612, 618
+            modelBuilder
+                .HasAnnotation("ProductVersion", "6.0.9")
+                .HasAnnotation("Relational:MaxIdentifierLength", 63);
+
+            NpgsqlModelBuilderExtensions.UseIdentityByDefaultColumns(modelBuilder);
+
+            modelBuilder.Entity("TruevoExchangeRateAPI.Data.Models.CommittedImportSession", b =>
+                {
+                    b.Property<int>("Id")
+                        .ValueGeneratedOnAdd()
+                        .HasColumnType("integer");
+
+                    NpgsqlPropertyBuilderExtensions.UseIdentityByDefaultColumn(b.Property<int>("Id"));
+
+                    b.Property<int>("BatchCount")
+                        .HasColumnType("integer");
+
+                    b.Property<DateTime>("CommittedAt")
+                        .HasColumnType("timestamp with time zone");
+
+                    b.Property<int>("ImportedRates")
+                        .HasColumnType("integer");
+
+                    b.Property<string>("SessionId")
+                        .IsRequired()
+                        .HasColumnType("text");
+
+                    b.HasKey("Id");
+
+                    b.HasIndex("CommittedAt");
+
+                    b.HasIndex("SessionId")
+                        .IsUnique();
+
+                    b.ToTable("CommittedImportSessions");
+                });
+
+            modelBuilder.Entity("TruevoExchangeRateAPI.Data.Models.ExchangeRate", b =>
+                {
+                    b.Property<int>("Id")
+                        .ValueGeneratedOnAdd()
+                        .HasColumnType("integer");
+
+                    NpgsqlPropertyBuilderExtensions.UseIdentityByDefaultColumn(b.Property<int>("Id"));
+
+                    b.Property<string>("CurrencyCode")
+                        .IsRequired()
+                        .HasColumnType("text");
+
+                    b.Property<int>("CurrencyExponent")
+                        .HasColumnType("integer");
+
+                    b.Property<int>("CurrencyNumber")
+                        .HasColumnType("integer");
+
+                    b.Property<decimal>("MastercardBuyRate")
+                        .HasColumnType("numeric");
+
+                    b.Property<decimal>("MastercardMidRate")
+                        .HasColumnType("numeric");
+
+                    b.Property<decimal>("MastercardSellRate")
+                        .HasColumnType("numeric");
+
+                    b.Property<decimal>("TruevoBuyRate")
+                        .HasColumnType("numeric");
+
+                    b.Property<decimal>("TruevoMidRate")
+                        .HasColumnType("numeric");
+
+                    b.Property<decimal>("TruevoSellRate")
+                        .HasColumnType("numeric");
+
+                    b.Property<DateTime>("ValidityDate")
+                        .HasColumnType("timestamp with time zone");
+
+                    b.HasKey("Id");
+
+                    b.HasIndex("CurrencyCode")
+                        .IsUnique();
+
+                    b.HasIndex("CurrencyNumber")
+                        .IsUnique();
+
+                    b.ToTable("ExchangeRates");
+                });
+
+            modelBuilder.Entity("TruevoExchangeRateAPI.Data.Models.ImportSessionBatch", b =>
+                {
+                    b.Property<int>("Id")
+                        .ValueGeneratedOnAdd()
+                        .HasColumnType("integer");
+
+                    NpgsqlPropertyBuilderExtensions.UseIdentityByDefaultColumn(b.Property<int>("Id"));
+
+                    b.Property<DateTime>("CreatedAt")
+                        .HasColumnType("timestamp with time zone");
+
+                    b.Property<string>("DetailRecords")
+                        .IsRequired()
+                        .HasColumnType("text");
+
+                    b.Property<int>("SequenceNumber")
+                        .HasColumnType("integer");
+
+                    b.Property<string>("SessionId")
+                        .IsRequired()
+                        .HasColumnType("text");
+
+                    b.HasKey("Id");
+
+                    b.HasIndex("CreatedAt");
+
+                    b.HasIndex("SessionId", "SequenceNumber")
+                        .IsUnique();
+
+                    b.ToTable("ImportSessionBatches");
+                });
+#pragma warning restore 612, 618
+        }
+    }
+}
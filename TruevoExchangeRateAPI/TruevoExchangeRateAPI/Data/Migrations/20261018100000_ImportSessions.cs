@@ -0,0 +1,77 @@
+﻿using System;
+using Microsoft.EntityFrameworkCore.Migrations;
+using Npgsql.EntityFrameworkCore.PostgreSQL.Metadata;
+
+#nullable disable
+
+namespace TruevoExchangeRateAPI.Data.Migrations
+{
+    public partial class ImportSessions : Migration
+    {
+        protected override void Up(MigrationBuilder migrationBuilder)
+        {
+            migrationBuilder.CreateTable(
+                name: "CommittedImportSessions",
+                columns: table => new
+                {
+                    Id = table.Column<int>(type: "integer", nullable: false)
+                        .Annotation("Npgsql:ValueGenerationStrategy", NpgsqlValueGenerationStrategy.IdentityByDefaultColumn),
+                    SessionId = table.Column<string>(type: "text", nullable: false),
+                    BatchCount = table.Column<int>(type: "integer", nullable: false),
+                    ImportedRates = table.Column<int>(type: "integer", nullable: false),
+                    CommittedAt = table.Column<DateTime>(type: "timestamp with time zone", nullable: false)
+                },
+                constraints: table =>
+                {
+                    table.PrimaryKey("PK_CommittedImportSessions", x => x.Id);
+                });
+
+            migrationBuilder.CreateTable(
+                name: "ImportSessionBatches",
+                columns: table => new
+                {
+                    Id = table.Column<int>(type: "integer", nullable: false)
+                        .Annotation("Npgsql:ValueGenerationStrategy", NpgsqlValueGenerationStrategy.IdentityByDefaultColumn),
+                    SessionId = table.Column<string>(type: "text", nullable: false),
+                    SequenceNumber = table.Column<int>(type: "integer", nullable: false),
+                    DetailRecords = table.Column<string>(type: "text", nullable: false),
+                    CreatedAt = table.Column<DateTime>(type: "timestamp with time zone", nullable: false)
+                },
+                constraints: table =>
+                {
+                    table.PrimaryKey("PK_ImportSessionBatches", x => x.Id);
+                });
+
+            migrationBuilder.CreateIndex(
+                name: "IX_CommittedImportSessions_CommittedAt",
+                table: "CommittedImportSessions",
+                column: "CommittedAt");
+
+            migrationBuilder.CreateIndex(
+                name: "IX_CommittedImportSessions_SessionId",
+                table: "CommittedImportSessions",
+                column: "SessionId",
+                unique: true);
+
+            migrationBuilder.CreateIndex(
+                name: "IX_ImportSessionBatches_CreatedAt",
+                table: "ImportSessionBatches",
+                column: "CreatedAt");
+
+            migrationBuilder.CreateIndex(
+                name: "IX_ImportSessionBatches_SessionId_SequenceNumber",
+                table: "ImportSessionBatches",
+                columns: new[] { "SessionId", "SequenceNumber" },
+                unique: true);
+        }
+
+        protected override void Down(MigrationBuilder migrationBuilder)
+        {
+            migrationBuilder.DropTable(
+                name: "CommittedImportSessions");
+
+            migrationBuilder.DropTable(
+                name: "ImportSessionBatches");
+        }
+    }
+}
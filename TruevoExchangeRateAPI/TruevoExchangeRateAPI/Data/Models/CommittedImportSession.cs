@@ -0,0 +1,25 @@
+﻿using Microsoft.EntityFrameworkCore;
+using System.ComponentModel.DataAnnotations;
+
+namespace TruevoExchangeRateAPI.Data.Models
+{
+    /// <summary>
+    /// Import session which is committed, kept so the repeated commit returns the original result.
+    /// </summary>
+    [Index(nameof(SessionId), IsUnique = true)]
+    [Index(nameof(CommittedAt))]
+    public class CommittedImportSession : BaseEntity<int>
+    {
+        [Required]
+        public string? SessionId { get; set; }
+
+        [Required]
+        public int BatchCount { get; set; }
+
+        [Required]
+        public int ImportedRates { get; set; }
+
+        [Required]
+        public DateTime CommittedAt { get; set; }
+    }
+}
@@ -0,0 +1,26 @@
+﻿using Microsoft.EntityFrameworkCore;
+using System.ComponentModel.DataAnnotations;
+
+namespace TruevoExchangeRateAPI.Data.Models
+{
+    /// <summary>
+    /// Batch of detail records received for the import session, which is not committed yet.
+    /// Detail records are stored as JSON, since they are only read back as a whole on commit.
+    /// </summary>
+    [Index(nameof(SessionId), nameof(SequenceNumber), IsUnique = true)]
+    [Index(nameof(CreatedAt))]
+    public class ImportSessionBatch : BaseEntity<int>
+    {
+        [Required]
+        public string? SessionId { get; set; }
+
+        [Required]
+        public int SequenceNumber { get; set; }
+
+        [Required]
+        public string? DetailRecords { get; set; }
+
+        [Required]
+        public DateTime CreatedAt { get; set; }
+    }
+}
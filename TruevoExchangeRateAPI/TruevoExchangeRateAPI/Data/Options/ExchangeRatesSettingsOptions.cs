@@ -8,5 +8,6 @@
         public int BaseCurrencyNumber { get; set; }
         public decimal InitialLoadPercentage { get; set; }
         public int AmountRoundDecimalPlaces { get; set; }
+        public int ImportSessionExpirationHours { get; set; } = 24;
     }
 }
@@ -12,5 +12,6 @@ namespace TruevoExchangeRateAPI.Data.Repository
         Task UpdateAsync(TEntity entity);
         Task DeleteAsync(TKey id);
         Task DeleteAllAsync();
+        Task SaveChangesAsync(IEnumerable<TEntity> entitiesToInsert, IEnumerable<TEntity> entitiesToDelete);
     }
 }
@@ -79,5 +79,12 @@ namespace TruevoExchangeRateAPI.Data.Repository
                 _ = await _context.SaveChangesAsync();
             }
         }
+
+        public async Task SaveChangesAsync(IEnumerable<TEntity> entitiesToInsert, IEnumerable<TEntity> entitiesToDelete)
+        {
+            await _entities.AddRangeAsync(entitiesToInsert);
+            _entities.RemoveRange(entitiesToDelete);
+            _ = await _context.SaveChangesAsync();
+        }
     }
 }
@@ -7,6 +7,10 @@ namespace TruevoExchangeRateAPI.Data
     {
         public DbSet<ExchangeRate> ExchangeRates { get; set; }
 
+        public DbSet<ImportSessionBatch> ImportSessionBatches { get; set; }
+
+        public DbSet<CommittedImportSession> CommittedImportSessions { get; set; }
+
         public TruevoExchangeRateDbContext(DbContextOptions options) : base(options)
         {
         }
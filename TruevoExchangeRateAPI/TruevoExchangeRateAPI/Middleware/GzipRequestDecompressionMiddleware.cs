@@ -0,0 +1,46 @@
+﻿using System.IO.Compression;
+
+namespace TruevoExchangeRateAPI.Middleware
+{
+    public class GzipRequestDecompressionMiddleware
+    {
+        private const string GzipContentEncoding = "gzip";
+
+        private readonly RequestDelegate _next;
+
+        public GzipRequestDecompressionMiddleware(RequestDelegate next)
+        {
+            _next = next;
+        }
+
+        /// <summary>
+        /// Method decompresses request body sent with gzip content encoding,
+        /// so the rest of the pipeline reads the plain request body.
+        /// </summary>
+        /// <param name="context">HTTP context.</param>
+        /// <returns></returns>
+        public async Task InvokeAsync(HttpContext context)
+        {
+            var contentEncoding = context.Request.Headers["Content-Encoding"].ToString();
+            if (!string.Equals(contentEncoding, GzipContentEncoding, StringComparison.OrdinalIgnoreCase))
+            {
+                await _next(context);
+                return;
+            }
+
+            var compressedBody = context.Request.Body;
+            await using var decompressedBody = new GZipStream(compressedBody, CompressionMode.Decompress, leaveOpen: true);
+            context.Request.Body = decompressedBody;
+            context.Request.Headers.Remove("Content-Encoding");
+            context.Request.ContentLength = null;
+            try
+            {
+                await _next(context);
+            }
+            finally
+            {
+                context.Request.Body = compressedBody;
+            }
+        }
+    }
+}
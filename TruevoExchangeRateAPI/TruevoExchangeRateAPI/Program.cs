@@ -5,6 +5,7 @@ using System.Security.Cryptography.X509Certificates;
 using TruevoExchangeRateAPI.Data;
 using TruevoExchangeRateAPI.Data.Options;
 using TruevoExchangeRateAPI.Data.Repository;
+using TruevoExchangeRateAPI.Middleware;
 using TruevoExchangeRateAPI.Services;
 
 namespace TruevoExchangeRateAPI
@@ -19,6 +20,7 @@ namespace TruevoExchangeRateAPI
             builder.Services.AddHealthChecks();
             builder.Services.AddScoped(typeof(IRepository<,>), typeof(Repository<,>));
             builder.Services.AddTransient(typeof(IExchangeRateService), typeof(ExchangeRateService));
+            builder.Services.AddScoped(typeof(IImportSessionStore), typeof(ImportSessionStore));
             builder.Services.AddAutoMapper(typeof(Program).Assembly);
 
             builder.Services.AddControllers();
@@ -45,6 +47,7 @@ namespace TruevoExchangeRateAPI
             app.MapHealthChecks("/healthz");
             
             // Configure the HTTP request pipeline.
+            app.UseMiddleware<GzipRequestDecompressionMiddleware>();
             app.UseRouting();
             app.UseEndpoints(endpoints =>
             {
@@ -13,15 +13,18 @@ namespace TruevoExchangeRateAPI.Services
         private readonly IRepository<ExchangeRate, int> _exchangeRateRepository;
         private readonly ILogger<ExchangeRateService> _logger;
         private readonly ExchangeRatesSettingsOptions _exchangeRatesSettingsOptions;
+        private readonly IImportSessionStore _importSessionStore;
 
         public ExchangeRateService(
             IRepository<ExchangeRate, int> exchangeRateRepository,
             ILogger<ExchangeRateService> logger,
-            IOptions<ExchangeRatesSettingsOptions> exchangeRatesSettingsOptions
+            IOptions<ExchangeRatesSettingsOptions> exchangeRatesSettingsOptions,
+            IImportSessionStore importSessionStore
         ) {
             _exchangeRateRepository = exchangeRateRepository;
             _logger = logger;
             _exchangeRatesSettingsOptions = exchangeRatesSettingsOptions.Value;
+            _importSessionStore = importSessionStore;
         }
 
         /// <summary>
@@ -55,27 +58,10 @@ namespace TruevoExchangeRateAPI.Services
             // could be done with batching, but since there are ~200 currencies, simple one by one insert is performed
             try
             {
+                var validityDate = GetValidityDate(importExchangeRatesDto.HeaderRecord);
                 foreach(var conversionRate in importExchangeRatesDto.DetailRecords)
                 {
-                    var currencyCode = CurrencyCodeNumberConverter.GetCurrencyCode(conversionRate.SourceCurrencyNumber);
-                    var isBaseCurrency = IsBaseCurrency(currencyCode);
-                    var mastercardBuyRate = isBaseCurrency ? 1 : CalculateSourceToTargetExchangeRate(conversionRate.BuyCurrencyConversionRate, baseRate.BuyCurrencyConversionRate);
-                    var nastercardSellRate = isBaseCurrency ? 1 : CalculateSourceToTargetExchangeRate(conversionRate.SellCurrencyConversionRate, baseRate.SellCurrencyConversionRate);
-                    var mastercardMidRate = isBaseCurrency ? 1 : CalculateSourceToTargetExchangeRate(conversionRate.MidCurrencyConversionRate, baseRate.MidCurrencyConversionRate);
-                    var rateToInsert = new ExchangeRate
-                    {
-                        CurrencyNumber = conversionRate.SourceCurrencyNumber,
-                        CurrencyCode = currencyCode,
-                        CurrencyExponent = conversionRate.SourceCurrencyExponent,
-                        MastercardBuyRate = mastercardBuyRate,
-                        TruevoBuyRate = isBaseCurrency ? mastercardBuyRate : ApplyLoadToExchangeRate(mastercardBuyRate, _exchangeRatesSettingsOptions.InitialLoadPercentage, RateType.BUY),
-                        MastercardSellRate = nastercardSellRate,
-                        TruevoSellRate = isBaseCurrency ? nastercardSellRate : ApplyLoadToExchangeRate(nastercardSellRate, _exchangeRatesSettingsOptions.InitialLoadPercentage, RateType.SELL),
-                        MastercardMidRate = mastercardMidRate,
-                        TruevoMidRate = isBaseCurrency ? mastercardMidRate : ApplyLoadToExchangeRate(mastercardMidRate, _exchangeRatesSettingsOptions.InitialLoadPercentage, RateType.BUY),
-                        ValidityDate = DateTime.SpecifyKind(Convert.ToDateTime(importExchangeRatesDto.HeaderRecord.Date), DateTimeKind.Utc)
-                    };
-                    await _exchangeRateRepository.InsertAsync(rateToInsert);
+                    await _exchangeRateRepository.InsertAsync(CreateExchangeRate(conversionRate, baseRate, validityDate));
                 }
             }
             catch(Exception)
@@ -85,6 +71,209 @@ namespace TruevoExchangeRateAPI.Services
             }
         }
 
+        /// <summary>
+        /// Method imports only the exchange rates which changed since the last import.
+        /// Changed rates are updated, added rates are inserted and removed rates are deleted,
+        /// while the validity date is moved forward for all the remaining rates, all in a single save.
+        /// Delta has to contain the base currency, whose rate has to be unchanged since the last import,
+        /// since the rates of all the currencies are stored relative to it.
+        /// </summary>
+        /// <param name="importExchangeRatesDeltaDto">Exchange rates changed since the last import.</param>
+        /// <returns></returns>
+        /// <exception cref="ArgumentException"></exception>
+        public async Task ImportExchangeRatesDeltaAsync(ImportExchangeRatesDeltaDto importExchangeRatesDeltaDto)
+        {
+            var baseRate = importExchangeRatesDeltaDto.DetailRecords?.FirstOrDefault(x => x.SourceCurrencyNumber == _exchangeRatesSettingsOptions.BaseCurrencyNumber);
+            if (baseRate == null)
+            {
+                throw new ArgumentException($"Import exchange rates do not contain data for base currency {_exchangeRatesSettingsOptions.BaseCurrencyCode}");
+            }
+
+            var validityDate = GetValidityDate(importExchangeRatesDeltaDto.HeaderRecord);
+            var existingRates = (await _exchangeRateRepository.GetAllAsync()).ToDictionary(x => x.CurrencyNumber);
+            var ratesToInsert = new List<ExchangeRate>();
+            foreach (var conversionRate in importExchangeRatesDeltaDto.DetailRecords)
+            {
+                var rate = CreateExchangeRate(conversionRate, baseRate, validityDate);
+                if (!existingRates.TryGetValue(rate.CurrencyNumber, out var existingRate))
+                {
+                    ratesToInsert.Add(rate);
+                    continue;
+                }
+
+                existingRate.CurrencyExponent = rate.CurrencyExponent;
+                existingRate.MastercardBuyRate = rate.MastercardBuyRate;
+                existingRate.TruevoBuyRate = rate.TruevoBuyRate;
+                existingRate.MastercardSellRate = rate.MastercardSellRate;
+                existingRate.TruevoSellRate = rate.TruevoSellRate;
+                existingRate.MastercardMidRate = rate.MastercardMidRate;
+                existingRate.TruevoMidRate = rate.TruevoMidRate;
+            }
+
+            var ratesToDelete = (importExchangeRatesDeltaDto.RemovedCurrencyNumbers ?? Enumerable.Empty<int>())
+                .Where(existingRates.ContainsKey)
+                .Select(x => existingRates[x])
+                .ToList();
+            foreach (var existingRate in existingRates.Values.Except(ratesToDelete))
+            {
+                existingRate.ValidityDate = validityDate;
+            }
+            await _exchangeRateRepository.SaveChangesAsync(ratesToInsert, ratesToDelete);
+        }
+
+        /// <summary>
+        /// Method creates the exchange rate to be stored in the database from the imported conversion rate.
+        /// </summary>
+        /// <param name="conversionRate">Imported conversion rate.</param>
+        /// <param name="baseRate">Imported conversion rate of the base currency.</param>
+        /// <param name="validityDate">Validity date of the exchange rate.</param>
+        /// <returns></returns>
+        private ExchangeRate CreateExchangeRate(DetailRecord conversionRate, DetailRecord baseRate, DateTime validityDate)
+        {
+            var currencyCode = CurrencyCodeNumberConverter.GetCurrencyCode(conversionRate.SourceCurrencyNumber);
+            var isBaseCurrency = IsBaseCurrency(currencyCode);
+            var mastercardBuyRate = isBaseCurrency ? 1 : CalculateSourceToTargetExchangeRate(conversionRate.BuyCurrencyConversionRate, baseRate.BuyCurrencyConversionRate);
+            var nastercardSellRate = isBaseCurrency ? 1 : CalculateSourceToTargetExchangeRate(conversionRate.SellCurrencyConversionRate, baseRate.SellCurrencyConversionRate);
+            var mastercardMidRate = isBaseCurrency ? 1 : CalculateSourceToTargetExchangeRate(conversionRate.MidCurrencyConversionRate, baseRate.MidCurrencyConversionRate);
+            return new ExchangeRate
+            {
+                CurrencyNumber = conversionRate.SourceCurrencyNumber,
+                CurrencyCode = currencyCode,
+                CurrencyExponent = conversionRate.SourceCurrencyExponent,
+                MastercardBuyRate = mastercardBuyRate,
+                TruevoBuyRate = isBaseCurrency ? mastercardBuyRate : ApplyLoadToExchangeRate(mastercardBuyRate, _exchangeRatesSettingsOptions.InitialLoadPercentage, RateType.BUY),
+                MastercardSellRate = nastercardSellRate,
+                TruevoSellRate = isBaseCurrency ? nastercardSellRate : ApplyLoadToExchangeRate(nastercardSellRate, _exchangeRatesSettingsOptions.InitialLoadPercentage, RateType.SELL),
+                MastercardMidRate = mastercardMidRate,
+                TruevoMidRate = isBaseCurrency ? mastercardMidRate : ApplyLoadToExchangeRate(mastercardMidRate, _exchangeRatesSettingsOptions.InitialLoadPercentage, RateType.BUY),
+                ValidityDate = validityDate
+            };
+        }
+
+        /// <summary>
+        /// Method returns the validity date of the imported exchange rates from the header record.
+        /// </summary>
+        /// <param name="headerRecord">Header record.</param>
+        /// <returns></returns>
+        private DateTime GetValidityDate(HeaderRecord headerRecord)
+        {
+            return DateTime.SpecifyKind(Convert.ToDateTime(headerRecord.Date), DateTimeKind.Utc);
+        }
+
+        /// <summary>
+        /// Method stores the batch of exchange rates received for the import session.
+        /// Exchange rates are imported once the session is committed.
+        /// Batch of the session which is already committed is ignored.
+        /// </summary>
+        /// <param name="importExchangeRatesBatchDto">Batch of exchange rates.</param>
+        /// <returns></returns>
+        /// <exception cref="ArgumentException"></exception>
+        public async Task AddImportBatchAsync(ImportExchangeRatesBatchDto importExchangeRatesBatchDto)
+        {
+            if (string.IsNullOrWhiteSpace(importExchangeRatesBatchDto.SessionId))
+            {
+                throw new ArgumentException("Import session id is missing");
+            }
+            if (importExchangeRatesBatchDto.SequenceNumber < 0)
+            {
+                throw new ArgumentException("Import batch sequence number can not be negative");
+            }
+
+            if (await _importSessionStore.GetCommittedSessionAsync(importExchangeRatesBatchDto.SessionId) != null)
+            {
+                return;
+            }
+
+            await _importSessionStore.AddBatchAsync(
+                importExchangeRatesBatchDto.SessionId,
+                importExchangeRatesBatchDto.SequenceNumber,
+                importExchangeRatesBatchDto.DetailRecords ?? new List<DetailRecord>()
+            );
+        }
+
+        /// <summary>
+        /// Method returns the sequence numbers of the batches received for the import session,
+        /// so the client can resume the upload by sending only the missing batches.
+        /// All the batches are reported as received for the committed session,
+        /// so the client only repeats the commit.
+        /// </summary>
+        /// <param name="sessionId">Import session id.</param>
+        /// <returns></returns>
+        public async Task<ImportSessionStatusDto> GetImportSessionStatusAsync(string sessionId)
+        {
+            var committedSession = await _importSessionStore.GetCommittedSessionAsync(sessionId);
+            return new ImportSessionStatusDto
+            {
+                SessionId = sessionId,
+                Committed = committedSession != null,
+                ReceivedSequenceNumbers = committedSession != null
+                    ? Enumerable.Range(0, committedSession.BatchCount).ToList()
+                    : await _importSessionStore.GetSequenceNumbersAsync(sessionId)
+            };
+        }
+
+        /// <summary>
+        /// Method imports exchange rates from all the batches of the import session,
+        /// in the order of their sequence numbers, records the session as committed and removes its batches.
+        /// Repeated commit of the committed session does not import again, and returns the original result.
+        /// </summary>
+        /// <param name="commitImportSessionDto">Import session to be committed.</param>
+        /// <returns></returns>
+        /// <exception cref="ArgumentException"></exception>
+        public async Task<CommitImportSessionResultDto> CommitImportSessionAsync(CommitImportSessionDto commitImportSessionDto)
+        {
+            if (string.IsNullOrWhiteSpace(commitImportSessionDto.SessionId))
+            {
+                throw new ArgumentException("Import session id is missing");
+            }
+
+            var committedSession = await _importSessionStore.GetCommittedSessionAsync(commitImportSessionDto.SessionId);
+            if (committedSession != null)
+            {
+                return CreateCommitImportSessionResult(committedSession);
+            }
+
+            var batches = await _importSessionStore.GetBatchesAsync(commitImportSessionDto.SessionId);
+            var missingSequenceNumbers = Enumerable.Range(0, commitImportSessionDto.BatchCount).Where(x => !batches.ContainsKey(x)).ToList();
+            if (missingSequenceNumbers.Any())
+            {
+                throw new ArgumentException($"Import session {commitImportSessionDto.SessionId} is missing batches {string.Join(", ", missingSequenceNumbers)}");
+            }
+
+            var detailRecords = Enumerable.Range(0, commitImportSessionDto.BatchCount).SelectMany(x => batches[x]).ToList();
+            await ImportExchangeRatesAsync(new ImportExchangeRatesDto
+            {
+                HeaderRecord = commitImportSessionDto.HeaderRecord,
+                DetailRecords = detailRecords,
+                TrailerRecord = commitImportSessionDto.TrailerRecord
+            });
+
+            committedSession = new CommittedImportSession
+            {
+                SessionId = commitImportSessionDto.SessionId,
+                BatchCount = commitImportSessionDto.BatchCount,
+                ImportedRates = detailRecords.Count,
+                CommittedAt = DateTime.UtcNow
+            };
+            await _importSessionStore.CommitSessionAsync(committedSession);
+            return CreateCommitImportSessionResult(committedSession);
+        }
+
+        /// <summary>
+        /// Method creates the result of the import session commit from the committed session.
+        /// </summary>
+        /// <param name="committedSession">Committed import session.</param>
+        /// <returns></returns>
+        private CommitImportSessionResultDto CreateCommitImportSessionResult(CommittedImportSession committedSession)
+        {
+            return new CommitImportSessionResultDto
+            {
+                SessionId = committedSession.SessionId,
+                ImportedRates = committedSession.ImportedRates,
+                CommittedAt = committedSession.CommittedAt
+            };
+        }
+
         /// <summary>
         /// Method checks if the provided currency is the base currency.
         /// </summary>
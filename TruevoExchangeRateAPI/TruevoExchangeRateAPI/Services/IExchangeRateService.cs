@@ -7,6 +7,14 @@ namespace TruevoExchangeRateAPI.Services
     {
         Task ImportExchangeRatesAsync(ImportExchangeRatesDto importExchangeRatesDto);
 
+        Task ImportExchangeRatesDeltaAsync(ImportExchangeRatesDeltaDto importExchangeRatesDeltaDto);
+
+        Task AddImportBatchAsync(ImportExchangeRatesBatchDto importExchangeRatesBatchDto);
+
+        Task<ImportSessionStatusDto> GetImportSessionStatusAsync(string sessionId);
+
+        Task<CommitImportSessionResultDto> CommitImportSessionAsync(CommitImportSessionDto commitImportSessionDto);
+
         Task<IEnumerable<ExchangeRate>> GetAllExchangeRatesAsync();
 
         Task<ConvertRateResponseDto> ConvertRateAsync(ConvertRateRequestDto convertRateRequest);
@@ -0,0 +1,18 @@
+﻿using TruevoExchangeRateAPI.Data.DTOs;
+using TruevoExchangeRateAPI.Data.Models;
+
+namespace TruevoExchangeRateAPI.Services
+{
+    public interface IImportSessionStore
+    {
+        Task AddBatchAsync(string sessionId, int sequenceNumber, IEnumerable<DetailRecord> detailRecords);
+
+        Task<IEnumerable<int>> GetSequenceNumbersAsync(string sessionId);
+
+        Task<IReadOnlyDictionary<int, IEnumerable<DetailRecord>>> GetBatchesAsync(string sessionId);
+
+        Task<CommittedImportSession?> GetCommittedSessionAsync(string sessionId);
+
+        Task CommitSessionAsync(CommittedImportSession committedSession);
+    }
+}
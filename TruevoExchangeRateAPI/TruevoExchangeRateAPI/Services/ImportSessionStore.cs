@@ -0,0 +1,113 @@
+﻿using Microsoft.EntityFrameworkCore;
+using Microsoft.Extensions.Options;
+using System.Text.Json;
+using TruevoExchangeRateAPI.Data;
+using TruevoExchangeRateAPI.Data.DTOs;
+using TruevoExchangeRateAPI.Data.Models;
+using TruevoExchangeRateAPI.Data.Options;
+
+namespace TruevoExchangeRateAPI.Services
+{
+    /// <summary>
+    /// Database store of the batches received for import sessions, and of the committed sessions.
+    /// Sessions are shared by all the instances of the API and survive their restarts.
+    /// Batches and committed sessions older than the configured expiration are removed
+    /// whenever a batch is stored, so abandoned sessions do not accumulate.
+    /// </summary>
+    public class ImportSessionStore : IImportSessionStore
+    {
+        private readonly TruevoExchangeRateDbContext _context;
+        private readonly ExchangeRatesSettingsOptions _exchangeRatesSettingsOptions;
+
+        public ImportSessionStore(
+            TruevoExchangeRateDbContext context,
+            IOptions<ExchangeRatesSettingsOptions> exchangeRatesSettingsOptions
+        ) {
+            _context = context;
+            _exchangeRatesSettingsOptions = exchangeRatesSettingsOptions.Value;
+        }
+
+        /// <summary>
+        /// Method stores the batch of the import session, and removes expired batches and sessions.
+        /// Batch received again under the same sequence number replaces the previous one.
+        /// </summary>
+        /// <param name="sessionId">Import session id.</param>
+        /// <param name="sequenceNumber">Batch sequence number.</param>
+        /// <param name="detailRecords">Detail records of the batch.</param>
+        /// <returns></returns>
+        public async Task AddBatchAsync(string sessionId, int sequenceNumber, IEnumerable<DetailRecord> detailRecords)
+        {
+            var batch = await _context.ImportSessionBatches
+                .SingleOrDefaultAsync(x => x.SessionId == sessionId && x.SequenceNumber == sequenceNumber);
+            if (batch == null)
+            {
+                batch = new ImportSessionBatch { SessionId = sessionId, SequenceNumber = sequenceNumber };
+                await _context.ImportSessionBatches.AddAsync(batch);
+            }
+            batch.DetailRecords = JsonSerializer.Serialize(detailRecords);
+            batch.CreatedAt = DateTime.UtcNow;
+
+            var expiredBefore = DateTime.UtcNow.AddHours(-_exchangeRatesSettingsOptions.ImportSessionExpirationHours);
+            _context.ImportSessionBatches.RemoveRange(
+                await _context.ImportSessionBatches.Where(x => x.CreatedAt < expiredBefore).ToListAsync()
+            );
+            _context.CommittedImportSessions.RemoveRange(
+                await _context.CommittedImportSessions.Where(x => x.CommittedAt < expiredBefore).ToListAsync()
+            );
+            _ = await _context.SaveChangesAsync();
+        }
+
+        /// <summary>
+        /// Method returns the sequence numbers of the batches received for the import session.
+        /// </summary>
+        /// <param name="sessionId">Import session id.</param>
+        /// <returns></returns>
+        public async Task<IEnumerable<int>> GetSequenceNumbersAsync(string sessionId)
+        {
+            return await _context.ImportSessionBatches
+                .Where(x => x.SessionId == sessionId)
+                .Select(x => x.SequenceNumber)
+                .OrderBy(x => x)
+                .ToListAsync();
+        }
+
+        /// <summary>
+        /// Method returns the batches received for the import session by their sequence number.
+        /// </summary>
+        /// <param name="sessionId">Import session id.</param>
+        /// <returns></returns>
+        public async Task<IReadOnlyDictionary<int, IEnumerable<DetailRecord>>> GetBatchesAsync(string sessionId)
+        {
+            return await _context.ImportSessionBatches
+                .Where(x => x.SessionId == sessionId)
+                .ToDictionaryAsync(
+                    x => x.SequenceNumber,
+                    x => (IEnumerable<DetailRecord>)(JsonSerializer.Deserialize<List<DetailRecord>>(x.DetailRecords!) ?? new List<DetailRecord>())
+                );
+        }
+
+        /// <summary>
+        /// Method returns the committed import session.
+        /// </summary>
+        /// <param name="sessionId">Import session id.</param>
+        /// <returns>Committed import session, or null if the session is not committed.</returns>
+        public Task<CommittedImportSession?> GetCommittedSessionAsync(string sessionId)
+        {
+            return _context.CommittedImportSessions.SingleOrDefaultAsync(x => x.SessionId == sessionId);
+        }
+
+        /// <summary>
+        /// Method records the import session as committed and removes all its batches, in a single save.
+        /// </summary>
+        /// <param name="committedSession">Committed import session.</param>
+        /// <returns></returns>
+        public async Task CommitSessionAsync(CommittedImportSession committedSession)
+        {
+            await _context.CommittedImportSessions.AddAsync(committedSession);
+            _context.ImportSessionBatches.RemoveRange(
+                await _context.ImportSessionBatches.Where(x => x.SessionId == committedSession.SessionId).ToListAsync()
+            );
+            _ = await _context.SaveChangesAsync();
+        }
+    }
+}
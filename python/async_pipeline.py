@@ -0,0 +1,134 @@
+import asyncio
+import logging
+
+import buffer_parser
+import conversion_constants as cc
+from instrumentation import get_run_metrics
+
+logger = logging.getLogger()
+
+
+async def import_files_async(
+    discovered_files: list,
+    read_file_content,
+    parse_file_content,
+    import_file,
+    queue_size: int = cc.PIPELINE_QUEUE_SIZE,
+) -> tuple:
+    """
+    Function that imports exchange rates files in a pipeline of download, parse and import stages,
+    so downloading the next file, parsing the current one and importing the previous one overlap.
+    Stages are connected by bounded queues, so the download runs at most queue_size files
+    ahead of the parse, and the parse at most queue_size files ahead of the import.
+    Files are imported in the given order. Blocking S3, parse and API calls
+    are run in threads, so the event loop only coordinates the stages.
+    Error of any stage fails only the file it occurred on, which is counted
+    in files_failed metric, and the pipeline continues with the next file.
+    Files are downloaded, parsed and imported by the given functions.
+    Pipeline is used for backfill only, see lambda_function.import_files_in_pipeline.
+    Files arrived with the event are already downloaded and parsed concurrently while the earlier ones are imported,
+    and their import also skips already imported content and reports failed files
+    back to the event source, see lambda_function.import_event_files.
+    Arguments:
+        discovered_files: DiscoveredFiles, in the order of import.
+        read_file_content: Function that downloads the whole content of the file of the given name.
+        parse_file_content: Function that parses the whole file content into RequestModel.
+        import_file: Function that imports the DiscoveredFile and RequestModel containing
+            data from the file, and returns True if the exchange rates are imported.
+        queue_size: Maximum number of files waiting between two stages.
+    Return: Tuple of list of imported DiscoveredFiles and number of their detail records.
+    """
+
+    downloaded = asyncio.Queue(maxsize=queue_size)
+    parsed = asyncio.Queue(maxsize=queue_size)
+    _, _, imported = await asyncio.gather(
+        download_files(discovered_files, read_file_content, downloaded),
+        parse_files(downloaded, parse_file_content, parsed),
+        import_files(parsed, import_file),
+    )
+    return imported
+
+
+async def download_files(
+    discovered_files: list, read_file_content, downloaded: asyncio.Queue
+):
+    """
+    Function that downloads the files, and puts their content to the queue.
+    Content is None for the files which can not be read.
+    Queue is ended with None.
+    Arguments:
+        discovered_files: DiscoveredFiles.
+        read_file_content: Function that downloads the whole content of the file of the given name.
+        downloaded: Queue of tuples of DiscoveredFile and its content.
+    """
+
+    for discovered_file in discovered_files:
+        try:
+            content = await asyncio.to_thread(read_file_content, discovered_file.key)
+        except Exception:
+            logger.exception(f"Error reading {discovered_file.key}")
+            content = None
+        await downloaded.put((discovered_file, content))
+    await downloaded.put(None)
+
+
+async def parse_files(
+    downloaded: asyncio.Queue, parse_file_content, parsed: asyncio.Queue
+):
+    """
+    Function that parses the downloaded files, and puts the parsed data to the queue.
+    Queue is ended with None.
+    Arguments:
+        downloaded: Queue of tuples of DiscoveredFile and its content.
+        parse_file_content: Function that parses the whole file content into RequestModel.
+        parsed: Queue of tuples of DiscoveredFile and RequestModel containing data from the file.
+    """
+
+    while (item := await downloaded.get()) is not None:
+        discovered_file, content = item
+        if content is None:
+            data = buffer_parser.log_error_and_return(
+                f"Error reading {discovered_file.key}"
+            )
+        else:
+            try:
+                data = await asyncio.to_thread(parse_file_content, content)
+            except Exception:
+                logger.exception(f"Error parsing {discovered_file.key}")
+                data = buffer_parser.log_error_and_return(
+                    f"Error parsing {discovered_file.key}"
+                )
+        await parsed.put((discovered_file, data))
+    await parsed.put(None)
+
+
+async def import_files(parsed: asyncio.Queue, import_file) -> tuple:
+    """
+    Function that imports the parsed files to the API, in the order of the queue.
+    Files which fail to parse or import are counted in files_failed metric.
+    Arguments:
+        parsed: Queue of tuples of DiscoveredFile and RequestModel containing data from the file.
+        import_file: Function that imports the DiscoveredFile and RequestModel containing
+            data from the file, and returns True if the exchange rates are imported.
+    Return: Tuple of list of imported DiscoveredFiles and number of their detail records.
+    """
+
+    imported_files = []
+    records = 0
+    while (item := await parsed.get()) is not None:
+        discovered_file, data = item
+        try:
+            imported = await asyncio.to_thread(import_file, discovered_file, data)
+        except Exception:
+            logger.exception(f"Error importing {discovered_file.key}")
+            get_run_metrics().count("files_failed")
+            imported = False
+        if imported:
+            logger.info(
+                f"Exchange rates from {discovered_file.key} imported successfully"
+            )
+            imported_files.append(discovered_file)
+            records += len(data.detail_records)
+        else:
+            logger.error(f"Skipping {discovered_file.key} because of the error")
+    return imported_files, records
@@ -0,0 +1,230 @@
+import mmap
+
+import numpy as np
+
+import buffer_parser
+import conversion_constants as cc
+from models import DetailRecordModel, RequestModel
+from parallel_parser import find_last_line, read_first_line
+from record_filter import FILTER_RULE_FIELDS, get_record_filter
+from record_layouts import (
+    RecordLayout,
+    convert_exchange_rate,
+    convert_exchange_rate_to_fixed_point,
+    get_record_layouts,
+)
+from runtime import get_runtime_context
+
+ZERO_CHARACTER = ord("0")
+LINE_END_CHARACTER = ord("\n")
+
+
+def process_local_file_batch(file_path: str) -> RequestModel:
+    """
+    Function processes the local file into RequestModel, decoding its memory-mapped content
+    all at once, see process_buffer_batch.
+    Arguments:
+        file_path: Path of the local file.
+    Return: RequestModel containing data from the file.
+    """
+
+    with open(file_path, mode="rb") as file:
+        # empty file can not be memory-mapped
+        if not file.seek(0, 2):
+            return buffer_parser.process_buffer(b"")
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            return process_buffer_batch(buffer)
+
+
+def process_buffer_batch(buffer) -> RequestModel:
+    """
+    Function processes the whole file content into RequestModel, decoding the detail block
+    all at once. Detail block is loaded into fixed-width byte array, one row per line,
+    and every field is decoded for all the lines with column arithmetic, instead of line by line.
+    Filter rules are applied to the decoded columns as boolean masks.
+    Content which is not a well-formed file of fixed-width detail record lines,
+    including any file with improper format, is parsed by buffer_parser,
+    so the result and the reported errors are the same as the ones of process_buffer.
+    Arguments:
+        buffer: File content as bytes, such as downloaded S3 body, or memory-mapped file.
+    Return: RequestModel containing data from the file content.
+    """
+
+    data = decode_buffer(buffer)
+    if data is None:
+        return buffer_parser.process_buffer(buffer)
+    if data.error:
+        return buffer_parser.log_error_and_return(data.error)
+    return data
+
+
+def decode_buffer(buffer) -> RequestModel:
+    """
+    Function that decodes the well-formed file content into RequestModel.
+    Arguments:
+        buffer: File content as bytes, or memory-mapped file.
+    Return: RequestModel containing data from the file content, with the error set
+        if the trailer does not match the detail records, or None if the content
+        is not a well-formed file of fixed-width detail record lines.
+    """
+
+    header_line, header_line_number, detail_start = read_first_line(buffer)
+    trailer_start, trailer_end = find_last_line(buffer, detail_start)
+    if (
+        header_line is None
+        or not header_line.startswith(cc.HEADER_DESCRIPTION)
+        or trailer_start == trailer_end
+        or buffer[trailer_start] != buffer_parser.TRAILER_CODE
+    ):
+        return None
+
+    layouts = get_record_layouts(
+        buffer_parser.get_header_format_version(header_line)
+    ) or get_record_layouts(cc.HEADER_FORMAT_VERSION)
+    layout = buffer_parser.get_detail_record_layout(layouts)
+    characters = get_detail_characters(
+        buffer[detail_start:trailer_start], layout.length
+    )
+    if characters is None:
+        return None
+    decoded = decode_detail_characters(characters, layout)
+    if decoded is None:
+        return None
+
+    columns, hash_total_values = decoded
+    ret = RequestModel(
+        header=buffer_parser.convert_file_line_to_header(header_line),
+        detail_records=(),
+        trailer=None,
+        error=None,
+    )
+    buffer_parser.validate_trailer(
+        ret,
+        buffer[trailer_start:trailer_end].decode("utf-8"),
+        header_line_number + len(characters) + 1,
+        layouts.trailer,
+        len(characters),
+        # summed as Python integers, since the sum of many rates does not fit into int64
+        sum(hash_total_values.tolist()),
+    )
+    if ret.error:
+        return ret
+
+    record_filter = get_record_filter(
+        get_runtime_context().config.record_filter_rules, layout
+    )
+    allowed = allowed_detail_records_mask(columns, layout, record_filter)
+    ret.detail_records = tuple(
+        map(
+            DetailRecordModel,
+            *(
+                (
+                    column[allowed].astype(str).tolist()
+                    if column.dtype.kind == "S"
+                    else column[allowed].tolist()
+                )
+                for column in columns
+            ),
+        )
+    )
+    return ret
+
+
+def get_detail_characters(detail_block: bytes, length: int):
+    """
+    Function that loads the detail block into fixed-width byte array, one row per line.
+    Arguments:
+        detail_block: Content between the header and the trailer line.
+        length: Length of the detail record layout.
+    Return: Two-dimensional array of the line characters, including the line end,
+        or None if the lines are not of the same width, or not all of them are detail records.
+    """
+
+    width = detail_block.find(b"\n") + 1
+    if width <= length or len(detail_block) % width:
+        return None
+    characters = np.frombuffer(detail_block, dtype=np.uint8).reshape(-1, width)
+    if (characters[:, -1] != LINE_END_CHARACTER).any() or (
+        characters[:, 0] != buffer_parser.DETAIL_CODE
+    ).any():
+        return None
+    return characters
+
+
+def decode_detail_characters(characters, layout: RecordLayout):
+    """
+    Function that decodes every field of the detail record lines all at once,
+    by the converter of the field in the layout.
+    Arguments:
+        characters: Array of the line characters, one row per line.
+        layout: Detail record layout.
+    Return: Tuple of list of field columns in the order of DetailRecordModel attributes,
+        and column of hash total field values, or None if any field of any line
+        can not be decoded, or the layout has a converter which is not supported.
+    """
+
+    columns = []
+    hash_total_values = None
+    for name, start, end, converter in layout.fields:
+        field = characters[:, start : end + 1]
+        if converter is str:
+            # bytes are decoded as ASCII by NumPy
+            if (field > 127).any():
+                return None
+            columns.append(field.copy().view(f"S{end - start + 1}").reshape(-1))
+            continue
+        if converter not in (
+            int,
+            convert_exchange_rate,
+            convert_exchange_rate_to_fixed_point,
+        ):
+            return None
+        values = decode_number_field(field)
+        if values is None:
+            return None
+        if name == cc.HASH_TOTAL_FIELD_NAME:
+            hash_total_values = values
+        if converter is convert_exchange_rate:
+            values = values / cc.EXCHANGE_RATE_SCALE
+        columns.append(values)
+    if hash_total_values is None:
+        return None
+    return columns, hash_total_values
+
+
+def decode_number_field(field):
+    """
+    Function that decodes number field of all the lines at once.
+    Arguments:
+        field: Array of field characters, one row per line.
+    Return: Array of field values, or None if the field of any line is not a number.
+    """
+
+    digits = field.astype(np.int64) - ZERO_CHARACTER
+    if ((digits < 0) | (digits > 9)).any():
+        return None
+    return digits @ (10 ** np.arange(field.shape[1] - 1, -1, -1, dtype=np.int64))
+
+
+def allowed_detail_records_mask(columns: list, layout: RecordLayout, record_filter):
+    """
+    Function that checks which detail records are allowed to be sent to API,
+    using the same rules as RecordFilter, but for all records at once.
+    Rejected records are counted in the record filter by the first rule which rejects them.
+    Arguments:
+        columns: List of decoded field columns, in the order of the layout fields.
+        layout: Detail record layout.
+        record_filter: RecordFilter of the layout.
+    Return: Boolean array which is True for allowed detail records.
+    """
+
+    allowed = np.ones(len(columns[0]), dtype=bool)
+    for rule, values, _, converter, allowed_values in record_filter.rule_fields:
+        column = columns[layout.field_names.index(FILTER_RULE_FIELDS[rule][0])]
+        if converter is str:
+            values = [value.encode("utf-8") for value in values]
+        rejected = allowed & (np.isin(column, list(values)) != allowed_values)
+        if rejected.any():
+            record_filter.rejected[rule] += int(rejected.sum())
+            allowed &= ~rejected
+    return allowed
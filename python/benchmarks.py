@@ -0,0 +1,946 @@
+import argparse
+import io
+import json
+import logging
+import os
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import timeit
+import tracemalloc
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import jsonpickle
+from botocore.response import StreamingBody
+
+import conversion_constants as cc
+import buffer_parser
+import lambda_function
+import runtime
+from file_discovery import DiscoveredFile
+from models import DetailRecordModel
+from record_filter import get_record_filter
+from record_layouts import convert_exchange_rate, get_record_layouts
+from runtime import get_runtime_context
+
+SAMPLE_FILE_NAME = "I_171021_T057.sw0"
+SAMPLE_FILE_REPEAT = 100
+# sample file has 222 detail records, so the repeated file has about 100k lines
+HASH_TOTAL_SAMPLE_FILE_REPEAT = 451
+BENCHMARK_REPEAT = 5
+PIPELINE_FILES = 8
+# latencies of the stand-ins, in seconds, close to the ones of S3 and the API in the same region
+S3_STAND_IN_LATENCY = 0.05
+API_STAND_IN_LATENCY = 0.05
+# synthetic files are padded to the line length of the sample file
+SYNTHETIC_LINE_LENGTH = 125
+SYNTHETIC_HEADER_DATE = "20171021140019"
+SYNTHETIC_FILE_RECORDS = 100000
+# share of the synthetic detail records quoted against USD, which are allowed by the default filter
+SYNTHETIC_ALLOWED_SHARE = 0.7
+BASELINE_FILE_NAME = "benchmark_baseline.json"
+# records per second of a stage may drop by this share of the baseline before it is a regression
+REGRESSION_TOLERANCE = 0.2
+# exit code of the suite which is not compared, since there is no baseline measured on the same file
+NOT_COMPARED_EXIT_CODE = 2
+# detail record conversion by the record layout may be slower by this share
+# than the conversion with the field positions written out, which it replaced
+RECORD_LAYOUT_TOLERANCE = 0.1
+
+
+def read_sample_file_lines(repeat: int = SAMPLE_FILE_REPEAT):
+    """
+    Function that reads sample exchange rates file, and repeats its detail records.
+    Arguments:
+        repeat: How many times detail records are repeated.
+    Return: File lines, with trailer total records and hash total matching repeated detail records.
+    """
+
+    with open(cc.CURRENCY_RATES_FILE_PATH + SAMPLE_FILE_NAME, mode="rt") as file:
+        file_lines = [line.strip() for line in file if line.strip()]
+    detail_lines = file_lines[1:-1] * repeat
+    return [file_lines[0], *detail_lines, create_trailer_line(detail_lines)]
+
+
+def generate_sample_file_lines(records: int, seed: int = 0):
+    """
+    Function that generates valid exchange rates file with the number of synthetic detail records.
+    Same records and seed always generate the same file. Source currencies, exponents
+    and rates are random, and SYNTHETIC_ALLOWED_SHARE of the detail records are quoted
+    against USD as the sample file's ones allowed by the default filter rules,
+    while the others are quoted against EUR.
+    Arguments:
+        records: Number of detail records.
+        seed: Seed of the random generator.
+    Return: File lines, with trailer total records and hash total matching the detail records.
+    Raises: ValueError if the number of detail records does not fit the trailer.
+    """
+
+    if (
+        not 0
+        <= records
+        < 10
+        ** (
+            cc.TRAILER_TOTAL_RECORDS_END_POSITION
+            - cc.TRAILER_TOTAL_RECORDS_START_POSITION
+            + 1
+        )
+    ):
+        raise ValueError(f"Number of detail records {records} does not fit the trailer")
+
+    generator = random.Random(seed)
+    rate_length = (
+        cc.CURRENCY_COVERSION_INTEGER_PLACES + cc.CURRENCY_COVERSION_DECIMAL_PLACES
+    )
+    detail_lines = []
+    for _ in range(records):
+        if generator.random() < SYNTHETIC_ALLOWED_SHARE:
+            reference_currency, rate_class = cc.ALLOWED_REFERENCE_CURRENCY_CODES[0], "M"
+        else:
+            reference_currency, rate_class = cc.BASE_CURRENCY_NUMBER, "F"
+        mid_rate = generator.randrange(10**4, 10**11)
+        spread = mid_rate // generator.randrange(100, 1000)
+        detail_lines.append(
+            (
+                f"{cc.DETAIL_DESCRIPTION}{generator.randrange(1, 1000):03d}"
+                f"{reference_currency:03d}{generator.randrange(4)}{rate_class}D"
+                f"{mid_rate - spread:0{rate_length}d}{mid_rate:0{rate_length}d}"
+                f"{mid_rate + spread:0{rate_length}d}{'9' * rate_length}"
+            ).ljust(SYNTHETIC_LINE_LENGTH)
+        )
+    header_line = (
+        f"{cc.HEADER_DESCRIPTION}{SYNTHETIC_HEADER_DATE}{cc.HEADER_FORMAT_VERSION}"
+    ).ljust(SYNTHETIC_LINE_LENGTH)
+    return [header_line, *detail_lines, create_trailer_line(detail_lines)]
+
+
+def encode_file_lines(file_lines: list) -> bytes:
+    """
+    Function that encodes file lines into the file content.
+    Arguments:
+        file_lines: File lines.
+    Return: File content.
+    """
+
+    return ("\n".join(file_lines) + "\n").encode("utf-8")
+
+
+def create_trailer_line(detail_lines: list) -> str:
+    """
+    Function that creates the trailer line matching the detail record lines.
+    Arguments:
+        detail_lines: Detail record lines.
+    Return: Trailer line with total records and hash total of the detail records.
+    """
+
+    hash_total_field = buffer_parser.get_hash_total_field(
+        get_record_layouts(cc.HEADER_FORMAT_VERSION).detail
+    )
+    hash_total = sum(int(line[hash_total_field]) for line in detail_lines)
+    total_records_length = (
+        cc.TRAILER_TOTAL_RECORDS_END_POSITION
+        - cc.TRAILER_TOTAL_RECORDS_START_POSITION
+        + 1
+    )
+    hash_total_length = (
+        cc.TRAILER_HASH_TOTAL_END_POSITION - cc.TRAILER_HASH_TOTAL_START_POSITION + 1
+    )
+    return (
+        f"{cc.TRAILER_DESCRIPTION}{len(detail_lines):0{total_records_length}d}"
+        f"{hash_total % cc.HASH_TOTAL_MODULUS:0{hash_total_length}d}"
+    ).ljust(SYNTHETIC_LINE_LENGTH)
+
+
+def run_benchmark(name: str, function, repeat: int = BENCHMARK_REPEAT) -> float:
+    """
+    Function that runs the benchmark and prints the best time of the runs.
+    Arguments:
+        name: Benchmark name.
+        function: Function to be benchmarked.
+        repeat: Number of runs.
+    Return: Best time of the runs, in seconds.
+    """
+
+    best = min(timeit.repeat(function, repeat=repeat, number=1))
+    print(f"{name}: {best * 1000:.2f} ms")
+    return best
+
+
+def benchmark_exchange_rate_representations():
+    """
+    Function that compares parsing of the exchange rates as floats with the one
+    of the exchange rates as fixed point integers, with FIXED_POINT_RATES off and on.
+    Content is parsed by buffer_parser.process_buffer, which is the production parse path,
+    and the parse is measured alone, and together with the serialization with to_wire.
+    """
+
+    content = encode_file_lines(read_sample_file_lines())
+    for serialized in [False, True]:
+        float_time, fixed_point_time = measure_exchange_rate_representations(
+            content, serialized
+        )
+        name = "parse and serialization" if serialized else "parse"
+        print(f"{name} of float exchange rates: {float_time * 1000:.2f} ms")
+        print(f"{name} of fixed point exchange rates: {fixed_point_time * 1000:.2f} ms")
+        print(f"{name} fixed point speedup: {float_time / fixed_point_time:.2f}x")
+
+
+def measure_exchange_rate_representations(
+    content: bytes, serialized: bool, repeat: int = BENCHMARK_REPEAT * 3
+) -> tuple:
+    """
+    Function that measures parsing of the file content with FIXED_POINT_RATES off and on.
+    Arguments:
+        content: File content.
+        serialized: Whether the parsed data is also serialized with to_wire.
+        repeat: Number of runs.
+    Return: Tuple of the best times of the float and the fixed point exchange rates, in seconds.
+    """
+
+    config = get_runtime_context().config
+
+    def parse(fixed_point_rates: bool):
+        with mock.patch.object(config, "fixed_point_rates", fixed_point_rates):
+            data = buffer_parser.process_buffer(content)
+        return data.to_wire() if serialized else data
+
+    times = {False: [], True: []}
+    # runs alternate, so both representations are measured under the same load of the machine
+    for _ in range(repeat):
+        for fixed_point_rates in times:
+            times[fixed_point_rates].append(
+                timeit.timeit(lambda: parse(fixed_point_rates), number=1)
+            )
+    return min(times[False]), min(times[True])
+
+
+def convert_file_line_by_slicing(file_line: str) -> DetailRecordModel:
+    """
+    Function that converts file line to DetailRecordModel with the field positions
+    written out, as it was done before the record layouts. It is the reference
+    which the conversion by the record layout is compared with.
+    Arguments:
+        file_line: File line.
+    Return: DetailRecordModel containing data from file line.
+    """
+
+    if (
+        file_line == None
+        or len(file_line) < cc.SELL_CURRENCY_CONVERSION_RATE_END_POSSITION + 1
+    ):
+        return None
+    try:
+        return DetailRecordModel(
+            source_currency_number=int(
+                file_line[
+                    cc.SOURCE_CURRENCY_START_POSSITION : cc.SOURCE_CURRENCY_END_POSSITION
+                    + 1
+                ]
+            ),
+            reference_currency_number=int(
+                file_line[
+                    cc.REFERENCE_CURRENCY_START_POSSITION : cc.REFERENCE_CURRENCY_END_POSSITION
+                    + 1
+                ]
+            ),
+            source_currency_exponent=int(
+                file_line[
+                    cc.SOURCE_CURRENCY_EXPONENT_START_POSSITION : cc.SOURCE_CURRENCY_EXPONENT_END_POSSITION
+                    + 1
+                ]
+            ),
+            rate_class=file_line[
+                cc.RATE_CLASS_START_POSSITION : cc.RATE_CLASS_END_POSSITION + 1
+            ],
+            rate_format_indicator=file_line[
+                cc.RATE_FORMAT_INDICATOR_CLASS_START_POSSITION : cc.RATE_FORMAT_INDICATOR_CLASS_END_POSSITION
+                + 1
+            ],
+            buy_currency_conversion_rate=convert_exchange_rate(
+                file_line[
+                    cc.BUY_CURRENCY_CONVERSION_RATE_START_POSSITION : cc.BUY_CURRENCY_CONVERSION_RATE_END_POSSITION
+                    + 1
+                ]
+            ),
+            mid_currency_conversion_rate=convert_exchange_rate(
+                file_line[
+                    cc.MID_CURRENCY_CONVERSION_RATE_START_POSSITION : cc.MID_CURRENCY_CONVERSION_RATE_END_POSSITION
+                    + 1
+                ]
+            ),
+            sell_currency_conversion_rate=convert_exchange_rate(
+                file_line[
+                    cc.SELL_CURRENCY_CONVERSION_RATE_START_POSSITION : cc.SELL_CURRENCY_CONVERSION_RATE_END_POSSITION
+                    + 1
+                ]
+            ),
+        )
+    except:
+        return None
+
+
+def measure_detail_record_conversion(
+    detail_lines: list, repeat: int = BENCHMARK_REPEAT
+):
+    """
+    Function that measures conversion of the detail record lines by the record layout,
+    and by the reference conversion with the field positions written out.
+    Arguments:
+        detail_lines: Detail record lines.
+        repeat: Number of runs.
+    Return: Tuple of the best times of the layout and the reference conversion, in seconds.
+    """
+
+    layout = get_record_layouts(cc.HEADER_FORMAT_VERSION).detail
+    convert = buffer_parser.convert_file_line_to_detail_record
+    layout_times = []
+    slicing_times = []
+    # runs alternate, so both conversions are measured under the same load of the machine
+    for _ in range(repeat):
+        layout_times.append(
+            timeit.timeit(
+                lambda: [convert(line, layout) for line in detail_lines], number=1
+            )
+        )
+        slicing_times.append(
+            timeit.timeit(
+                lambda: [convert_file_line_by_slicing(line) for line in detail_lines],
+                number=1,
+            )
+        )
+    layout_time, slicing_time = min(layout_times), min(slicing_times)
+    return layout_time, slicing_time
+
+
+def benchmark_record_layout():
+    """
+    Function that compares conversion of the detail records by the record layout
+    with the one with the field positions written out.
+    """
+
+    layout_time, slicing_time = measure_detail_record_conversion(
+        read_sample_file_lines()[1:-1]
+    )
+    print(f"record layout conversion: {layout_time * 1000:.2f} ms")
+    print(f"written out positions conversion: {slicing_time * 1000:.2f} ms")
+    print(f"record layout relative time: {layout_time / slicing_time:.2f}x")
+
+
+def benchmark_serialization():
+    """
+    Function that compares serialization of the request with jsonpickle
+    with the one of the precompiled to_wire serializer.
+    """
+
+    data = buffer_parser.process_buffer(encode_file_lines(read_sample_file_lines()))
+
+    jsonpickle_time = run_benchmark(
+        "jsonpickle serialization",
+        lambda: jsonpickle.encode(data, unpicklable=False),
+    )
+    to_wire_time = run_benchmark("to_wire serialization", data.to_wire)
+    print(f"to_wire speedup: {jsonpickle_time / to_wire_time:.2f}x")
+
+
+def benchmark_detail_record_memory():
+    """
+    Function that measures memory allocated per parsed detail record.
+    """
+
+    content = encode_file_lines(read_sample_file_lines())
+    tracemalloc.start()
+    data = buffer_parser.process_buffer(content)
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"memory per detail record: {allocated / len(data.detail_records):.0f} bytes")
+
+
+def benchmark_hash_total():
+    """
+    Function that measures overhead of the hash total check, by comparing
+    the time of summing the hash total fields with the time of processing the file.
+    """
+
+    file_lines = read_sample_file_lines(HASH_TOTAL_SAMPLE_FILE_REPEAT)
+    content = encode_file_lines(file_lines)
+    detail_lines = file_lines[1:-1]
+    hash_total_field = buffer_parser.get_hash_total_field(
+        get_record_layouts(cc.HEADER_FORMAT_VERSION).detail
+    )
+
+    process_file_time = run_benchmark(
+        f"process file of {len(file_lines)} lines",
+        lambda: buffer_parser.process_buffer(content),
+    )
+    hash_total_time = run_benchmark(
+        "hash total",
+        lambda: sum(int(line[hash_total_field]) for line in detail_lines),
+    )
+    print(f"hash total overhead: {hash_total_time / process_file_time:.1%}")
+
+
+def benchmark_buffer_parser():
+    """
+    Function that compares parsing of the downloaded file content decoded into lines
+    with the one of the content parsed as bytes.
+    """
+
+    body = encode_file_lines(read_sample_file_lines())
+
+    lines_time = run_benchmark(
+        "decoded lines parsing",
+        lambda: buffer_parser.process_file(body.decode("utf-8").splitlines()),
+    )
+    buffer_time = run_benchmark(
+        "bytes parsing", lambda: buffer_parser.process_buffer(body)
+    )
+    print(f"bytes parsing speedup: {lines_time / buffer_time:.2f}x")
+
+
+class S3StandIn:
+    """
+    Class representing AWS session and S3 client standing in for S3,
+    which returns the same content for every object after the latency.
+    """
+
+    def __init__(self, content: bytes, latency: float):
+        """
+        Arguments:
+            content: Content of every object.
+            latency: Time to the first byte of the object, in seconds.
+        """
+
+        self.content = content
+        self.latency = latency
+
+    def client(self, service_name: str):
+        """
+        Function that returns the S3 client of the session, which is the stand-in itself.
+        """
+
+        return self
+
+    def get_object(self, **arguments) -> dict:
+        """
+        Function that returns the object content after the latency.
+        """
+
+        time.sleep(self.latency)
+        return {
+            "Body": StreamingBody(io.BytesIO(self.content), len(self.content)),
+            "ContentLength": len(self.content),
+        }
+
+
+class ApiStandIn:
+    """
+    Local HTTP server standing in for the exchange rates API,
+    which reads the request body and responds with OK after the latency.
+    """
+
+    def __init__(self, latency: float):
+        """
+        Arguments:
+            latency: Time to process the request, in seconds.
+        """
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                if self.headers.get("Transfer-Encoding") == "chunked":
+                    while size := int(self.rfile.readline().strip(), 16):
+                        self.rfile.read(size + 2)
+                    self.rfile.readline()
+                else:
+                    self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                time.sleep(latency)
+                self.send_response(HTTPStatus.OK)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/"
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def benchmark_async_pipeline():
+    """
+    Function that compares the import of files one after another with the one
+    in the asynchronous pipeline, which overlaps download, parse and import of the files.
+    S3 and the API are stood in for by local stand-ins with the fixed latency.
+    """
+
+    content = encode_file_lines(read_sample_file_lines())
+    file_names = [f"I_{171001 + day}_T057.sw0" for day in range(PIPELINE_FILES)]
+    with ApiStandIn(API_STAND_IN_LATENCY) as api_stand_in:
+        context = runtime.RuntimeContext(
+            runtime.ImporterConfig(
+                {"IMPORT_RATES_URL": api_stand_in.url, "S3_BUCKET_NAME": "benchmark"}
+            ),
+            s3_session=S3StandIn(content, S3_STAND_IN_LATENCY),
+        )
+
+        def sequential_import():
+            for file_name in file_names:
+                data = lambda_function.get_exchange_rates_for_import(file_name)
+                lambda_function.import_exchange_rates(data)
+
+        with mock.patch.object(runtime, "runtime_context", context):
+            sequential_time = run_benchmark(
+                f"sequential import of {len(file_names)} files", sequential_import
+            )
+            pipeline_time = run_benchmark(
+                f"pipelined import of {len(file_names)} files",
+                lambda: lambda_function.import_files_in_pipeline(
+                    [DiscoveredFile(file_name, None) for file_name in file_names]
+                ),
+            )
+    print(f"pipeline speedup: {sequential_time / pipeline_time:.2f}x")
+
+
+def measure_latencies(function, arguments, repeat: int = 1) -> list:
+    """
+    Function that calls the function with every argument, and measures the latency of every call.
+    Arguments:
+        function: Function to be benchmarked.
+        arguments: Arguments of the calls.
+        repeat: How many times the function is called with every argument.
+    Return: List of the call latencies, in seconds.
+    """
+
+    latencies = []
+    for _ in range(repeat):
+        for argument in arguments:
+            start = time.perf_counter()
+            function(argument)
+            latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def summarize_stage(stage: str, unit: str, records: int, latencies: list) -> dict:
+    """
+    Function that summarizes the latencies of the stage calls.
+    Arguments:
+        stage: Stage name.
+        unit: What a single call of the stage processes, such as file or record.
+        records: Number of detail records processed by all the calls.
+        latencies: Call latencies, in seconds.
+    Return: Dictionary of records per second and p50 and p99 latency in milliseconds.
+    """
+
+    percentiles = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {
+        "stage": stage,
+        "unit": unit,
+        "records_per_second": round(records / sum(latencies), 1),
+        "p50_ms": round(percentiles[49] * 1000, 4),
+        "p99_ms": round(percentiles[98] * 1000, 4),
+    }
+
+
+def benchmark_stage_process_buffer(file_lines: list) -> dict:
+    """
+    Function that benchmarks parsing of the whole file content, as of the local file.
+    Arguments:
+        file_lines: File lines.
+    Return: Stage summary.
+    """
+
+    content = encode_file_lines(file_lines)
+    latencies = measure_latencies(
+        buffer_parser.process_buffer, [content], BENCHMARK_REPEAT
+    )
+    return summarize_stage(
+        "process_buffer", "file", (len(file_lines) - 2) * BENCHMARK_REPEAT, latencies
+    )
+
+
+def benchmark_stage_process_chunks(file_lines: list) -> dict:
+    """
+    Function that benchmarks parsing of the file content streamed in chunks, as of the S3 object.
+    Arguments:
+        file_lines: File lines.
+    Return: Stage summary.
+    """
+
+    content = encode_file_lines(file_lines)
+    chunks = [
+        content[start : start + cc.S3_READ_CHUNK_SIZE]
+        for start in range(0, len(content), cc.S3_READ_CHUNK_SIZE)
+    ]
+    latencies = measure_latencies(
+        buffer_parser.process_chunks, [chunks], BENCHMARK_REPEAT
+    )
+    return summarize_stage(
+        "process_chunks", "file", (len(file_lines) - 2) * BENCHMARK_REPEAT, latencies
+    )
+
+
+def benchmark_stage_convert_detail_record(file_lines: list) -> dict:
+    """
+    Function that benchmarks conversion of the detail record lines.
+    Arguments:
+        file_lines: File lines.
+    Return: Stage summary.
+    """
+
+    detail_lines = file_lines[1:-1]
+    layout = buffer_parser.get_detail_record_layout(
+        get_record_layouts(cc.HEADER_FORMAT_VERSION)
+    )
+    latencies = measure_latencies(
+        lambda line: buffer_parser.convert_file_line_to_detail_record(line, layout),
+        detail_lines,
+    )
+    return summarize_stage(
+        "convert_file_line_to_detail_record", "record", len(detail_lines), latencies
+    )
+
+
+def benchmark_stage_record_filter(file_lines: list) -> dict:
+    """
+    Function that benchmarks filtering of the detail record lines by their raw key.
+    Arguments:
+        file_lines: File lines.
+    Return: Stage summary.
+    """
+
+    detail_lines = [line.encode("utf-8") for line in file_lines[1:-1]]
+    record_filter = get_record_filter(
+        get_runtime_context().config.record_filter_rules,
+        buffer_parser.get_detail_record_layout(
+            get_record_layouts(cc.HEADER_FORMAT_VERSION)
+        ),
+    )
+    latencies = measure_latencies(record_filter.is_line_allowed, detail_lines)
+    return summarize_stage("is_line_allowed", "record", len(detail_lines), latencies)
+
+
+def benchmark_stage_json_encoding(file_lines: list) -> dict:
+    """
+    Function that benchmarks JSON encoding of the parsed file.
+    Arguments:
+        file_lines: File lines.
+    Return: Stage summary.
+    """
+
+    data = buffer_parser.process_buffer(encode_file_lines(file_lines))
+    latencies = measure_latencies(lambda data: data.to_wire(), [data], BENCHMARK_REPEAT)
+    return summarize_stage(
+        "json_encoding",
+        "file",
+        len(data.detail_records) * BENCHMARK_REPEAT,
+        latencies,
+    )
+
+
+def benchmark_stage_post(file_lines: list) -> dict:
+    """
+    Function that benchmarks import of the parsed file to the local API stand-in
+    without latency, so only the client side of the POST requests is measured.
+    Arguments:
+        file_lines: File lines.
+    Return: Stage summary.
+    """
+
+    data = buffer_parser.process_buffer(encode_file_lines(file_lines))
+    with ApiStandIn(0) as api_stand_in, mock.patch.object(
+        get_runtime_context().config, "import_rates_url", api_stand_in.url
+    ):
+        latencies = measure_latencies(
+            lambda_function.import_exchange_rates, [data], BENCHMARK_REPEAT
+        )
+    return summarize_stage(
+        "post", "file", len(data.detail_records) * BENCHMARK_REPEAT, latencies
+    )
+
+
+STAGE_BENCHMARKS = {
+    "process_buffer": benchmark_stage_process_buffer,
+    "process_chunks": benchmark_stage_process_chunks,
+    "convert_file_line_to_detail_record": benchmark_stage_convert_detail_record,
+    "is_line_allowed": benchmark_stage_record_filter,
+    "json_encoding": benchmark_stage_json_encoding,
+    "post": benchmark_stage_post,
+}
+
+
+def run_stage(stage: str, records: int, seed: int) -> dict:
+    """
+    Function that runs the stage benchmark on the synthetic file,
+    and adds the peak resident set size of the process to its summary.
+    Arguments:
+        stage: Stage name.
+        records: Number of detail records of the synthetic file.
+        seed: Seed of the synthetic file.
+    Return: Stage summary.
+    """
+
+    logging.disable(logging.CRITICAL)
+    summary = STAGE_BENCHMARKS[stage](generate_sample_file_lines(records, seed))
+    # maximum resident set size is reported in kilobytes on Linux, and in bytes on macOS
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    summary["peak_rss_mb"] = round(
+        peak_rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1
+    )
+    return summary
+
+
+def run_suite(records: int, seed: int) -> dict:
+    """
+    Function that runs every stage benchmark in its own process,
+    so peak resident set size is measured for the stage alone.
+    Arguments:
+        records: Number of detail records of the synthetic file.
+        seed: Seed of the synthetic file.
+    Return: Dictionary of stage summaries by stage name.
+    """
+
+    results = {}
+    for stage in STAGE_BENCHMARKS:
+        result = subprocess.run(
+            [
+                sys.executable,
+                os.path.abspath(__file__),
+                "stage",
+                stage,
+                "--records",
+                str(records),
+                "--seed",
+                str(seed),
+            ],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        )
+        results[stage] = json.loads(result.stdout)
+        print(
+            f"{stage}: {results[stage]['records_per_second']:.0f} records/s, "
+            f"p50 {results[stage]['p50_ms']:.3f} ms, "
+            f"p99 {results[stage]['p99_ms']:.3f} ms per {results[stage]['unit']}, "
+            f"peak RSS {results[stage]['peak_rss_mb']:.1f} MB"
+        )
+    return results
+
+
+def find_regressions(
+    results: dict, baseline: dict, tolerance: float = REGRESSION_TOLERANCE
+) -> list:
+    """
+    Function that compares the stage summaries with the baseline ones.
+    Arguments:
+        results: Dictionary of stage summaries by stage name.
+        baseline: Dictionary of baseline stage summaries by stage name.
+        tolerance: Share of the baseline records per second by which a stage may be slower.
+    Return: List of messages describing the stages which regressed.
+    """
+
+    regressions = []
+    for stage, result in results.items():
+        if stage not in baseline:
+            continue
+        baseline_speed = baseline[stage]["records_per_second"]
+        if result["records_per_second"] < baseline_speed * (1 - tolerance):
+            regressions.append(
+                f"{stage}: {result['records_per_second']:.0f} records/s "
+                f"is more than {tolerance:.0%} below baseline {baseline_speed:.0f} records/s"
+            )
+    return regressions
+
+
+def compare_with_revision(
+    revision: str, records: int, seed: int, tolerance: float = REGRESSION_TOLERANCE
+) -> int:
+    """
+    Function that runs the stage benchmarks of the merge base of HEAD and the revision,
+    and of the working tree, one after another on the same machine, and compares them.
+    Merge base is checked out into a temporary git worktree, whose suite stores its results
+    as the baseline of the working tree's suite, so no baseline has to be kept in the repository.
+    Stages which the merge base does not have are not compared.
+    Arguments:
+        revision: Revision, such as the branch the changes are merged into.
+        records: Number of detail records of the synthetic file.
+        seed: Seed of the synthetic file.
+        tolerance: Share of the baseline records per second by which a stage may be slower.
+    Return: Exit code of the suite compared with the baseline, or NOT_COMPARED_EXIT_CODE
+        if the suite of the merge base can not be run.
+    """
+
+    directory = os.path.dirname(os.path.abspath(__file__))
+
+    def run_git(*arguments) -> str:
+        return subprocess.run(
+            ["git", *arguments],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=directory,
+        ).stdout.strip()
+
+    merge_base = run_git("merge-base", "HEAD", revision)
+    prefix = run_git("rev-parse", "--show-prefix")
+    with tempfile.TemporaryDirectory() as path:
+        worktree = os.path.join(path, "merge-base")
+        baseline_path = os.path.join(path, BASELINE_FILE_NAME)
+        run_git("worktree", "add", "--detach", worktree, merge_base)
+        try:
+            print(f"Running the stage benchmarks of merge base {merge_base[:12]}")
+            subprocess.run(
+                [
+                    sys.executable,
+                    os.path.join(worktree, prefix, os.path.basename(__file__)),
+                    "suite",
+                    "--save-baseline",
+                    "--baseline",
+                    baseline_path,
+                    "--records",
+                    str(records),
+                    "--seed",
+                    str(seed),
+                ],
+                check=True,
+                cwd=os.path.join(worktree, prefix),
+            )
+        except subprocess.CalledProcessError:
+            print(
+                f"Stage benchmarks of merge base {merge_base[:12]} failed, not compared"
+            )
+            return NOT_COMPARED_EXIT_CODE
+        finally:
+            run_git("worktree", "remove", "--force", worktree)
+        print("Running the stage benchmarks of the working tree")
+        return main(
+            [
+                "suite",
+                "--baseline",
+                baseline_path,
+                "--records",
+                str(records),
+                "--seed",
+                str(seed),
+                "--tolerance",
+                str(tolerance),
+            ]
+        )
+
+
+def main(arguments=None):
+    """
+    Function that runs the benchmarks from the command line. Without a command,
+    the comparisons of the implementations are run. Command suite runs the stage benchmarks
+    on the synthetic file, and compares them with the baseline, or stores them as the baseline.
+    Baseline depends on the machine, so it is not kept in the repository, and it is stored
+    with --save-baseline in every environment which compares the results.
+    Command compare runs the suite of the merge base with the given revision, and then
+    the one of the working tree on the same machine, and compares them, so a change
+    is checked for regressions before it is merged with:
+        python benchmarks.py compare master
+    Command generate writes the synthetic file.
+    Arguments:
+        arguments: Command line arguments. Defaults to the ones of the process.
+    Return: Exit code, which is 1 if any stage regressed, 2 if the results are not compared,
+        because the baseline is missing or measured on a different synthetic file. Otherwise 0.
+    """
+
+    parser = argparse.ArgumentParser(description="Exchange rates importer benchmarks")
+    commands = parser.add_subparsers(dest="command")
+    suite_parser = commands.add_parser("suite", help="run the stage benchmarks")
+    suite_parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="store the results as the baseline instead of comparing them with it",
+    )
+    suite_parser.add_argument(
+        "--baseline", default=BASELINE_FILE_NAME, help="path of the baseline file"
+    )
+    suite_parser.add_argument("--tolerance", type=float, default=REGRESSION_TOLERANCE)
+    compare_parser = commands.add_parser(
+        "compare",
+        help="compare the stage benchmarks with the ones of the merge base with the revision",
+    )
+    compare_parser.add_argument("revision")
+    compare_parser.add_argument("--tolerance", type=float, default=REGRESSION_TOLERANCE)
+    stage_parser = commands.add_parser("stage", help="run a single stage benchmark")
+    stage_parser.add_argument("stage", choices=list(STAGE_BENCHMARKS))
+    generate_parser = commands.add_parser("generate", help="write the synthetic file")
+    generate_parser.add_argument("path")
+    for command_parser in [suite_parser, compare_parser, stage_parser, generate_parser]:
+        command_parser.add_argument(
+            "--records", type=int, default=SYNTHETIC_FILE_RECORDS
+        )
+        command_parser.add_argument("--seed", type=int, default=0)
+    arguments = parser.parse_args(arguments)
+
+    if arguments.command == "generate":
+        with open(arguments.path, mode="wt") as file:
+            file.write(
+                "\n".join(generate_sample_file_lines(arguments.records, arguments.seed))
+                + "\n"
+            )
+    elif arguments.command == "compare":
+        return compare_with_revision(
+            arguments.revision, arguments.records, arguments.seed, arguments.tolerance
+        )
+    elif arguments.command == "stage":
+        print(json.dumps(run_stage(arguments.stage, arguments.records, arguments.seed)))
+    elif arguments.command == "suite":
+        if not arguments.save_baseline and not os.path.exists(arguments.baseline):
+            print(
+                f"Baseline {arguments.baseline} is missing, "
+                "store it with suite --save-baseline"
+            )
+            return NOT_COMPARED_EXIT_CODE
+        results = run_suite(arguments.records, arguments.seed)
+        if arguments.save_baseline:
+            with open(arguments.baseline, mode="wt") as file:
+                json.dump(
+                    {"records": arguments.records, "seed": arguments.seed, **results},
+                    file,
+                    indent=2,
+                )
+            print(f"Baseline stored to {arguments.baseline}")
+            return 0
+        with open(arguments.baseline, mode="rt") as file:
+            baseline = json.load(file)
+        if (baseline["records"], baseline["seed"]) != (
+            arguments.records,
+            arguments.seed,
+        ):
+            print("Baseline was measured on a different synthetic file, not compared")
+            return NOT_COMPARED_EXIT_CODE
+        regressions = find_regressions(results, baseline, arguments.tolerance)
+        for regression in regressions:
+            print(f"Regression of {regression}")
+        return 1 if regressions else 0
+    else:
+        benchmark_exchange_rate_representations()
+        benchmark_record_layout()
+        benchmark_serialization()
+        benchmark_detail_record_memory()
+        benchmark_hash_total()
+        benchmark_buffer_parser()
+        benchmark_async_pipeline()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
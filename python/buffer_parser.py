@@ -0,0 +1,549 @@
+import logging
+import mmap
+
+import conversion_constants as cc
+from models import DetailRecordModel, HeaderModel, RequestModel, TrailerModel
+from record_filter import get_record_filter
+from record_layouts import (
+    RecordLayout,
+    RecordLayouts,
+    call,
+    convert_exchange_rate,
+    convert_exchange_rate_to_fixed_point,
+    get_record_layouts,
+)
+from runtime import get_runtime_context
+
+logger = logging.getLogger()
+fixed_point_detail_record_layouts = {}
+IMPROPER_FILE_FORMAT_ERROR = "Improper file format"
+WHITESPACE = b" \t\r\n"
+HEADER_CODE = ord(cc.HEADER_DESCRIPTION)
+DETAIL_CODE = ord(cc.DETAIL_DESCRIPTION)
+TRAILER_CODE = ord(cc.TRAILER_DESCRIPTION)
+
+
+def process_local_file(file_path: str) -> RequestModel:
+    """
+    Function processes the local file into RequestModel, parsing its memory-mapped content.
+    Arguments:
+        file_path: Path of the local file.
+    Return: RequestModel containing data from the file.
+    """
+
+    with open(file_path, mode="rb") as file:
+        # empty file can not be memory-mapped
+        if not file.seek(0, 2):
+            return process_buffer(b"")
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            return process_buffer(buffer)
+
+
+def process_buffer(buffer) -> RequestModel:
+    """
+    Function processes the whole file content into RequestModel, without decoding it.
+    Arguments:
+        buffer: File content as bytes, such as downloaded S3 body, or memory-mapped file.
+    Return: RequestModel containing data from the file content.
+    """
+
+    return process_chunks((buffer,))
+
+
+def process_file(file_lines) -> RequestModel:
+    """
+    Function processes file lines into RequestModel.
+    File lines are consumed in a single pass, so any iterable of lines
+    (list, open file or S3 body line iterator) can be passed.
+    Lines are parsed by the same parser as the file content, see process_chunks.
+    Arguments:
+        file_lines: file lines, either as str or bytes.
+    Return: RequestModel containing data from file lines.
+    """
+
+    return process_lines(iter_file_lines(file_lines))
+
+
+def process_chunks(chunks) -> RequestModel:
+    """
+    Function processes file content chunks into RequestModel, without decoding them.
+    Chunks are consumed in a single pass, so the content can be parsed
+    while the rest of it is still being downloaded.
+    Arguments:
+        chunks: Iterable of file content chunks, split at any position.
+    Return: RequestModel containing data from the file content.
+    """
+
+    return process_lines(iter_chunk_lines(chunks))
+
+
+def process_lines(lines) -> RequestModel:
+    """
+    Function processes the lines found in the file content into RequestModel.
+    Arguments:
+        lines: Iterable of tuples of buffer containing the line, its memory view,
+            and start and end position of the line, as yielded by iter_chunk_lines.
+    Return: RequestModel containing data from the file content.
+    """
+
+    ret = RequestModel(header=None, detail_records=[], trailer=None, error=None)
+    # parse result is reused for validation and serialization, so it is kept immutable
+    ret.detail_records = tuple(stream_detail_records(lines, ret))
+
+    if ret.error:
+        return log_error_and_return(ret.error)
+
+    return ret
+
+
+def stream_detail_records(lines, request: RequestModel):
+    """
+    Generator that parses file lines in a single pass and yields allowed detail records.
+    File structure is validated while the lines are read: the first line has to be
+    the header, the last line has to be the trailer, and in between are only
+    detail record lines, whose count has to match the trailer total records.
+    Hash total is summed while the detail records are parsed, and it has to match
+    the trailer hash total, so the records are not read again to verify it.
+    Header and trailer are stored to the request. If the file is not valid,
+    request error is set and generator stops, so the records yielded so far
+    have to be discarded by the caller.
+    Arguments:
+        lines: Iterable of tuples of buffer containing the line, its memory view,
+            and start and end position of the line, as yielded by iter_chunk_lines.
+        request: RequestModel to which header, trailer and error are stored.
+    """
+
+    lines = enumerate(lines, 1)
+    for _, (buffer, view, start, end) in lines:
+        if start == end:
+            continue
+        if buffer[start] != HEADER_CODE:
+            set_file_format_error(request, "First line in the file is not the header")
+            return
+        header_line = str(view[start:end], "utf-8")
+        break
+    else:
+        set_file_format_error(request, "No file lines")
+        return
+
+    request.header = convert_file_line_to_header(header_line)
+    layouts = get_record_layouts(get_header_format_version(header_line)) or (
+        get_record_layouts(cc.HEADER_FORMAT_VERSION)
+    )
+    parser = DetailRecordsParser(layouts)
+    yield from parser.parse(lines)
+    if parser.error:
+        error_line_number, error_message = parser.error
+        set_file_format_error(request, f"Line {error_line_number}: {error_message}")
+        return
+    if parser.stop_line is None:
+        set_file_format_error(request, "Number of trailer lines in file is not 1")
+        return
+
+    trailer_line_number, buffer, view, start, end = parser.stop_line
+    if buffer[start] == HEADER_CODE:
+        set_file_format_error(request, "Number of header lines in file is not 1")
+        return
+    if buffer[start] != TRAILER_CODE:
+        set_file_format_error(
+            request, "Not all lines except the first and last one are detail records"
+        )
+        return
+    trailer_line = str(view[start:end], "utf-8")
+    for _, (buffer, _, start, end) in lines:
+        if start != end:
+            set_file_format_error(
+                request,
+                (
+                    "Number of trailer lines in file is not 1"
+                    if buffer[start] == TRAILER_CODE
+                    else "Last line in the file is not the trailer"
+                ),
+            )
+            return
+
+    validate_trailer(
+        request,
+        trailer_line,
+        trailer_line_number,
+        layouts.trailer,
+        parser.detail_records_count,
+        parser.hash_total,
+    )
+
+
+class DetailRecordsParser:
+    """
+    Class representing parser of the detail record lines, which counts them and sums
+    their hash total fields. Lines are found and their fields are sliced in the content
+    buffers themselves, so only the record type, the hash total field and the key checked
+    by RecordFilter are copied out of the content for every detail record. Lines are decoded
+    into strings, and their fields converted, only for the detail records which pass the filter.
+    """
+
+    def __init__(
+        self,
+        layouts: RecordLayouts,
+        fixed_point_rates: bool = None,
+        filter_rules=None,
+    ):
+        """
+        Arguments:
+            layouts: Record layouts of the header format version of the file.
+            fixed_point_rates: Whether exchange rates are parsed into fixed point integers.
+                Defaults to the configured one.
+            filter_rules: Rules by which detail records are allowed. Defaults to the configured ones.
+        """
+
+        self.layout = get_detail_record_layout(layouts, fixed_point_rates)
+        self.record_filter = get_record_filter(
+            filter_rules or get_runtime_context().config.record_filter_rules,
+            self.layout,
+        )
+        self.hash_total_field = get_hash_total_field(self.layout)
+        self.detail_records_count = 0
+        self.hash_total = 0
+        # number of the last line read
+        self.line_number = 0
+        # first line which is not a detail record, as tuple of its line number,
+        # buffer, memory view, and start and end position
+        self.stop_line = None
+        # tuple of line number and message of the detail record whose hash total is not a number
+        self.error = None
+
+    def parse(self, lines):
+        """
+        Generator that parses detail record lines, until the first line which is not
+        a detail record, which is kept in stop_line, so the caller continues with it.
+        If the hash total field of the line is not a number, error is set and generator stops.
+        Arguments:
+            lines: Iterator of tuples of line number, and buffer containing the line,
+                its memory view, and start and end position of the line.
+        Yields: DetailRecordModels of the allowed detail records.
+        """
+
+        layout = self.layout
+        is_key_allowed = self.record_filter.is_key_allowed
+        key_start, key_stop = self.record_filter.key.start, self.record_filter.key.stop
+        hash_start, hash_stop = self.hash_total_field.start, self.hash_total_field.stop
+        detail_records_count = 0
+        hash_total = 0
+        line_number = self.line_number
+        try:
+            for line_number, (buffer, view, start, end) in lines:
+                if start == end:
+                    continue
+                if buffer[start] != DETAIL_CODE:
+                    self.stop_line = (line_number, buffer, view, start, end)
+                    return
+                detail_records_count += 1
+                # end is limited to the line end, so the field of a short line is not read from the next line
+                hash_total_value = buffer[
+                    start + hash_start : min(start + hash_stop, end)
+                ]
+                try:
+                    hash_total += int(hash_total_value)
+                except ValueError:
+                    self.error = (
+                        line_number,
+                        f"hash total field "
+                        f"{hash_total_value.decode('utf-8', 'replace')!r} is not a number",
+                    )
+                    return
+                if is_key_allowed(buffer[start + key_start : start + key_stop]):
+                    detail_record = convert_file_line_to_detail_record(
+                        str(view[start:end], "utf-8"), layout
+                    )
+                    if detail_record is not None:
+                        yield detail_record
+        finally:
+            self.detail_records_count += detail_records_count
+            self.hash_total += hash_total
+            self.line_number = line_number
+
+
+def validate_trailer(
+    request: RequestModel,
+    trailer_line: str,
+    trailer_line_number: int,
+    layout: RecordLayout,
+    detail_records_count: int,
+    hash_total: int,
+):
+    """
+    Function that stores the trailer to the request, and checks whether
+    its total records and hash total match the parsed detail records.
+    If they do not match, request error is set.
+    Arguments:
+        request: RequestModel to which trailer and error are stored.
+        trailer_line: Trailer line.
+        trailer_line_number: Number of the trailer line in the file.
+        layout: Trailer record layout.
+        detail_records_count: Number of detail record lines in the file.
+        hash_total: Sum of hash total fields of all detail records.
+    """
+
+    request.trailer = convert_file_line_to_trailer(trailer_line, layout)
+    if not request.trailer or request.trailer.total_records != detail_records_count:
+        request.error = "Number of data records does not match with trailer"
+    elif not is_hash_valid(request, hash_total):
+        logger.error(
+            f"Line {trailer_line_number}: trailer hash total {request.trailer.hash_total} "
+            f"does not match hash total {hash_total % cc.HASH_TOTAL_MODULUS} "
+            f"of {detail_records_count} detail records"
+        )
+        request.error = "Hash do not match"
+
+
+def set_file_format_error(request: RequestModel, error_message: str):
+    """
+    Function that logs the reason of improper file format and sets the request error.
+    Arguments:
+        request: RequestModel to which the error is stored.
+        error_message: Reason why file format is improper.
+    """
+
+    logger.error(error_message)
+    request.error = IMPROPER_FILE_FORMAT_ERROR
+
+
+def log_error_and_return(error_message: str) -> RequestModel:
+    """
+    Function that logs error and creates RequestModel containing error message.
+    Arguments:
+        error_message: Error message.
+    Return: RequestModel containing error message.
+    """
+
+    ret = RequestModel(header=None, detail_records=[], trailer=None, error=None)
+    logger.error(error_message)
+    ret.error = error_message
+    return ret
+
+
+def is_hash_valid(data: RequestModel, hash_total: int) -> bool:
+    """
+    Function that checks weather the total hash is valid.
+    Hash total is the sum of mid rates of all detail records, including not allowed ones,
+    truncated to the length of the trailer hash total field.
+    Arguments:
+        data: Data to be sent to API.
+        hash_total: Sum of hash total fields of all detail records.
+    Return: True if the total hash is valid.
+    """
+
+    return (
+        data.trailer is not None
+        and data.trailer.hash_total == hash_total % cc.HASH_TOTAL_MODULUS
+    )
+
+
+def get_hash_total_field(layout: RecordLayout) -> slice:
+    """
+    Function that returns the position of the field which is summed into the hash total.
+    Arguments:
+        layout: Detail record layout.
+    Return: Slice of the field in detail record line.
+    """
+
+    for name, start, end, _ in layout.fields:
+        if name == cc.HASH_TOTAL_FIELD_NAME:
+            return slice(start, end + 1)
+    raise ValueError(f"Detail record layout has no {cc.HASH_TOTAL_FIELD_NAME} field")
+
+
+def convert_file_line_to_header(file_line: str) -> HeaderModel:
+    """
+    Function that converts file line to HeaderModel.
+    Arguments:
+        file_line: File line.
+    Return: HeaderModel containing data from file line.
+    """
+
+    if not file_line or len(file_line) < cc.HEADER_FORMAT_VERSION_POSITION + 1:
+        logger.error("Header length improper")
+        return None
+    layouts = get_record_layouts(get_header_format_version(file_line))
+    if not layouts:
+        logger.error("Header format unsupported")
+        return None
+    try:
+        return HeaderModel(date=layouts.header.parse(file_line)["date"])
+    except:
+        logger.error("Header datetime improper format")
+        return None
+
+
+def get_header_format_version(file_line: str) -> str:
+    """
+    Function that returns format version found in the header line.
+    Arguments:
+        file_line: Header file line.
+    Return: Header format version.
+    """
+
+    return file_line[
+        cc.HEADER_FORMAT_VERSION_POSITION : cc.HEADER_FORMAT_VERSION_POSITION + 1
+    ]
+
+
+def convert_file_line_to_detail_record(
+    file_line: str, layout: RecordLayout = None
+) -> DetailRecordModel:
+    """
+    Function that converts file line to DetailRecordModel.
+    Arguments:
+        file_line: File line.
+        layout: Detail record layout. Defaults to the one of the supported header format version.
+    Return: DetailRecordModel containing data from file line.
+    """
+
+    layout = layout or get_detail_record_layout(
+        get_record_layouts(cc.HEADER_FORMAT_VERSION)
+    )
+    if file_line == None or len(file_line) < layout.length:
+        logger.error("Detail record length improper")
+        return None
+
+    try:
+        # converted values are passed in the field order, which is the order of the model arguments
+        return DetailRecordModel(*map(call, layout.converters, layout.slice(file_line)))
+    except:
+        logger.error(f"Improper data record: {file_line}")
+        return None
+
+
+def get_detail_record_layout(
+    layouts: RecordLayouts, fixed_point_rates: bool = None
+) -> RecordLayout:
+    """
+    Function that returns detail record layout used for parsing detail records.
+    In fixed point mode exchange rates are converted to fixed point integers
+    instead of floats, so the layout is derived from the registered one once.
+    Arguments:
+        layouts: Record layouts registered for the header format version.
+        fixed_point_rates: Whether fixed point mode is used. Defaults to the configured one.
+    Return: Detail record layout.
+    """
+
+    if fixed_point_rates is None:
+        fixed_point_rates = get_runtime_context().config.fixed_point_rates
+    if not fixed_point_rates:
+        return layouts.detail
+    layout = fixed_point_detail_record_layouts.get(layouts.detail)
+    if not layout:
+        layout = RecordLayout(
+            [
+                (
+                    name,
+                    start,
+                    end,
+                    (
+                        convert_exchange_rate_to_fixed_point
+                        if converter is convert_exchange_rate
+                        else converter
+                    ),
+                )
+                for name, start, end, converter in layouts.detail.fields
+            ]
+        )
+        fixed_point_detail_record_layouts[layouts.detail] = layout
+    return layout
+
+
+def convert_file_line_to_trailer(
+    file_line: str, layout: RecordLayout = None
+) -> TrailerModel:
+    """
+    Function that converts file line to TrailerModel.
+    Arguments:
+        file_line: File line.
+        layout: Trailer record layout. Defaults to the one of the supported header format version.
+    Return: TrailerModel containing data from file line.
+    """
+
+    layout = layout or get_record_layouts(cc.HEADER_FORMAT_VERSION).trailer
+    if file_line == None or len(file_line) < layout.length:
+        logger.error("Trailer length improper")
+        return None
+    try:
+        return TrailerModel(*map(call, layout.converters, layout.slice(file_line)))
+    except:
+        logger.error("Trailer total records or hash improper format")
+        return None
+
+
+def iter_file_lines(file_lines):
+    """
+    Generator that turns file lines into the lines of the file content, as yielded by iter_chunk_lines.
+    Arguments:
+        file_lines: Iterable of file lines, either as str or bytes.
+    Yields: Tuples of buffer containing the stripped line, its memory view, and start and end
+        position of the line. Start and end are the same for empty line.
+    """
+
+    for line in file_lines:
+        if isinstance(line, str):
+            line = line.encode("utf-8")
+        line = line.strip(WHITESPACE)
+        with memoryview(line) as view:
+            yield line, view, 0, len(line)
+
+
+def iter_chunk_lines(chunks):
+    """
+    Generator that splits file content chunks into lines.
+    Lines within a chunk are left in it, and only the line split between
+    two chunks is joined into new buffer.
+    Arguments:
+        chunks: Iterable of file content chunks, split at any position.
+    Yields: Tuples of buffer containing the line, its memory view, and start and end position
+        of the line without surrounding whitespace. Start and end are the same for empty line.
+    """
+
+    remainder = b""
+    for chunk in chunks:
+        last_line_end = chunk.rfind(b"\n")
+        if last_line_end < 0:
+            remainder += chunk
+            continue
+        start = 0
+        if remainder:
+            start = chunk.find(b"\n") + 1
+            line = remainder + chunk[:start]
+            with memoryview(line) as view:
+                for line_start, line_end in iter_line_bounds(line):
+                    yield line, view, line_start, line_end
+        with memoryview(chunk) as view:
+            for line_start, line_end in iter_line_bounds(
+                chunk, start, last_line_end + 1
+            ):
+                yield chunk, view, line_start, line_end
+        remainder = chunk[last_line_end + 1 :]
+    if remainder:
+        with memoryview(remainder) as view:
+            for line_start, line_end in iter_line_bounds(remainder):
+                yield remainder, view, line_start, line_end
+
+
+def iter_line_bounds(buffer, start: int = 0, stop: int = None):
+    """
+    Generator that finds lines in the section of the buffer.
+    Arguments:
+        buffer: File content as bytes, or memory-mapped file.
+        start: Start position of the section.
+        stop: End position of the section. Defaults to the end of the buffer.
+    Yields: Tuples of start and end position of the line without surrounding whitespace.
+    """
+
+    stop = len(buffer) if stop is None else stop
+    while start < stop:
+        line_end = buffer.find(b"\n", start, stop)
+        if line_end < 0:
+            line_end = stop
+        # lines are padded with trailing spaces, which are stripped from the line copy at once
+        end = start + len(buffer[start:line_end].rstrip(WHITESPACE))
+        while start < end and buffer[start] in WHITESPACE:
+            start += 1
+        yield start, end
+        start = line_end + 1
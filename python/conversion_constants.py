@@ -1,6 +1,39 @@
 IMPORT_RATES_URL = "http://localhost:5224/ExchangeRate/import"
+IMPORT_RATES_CHUNK_SIZE = 64 * 1024
+IMPORT_RATES_BATCH_PATH = "/batch"
+IMPORT_RATES_COMMIT_PATH = "/commit"
+IMPORT_RATES_SESSION_PATH = "/sessions/"
+IMPORT_RATES_MAX_IN_FLIGHT = 4
+IMPORT_RATES_TIMEOUT = 30
+IMPORT_RATES_MAX_RETRIES = 3
+IMPORT_RATES_BACKOFF_BASE = 0.5
+IMPORT_RATES_BACKOFF_MAX = 8
+IMPORT_RATES_DELTA_PATH = "/delta"
+IMPORT_RATES_FINGERPRINT_NAME = "import_fingerprint.json"
+IMPORTED_DIGESTS_NAME = "imported_digests.json"
+IMPORTED_DIGESTS_MAX = 100
+BACKFILL_FILES_PER_WORKER = 2
+EVENT_MAX_WORKERS = 4
+# maximum number of files waiting between two stages of the asynchronous pipeline
+PIPELINE_QUEUE_SIZE = 2
+# files of this size or larger are parsed in parallel worker processes
+PARALLEL_PARSE_MIN_FILE_SIZE = 32 * 1024 * 1024
+# backfilled files of this size or larger are decoded all at once with NumPy, if it is installed
+BATCH_DECODE_MIN_FILE_SIZE = 256 * 1024
+# S3 objects are parsed while they are downloaded, in chunks of this size
+S3_READ_CHUNK_SIZE = 1024 * 1024
+# S3 objects of this size or larger are downloaded in parts with parallel ranged GET requests
+S3_RANGED_GET_MIN_FILE_SIZE = 64 * 1024 * 1024
+S3_RANGED_GET_PART_SIZE = 8 * 1024 * 1024
+S3_RANGED_GET_MAX_IN_FLIGHT = 4
+BASE_CURRENCY_NUMBER = 978
+IMPORT_METRICS_NAMESPACE = "ExchangeRateImporter"
+# number of the top functions or allocation sites logged by the profiler
+IMPORT_PROFILE_TOP_ENTRIES = 25
 
 CURRENCY_RATES_FILE_EXTENSION = ".sw0"
+# prefix of the exchange rates file keys on AWS S3 bucket, all keys are listed by default
+CURRENCY_RATES_FILE_PREFIX = ""
 CURRENCY_RATES_FILE_PATH = "./"
 
 HEADER_DESCRIPTION = "H"
@@ -44,6 +77,7 @@ SELL_CURRENCY_CONVERSION_RATE_END_POSSITION = 54
 
 CURRENCY_COVERSION_INTEGER_PLACES = 8
 CURRENCY_COVERSION_DECIMAL_PLACES = 7
+EXCHANGE_RATE_SCALE = 10**CURRENCY_COVERSION_DECIMAL_PLACES
 
 TRAILER_DESCRIPTION = "T"
 TRAILER_DESCRIPTION_START_POSITION = 0
@@ -55,6 +89,12 @@ TRAILER_TOTAL_RECORDS_END_POSITION = 6
 TRAILER_HASH_TOTAL_START_POSITION = 7
 TRAILER_HASH_TOTAL_END_POSITION = 23
 
+# trailer hash total is the sum of mid rates of all detail records, truncated to the trailer field
+HASH_TOTAL_FIELD_NAME = "mid_currency_conversion_rate"
+HASH_TOTAL_MODULUS = 10 ** (
+    TRAILER_HASH_TOTAL_END_POSITION - TRAILER_HASH_TOTAL_START_POSITION + 1
+)
+
 ALLOWED_REFERENCE_CURRENCY_CODES = [
     840,
 ]
@@ -0,0 +1,218 @@
+import os
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+
+import conversion_constants as cc
+
+DiscoveredFile = namedtuple("DiscoveredFile", ["key", "size", "etag"], defaults=(None,))
+
+
+class S3FileDiscovery:
+    """
+    Class representing discovery of the latest exchange rates file on AWS S3 bucket.
+    Files are found from the bucket listing, which already contains their sizes,
+    so no object is downloaded. Listed files are compared with the last processed file,
+    which is kept in the manifest, by the date parsed from their names, since the key order
+    does not follow the file dates when the keys have different prefixes.
+    Manifest is cached between warm Lambda invocations, and optionally stored on the bucket.
+    """
+
+    def __init__(self, s3_client, bucket_name: str, prefix: str, manifest_store=None):
+        """
+        Arguments:
+            s3_client: AWS S3 client.
+            bucket_name: Name of the bucket containing exchange rates files.
+            prefix: Prefix of the exchange rates file keys.
+            manifest_store: Store of the manifest. Manifest is only cached if not provided.
+        """
+
+        self.s3_client = s3_client
+        self.bucket_name = bucket_name
+        self.prefix = prefix
+        self.manifest_store = manifest_store
+        self.manifest = None
+
+    def get_last_processed_key(self) -> str:
+        """
+        Function that returns the last processed file key from the manifest.
+        Manifest is read from the store on the first call only.
+        Return: Last processed file key, or None if no file is processed yet.
+        """
+
+        if self.manifest is None:
+            self.manifest = (
+                self.manifest_store.load() if self.manifest_store else None
+            ) or {}
+        return self.manifest.get("last_processed_key")
+
+    def save_last_processed_key(self, key: str):
+        """
+        Function that stores the last processed file key to the manifest.
+        Arguments:
+            key: Key of the processed file.
+        """
+
+        self.manifest = {"last_processed_key": key}
+        if self.manifest_store:
+            self.manifest_store.save(self.manifest)
+
+    def list_files(self):
+        """
+        Generator that lists valid exchange rates files from the bucket,
+        with paginated list_objects_v2 requests.
+        Yields: DiscoveredFiles in ascending key order.
+        """
+
+        for page in self.s3_client.get_paginator("list_objects_v2").paginate(
+            Bucket=self.bucket_name, Prefix=self.prefix
+        ):
+            for s3_object in page.get("Contents", []):
+                if is_file_name_valid(s3_object["Key"]):
+                    yield DiscoveredFile(
+                        s3_object["Key"],
+                        s3_object["Size"],
+                        s3_object.get("ETag", "").strip('"') or None,
+                    )
+
+    def find_latest_file(self) -> DiscoveredFile:
+        """
+        Function that finds the latest not empty exchange rates file,
+        which is newer than the last processed file.
+        Return: Latest DiscoveredFile, or None if there is no file newer than the last processed one.
+        """
+
+        last_processed_key = self.get_last_processed_key()
+        new_files = FileCatalog(self.list_files()).not_processed(last_processed_key)
+        return new_files[-1] if new_files else None
+
+
+class FileCatalog:
+    """
+    Class representing catalog of not empty exchange rates files, indexed by their date.
+    File names are parsed once, and the files are kept sorted by date,
+    so the queries are answered with binary search.
+    """
+
+    def __init__(self, files):
+        """
+        Arguments:
+            files: Iterable of DiscoveredFiles. Invalid and empty files are left out.
+        """
+
+        self.files = sorted(
+            (
+                discovered_file
+                for discovered_file in files
+                if discovered_file.size and is_file_name_valid(discovered_file.key)
+            ),
+            key=get_file_sort_key,
+        )
+        self.dates = [
+            get_file_date(discovered_file.key) for discovered_file in self.files
+        ]
+
+    @classmethod
+    def from_local_file_storage(cls, path: str):
+        """
+        Function that creates catalog of exchange rates files on local file storage.
+        Arguments:
+            path: Directory containing exchange rates files.
+        Return: FileCatalog.
+        """
+
+        return cls(
+            DiscoveredFile(file_name, os.stat(os.path.join(path, file_name)).st_size)
+            for file_name in os.listdir(path)
+            if is_file_name_valid(file_name)
+        )
+
+    def __len__(self):
+        return len(self.files)
+
+    def latest(self) -> DiscoveredFile:
+        """
+        Function that returns the latest file.
+        Return: Latest DiscoveredFile, or None if the catalog is empty.
+        """
+
+        return self.files[-1] if self.files else None
+
+    def since(self, date: int) -> list:
+        """
+        Function that returns files from the date onwards.
+        Arguments:
+            date: Date as number in the format of YYMMDD.
+        Return: List of DiscoveredFiles ordered by date.
+        """
+
+        return self.files[bisect_left(self.dates, date) :]
+
+    def between(self, start_date: int, end_date: int) -> list:
+        """
+        Function that returns files between two dates, both included.
+        Arguments:
+            start_date: Date as number in the format of YYMMDD.
+            end_date: Date as number in the format of YYMMDD.
+        Return: List of DiscoveredFiles ordered by date.
+        """
+
+        return self.files[
+            bisect_left(self.dates, start_date) : bisect_right(self.dates, end_date)
+        ]
+
+    def not_processed(self, last_processed_key: str) -> list:
+        """
+        Function that returns files newer than the last processed file.
+        Arguments:
+            last_processed_key: Name of the last processed file, or None if no file is processed yet.
+        Return: List of DiscoveredFiles ordered by date.
+        """
+
+        if not last_processed_key:
+            return list(self.files)
+        start = bisect_left(self.dates, get_file_date(last_processed_key))
+        sort_key = get_file_sort_key(DiscoveredFile(last_processed_key, None))
+        while (
+            start < len(self.files) and get_file_sort_key(self.files[start]) <= sort_key
+        ):
+            start += 1
+        return self.files[start:]
+
+
+def is_file_name_valid(file_name) -> bool:
+    """
+    Function that check wheather the exchange rates file name is valid.
+    File name is valid if its exstension matches with the one defined in the conversion contstants,
+    if it contains two underscore characters, and string between two underscores is number.
+    Return: True, if the file name is valid. Otherwise false.
+    """
+
+    return (
+        file_name.endswith(cc.CURRENCY_RATES_FILE_EXTENSION)
+        and file_name.count("_") == 2
+        and file_name.split("_")[1].isnumeric()
+    )
+
+
+def get_file_date(file_name) -> int:
+    """
+    Function that returns the date of the exchange rates file from its name section
+    between two underscores, which represents date in the format of YYMMDD.
+    Arguments:
+        file_name: Valid exchange rates file name.
+    Return: Date as number.
+    """
+
+    return int(file_name.split("_")[1])
+
+
+def get_file_sort_key(discovered_file: DiscoveredFile) -> tuple:
+    """
+    Function that returns the key by which the exchange rates files are ordered,
+    which is their date, and their name for the files of the same date.
+    Arguments:
+        discovered_file: DiscoveredFile with valid file name.
+    Return: Tuple of date and file name.
+    """
+
+    return get_file_date(discovered_file.key), discovered_file.key
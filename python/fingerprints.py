@@ -0,0 +1,75 @@
+import hashlib
+
+FINGERPRINT_DIGEST_SIZE = 8
+
+
+def get_fingerprint(data) -> dict:
+    """
+    Function that creates compact fingerprint of the imported exchange rates,
+    which contains short digest of every detail record by its source currency code.
+    Arguments:
+        data: RequestModel containing data from the file.
+    Return: Fingerprint as JSON serializable dict.
+    """
+
+    return {
+        "date": data.header.date if data.header else None,
+        "records": {
+            str(record.source_currency_code): get_record_digest(record)
+            for record in data.detail_records
+        },
+    }
+
+
+def get_record_digest(record) -> str:
+    """
+    Function that returns short digest of the detail record, computed from its JSON sent to API.
+    Arguments:
+        record: DetailRecordModel.
+    Return: Digest as hex string.
+    """
+
+    return hashlib.blake2b(
+        record.to_wire().encode("utf-8"), digest_size=FINGERPRINT_DIGEST_SIZE
+    ).hexdigest()
+
+
+def get_exchange_rates_delta(
+    baseline: dict, fingerprint: dict, detail_records, base_currency_number: int
+):
+    """
+    Function that compares the fingerprint of the new exchange rates with the fingerprint
+    of the last imported ones, per currency.
+    API stores rates of all the currencies relative to the base currency,
+    so the delta can not be used if the base currency rate has changed.
+    Arguments:
+        baseline: Fingerprint of the last imported exchange rates, or None if there is none.
+        fingerprint: Fingerprint of the new exchange rates.
+        detail_records: Detail records of the new exchange rates.
+        base_currency_number: Number of the base currency of the API.
+    Return: Tuple of detail records which are changed or added, including the base currency one,
+        and sorted codes of removed currencies, or None if the full import is needed.
+    """
+
+    if not baseline or not baseline.get("records"):
+        return None
+    baseline_records = baseline["records"]
+    records = fingerprint["records"]
+    base_currency_code = str(base_currency_number)
+    if (
+        base_currency_code not in records
+        or baseline_records.get(base_currency_code) != records[base_currency_code]
+    ):
+        return None
+
+    changed_records = [
+        record
+        for record in detail_records
+        if record.source_currency_code == base_currency_number
+        or baseline_records.get(str(record.source_currency_code))
+        != records[str(record.source_currency_code)]
+    ]
+    removed_currency_codes = sorted(
+        int(code) for code in baseline_records.keys() - records.keys()
+    )
+    return changed_records, removed_currency_codes
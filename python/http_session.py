@@ -0,0 +1,183 @@
+import logging
+import random
+import time
+from collections import deque, namedtuple
+from http import HTTPStatus
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+
+from instrumentation import get_run_metrics
+
+logger = logging.getLogger()
+
+AttemptMetric = namedtuple(
+    "AttemptMetric", ["method", "url", "attempt", "status_code", "latency", "error"]
+)
+
+RETRY_STATUS_CODES = frozenset(
+    [
+        HTTPStatus.TOO_MANY_REQUESTS,
+        HTTPStatus.BAD_GATEWAY,
+        HTTPStatus.SERVICE_UNAVAILABLE,
+        HTTPStatus.GATEWAY_TIMEOUT,
+    ]
+)
+# status codes of responses to non-idempotent requests, which tell the request was not processed
+NON_IDEMPOTENT_RETRY_STATUS_CODES = frozenset(
+    [HTTPStatus.TOO_MANY_REQUESTS, HTTPStatus.SERVICE_UNAVAILABLE]
+)
+IDEMPOTENT_METHODS = frozenset(["GET", "HEAD", "OPTIONS", "PUT", "DELETE"])
+MAX_ATTEMPT_METRICS = 1000
+
+
+class RetryingHttpSession:
+    """
+    Class representing HTTP session to the API, which keeps pooled connections
+    open between the requests, and retries failed requests with exponential backoff
+    and full jitter. Idempotent requests are retried on connection errors, timeouts
+    and RETRY_STATUS_CODES. Non-idempotent requests, such as POST, are retried only when
+    they were not sent, because the connection could not be established,
+    or on NON_IDEMPOTENT_RETRY_STATUS_CODES, so the API never processes them twice.
+    Latency of every attempt is recorded in attempt_metrics.
+    """
+
+    def __init__(
+        self,
+        pool_size: int,
+        timeout: float,
+        max_retries: int,
+        backoff_base: float,
+        backoff_max: float,
+        keep_alive: bool = True,
+    ):
+        """
+        Arguments:
+            pool_size: Maximum number of pooled connections.
+            timeout: Connect and read timeout of the request, in seconds.
+            max_retries: Maximum number of retries after the first attempt.
+            backoff_base: Backoff before the first retry, in seconds. Doubled on every retry.
+            backoff_max: Maximum backoff, in seconds.
+            keep_alive: Whether the connections are kept open between the requests.
+        """
+
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.attempt_metrics = deque(maxlen=MAX_ATTEMPT_METRICS)
+        self.session = requests.Session()
+        self.session.verify = False
+        if not keep_alive:
+            self.session.headers["Connection"] = "close"
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def request(self, method: str, url: str, data=None, **kwargs) -> requests.Response:
+        """
+        Function that sends the request, retrying it on failure.
+        Arguments:
+            method: HTTP method.
+            url: Url of the request.
+            data: Request body, or function creating the request body, which is called
+                for every attempt, so generator bodies can be sent again.
+            kwargs: Other arguments of the requests request.
+        Return: Response of the last attempt.
+        Raises: Connection error or timeout of the last attempt, if there is no response,
+            or of the first attempt which can not be retried.
+        """
+
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+        retry_status_codes = (
+            RETRY_STATUS_CODES if idempotent else NON_IDEMPOTENT_RETRY_STATUS_CODES
+        )
+        for attempt in range(self.max_retries + 1):
+            start = time.perf_counter()
+            res = None
+            error = None
+            try:
+                res = self.session.request(
+                    method,
+                    url,
+                    data=data() if callable(data) else data,
+                    timeout=self.timeout,
+                    **kwargs,
+                )
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+            self.attempt_metrics.append(
+                AttemptMetric(
+                    method=method,
+                    url=url,
+                    attempt=attempt,
+                    status_code=res.status_code if res is not None else None,
+                    latency=time.perf_counter() - start,
+                    error=repr(error) if error else None,
+                )
+            )
+
+            if res is not None and res.status_code not in retry_status_codes:
+                return res
+            if (
+                error is not None
+                and not idempotent
+                and not is_error_before_sending(error)
+            ):
+                raise error
+            if attempt == self.max_retries:
+                break
+            get_run_metrics().count("api_retries")
+            backoff = random.uniform(
+                0, min(self.backoff_max, self.backoff_base * 2**attempt)
+            )
+            logger.warning(
+                f"{method} {url} failed with {res.status_code if res is not None else error}, "
+                f"retrying in {backoff:.2f}s"
+            )
+            time.sleep(backoff)
+
+        if res is None:
+            raise error
+        return res
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """
+        Function that sends GET request, retrying it on failure.
+        """
+
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, data=None, **kwargs) -> requests.Response:
+        """
+        Function that sends POST request, retrying it on failure.
+        """
+
+        return self.request("POST", url, data=data, **kwargs)
+
+    def close(self):
+        """
+        Function that closes all pooled connections.
+        """
+
+        self.session.close()
+
+
+def is_error_before_sending(error: Exception) -> bool:
+    """
+    Function that checks if the request failed before it was sent,
+    because the connection to the server could not be established.
+    Arguments:
+        error: Connection error or timeout of the request.
+    Return: True if the request was not sent. Otherwise False.
+    """
+
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    if not isinstance(error, requests.ConnectionError) or not error.args:
+        return False
+    reason = error.args[0]
+    if isinstance(reason, MaxRetryError):
+        reason = reason.reason
+    return isinstance(reason, NewConnectionError)
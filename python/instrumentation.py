@@ -0,0 +1,338 @@
+import json
+import logging
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+
+import conversion_constants as cc
+from record_filter import get_rejected_records
+
+logger = logging.getLogger()
+
+# stage context of the disabled metrics, shared so no object is created per stage
+DISABLED_STAGE = nullcontext()
+
+
+class RunMetrics:
+    """
+    Class representing metrics of a single import run: durations of the stages,
+    and counts such as bytes, records and retries, summed over all the files of the run.
+    Streamed stages overlap, so parse duration includes waiting for the streamed download,
+    and POST duration includes serialization of the streamed request body.
+    Metrics can be added from any thread, and returned from worker processes.
+    """
+
+    enabled = True
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.durations = defaultdict(float)
+        self.counts = defaultdict(int)
+
+    def __getstate__(self):
+        return {"durations": self.durations, "counts": self.counts}
+
+    def __setstate__(self, state):
+        self.__init__()
+        self.durations.update(state["durations"])
+        self.counts.update(state["counts"])
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Function that measures the duration of the stage, which is run in the context.
+        Arguments:
+            name: Stage name.
+        """
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_duration(name, time.perf_counter() - start)
+
+    def add_duration(self, name: str, duration: float):
+        """
+        Function that adds the duration to the stage.
+        Arguments:
+            name: Stage name.
+            duration: Duration in seconds.
+        """
+
+        with self.lock:
+            self.durations[name] += duration
+
+    def count(self, name: str, value: int = 1):
+        """
+        Function that adds the value to the count.
+        Arguments:
+            name: Count name, ending with _bytes for byte counts.
+            value: Value added to the count.
+        """
+
+        with self.lock:
+            self.counts[name] += value
+
+    def merge(self, metrics):
+        """
+        Function that adds durations and counts of the other metrics, such as the ones
+        collected in the worker process, to these metrics.
+        Arguments:
+            metrics: RunMetrics, or DisabledRunMetrics which add nothing.
+        """
+
+        if not metrics.enabled:
+            return
+        for name, duration in metrics.durations.items():
+            self.add_duration(name, duration)
+        for name, value in metrics.counts.items():
+            self.count(name, value)
+
+    def iter_stage(self, name: str, chunks):
+        """
+        Generator that measures the duration of reading the chunks as the stage,
+        and counts their bytes.
+        Arguments:
+            name: Stage name.
+            chunks: Iterable of bytes chunks, such as streamed download.
+        Yields: Chunks.
+        """
+
+        chunks = iter(chunks)
+        while True:
+            start = time.perf_counter()
+            chunk = next(chunks, None)
+            self.add_duration(name, time.perf_counter() - start)
+            if chunk is None:
+                return
+            self.count(f"{name}_bytes", len(chunk))
+            yield chunk
+
+    def to_emf(self, namespace: str, operation: str) -> dict:
+        """
+        Function that creates the summary of the run in CloudWatch Embedded Metric Format.
+        Arguments:
+            namespace: CloudWatch metrics namespace.
+            operation: Name of the run operation, used as the metrics dimension.
+        Return: EMF document.
+        """
+
+        values = {
+            f"{name}_duration": round(duration * 1000, 3)
+            for name, duration in self.durations.items()
+        }
+        values.update(self.counts)
+        return {
+            "_aws": {
+                "Timestamp": int(time.time() * 1000),
+                "CloudWatchMetrics": [
+                    {
+                        "Namespace": namespace,
+                        "Dimensions": [["Operation"]],
+                        "Metrics": [
+                            {"Name": name, "Unit": get_metric_unit(name)}
+                            for name in values
+                        ],
+                    }
+                ],
+            },
+            "Operation": operation,
+            **values,
+        }
+
+
+class DisabledRunMetrics:
+    """
+    Class representing metrics of the run which is not instrumented.
+    Every method does nothing, so the instrumented code pays only a method call.
+    """
+
+    enabled = False
+
+    def stage(self, name: str):
+        """
+        Function that returns the shared context which measures nothing.
+        """
+
+        return DISABLED_STAGE
+
+    def add_duration(self, name: str, duration: float):
+        """
+        Function that ignores the duration.
+        """
+
+    def count(self, name: str, value: int = 1):
+        """
+        Function that ignores the count.
+        """
+
+    def merge(self, metrics):
+        """
+        Function that ignores the other metrics.
+        """
+
+    def iter_stage(self, name: str, chunks):
+        """
+        Function that returns the chunks as they are.
+        """
+
+        return chunks
+
+
+DISABLED_RUN_METRICS = DisabledRunMetrics()
+run_metrics = DISABLED_RUN_METRICS
+
+
+def get_run_metrics():
+    """
+    Function that returns metrics of the current import run.
+    Return: RunMetrics, or DisabledRunMetrics if the run is not instrumented.
+    """
+
+    return run_metrics
+
+
+def get_metric_unit(name: str) -> str:
+    """
+    Function that returns CloudWatch unit of the metric.
+    Arguments:
+        name: Metric name.
+    Return: Metric unit.
+    """
+
+    if name.endswith("_duration"):
+        return "Milliseconds"
+    if name.endswith("_bytes"):
+        return "Bytes"
+    return "Count"
+
+
+@contextmanager
+def instrumented_run(config, operation: str):
+    """
+    Function that instruments the import run in the context. If IMPORT_METRICS is set,
+    metrics of the run are collected, and written to stdout as a single
+    Embedded Metric Format document when the run ends. If IMPORT_PROFILE is set to cprofile
+    or tracemalloc, the run is profiled, and the top functions by cumulative time,
+    or the top allocation sites, are logged.
+    Arguments:
+        config: Importer configuration.
+        operation: Name of the run operation.
+    Yields: Metrics of the run.
+    """
+
+    global run_metrics
+    if not config.import_metrics and not config.import_profile:
+        yield DISABLED_RUN_METRICS
+        return
+
+    metrics = RunMetrics() if config.import_metrics else DISABLED_RUN_METRICS
+    rejected_before = get_rejected_records()
+    profiler = start_profiler(config.import_profile)
+    run_metrics = metrics
+    start = time.perf_counter()
+    try:
+        yield metrics
+    finally:
+        metrics.add_duration("run", time.perf_counter() - start)
+        run_metrics = DISABLED_RUN_METRICS
+        stop_profiler(config.import_profile, profiler, metrics)
+        if metrics.enabled:
+            count_rejected_records(metrics, rejected_before)
+            sys.stdout.write(
+                json.dumps(metrics.to_emf(config.import_metrics_namespace, operation))
+                + "\n"
+            )
+            sys.stdout.flush()
+
+
+@contextmanager
+def worker_run(enabled: bool):
+    """
+    Function that collects metrics of the work done in the context of the worker process,
+    including the records rejected by its filters, so they can be returned
+    to the parent process and merged into the metrics of its run.
+    Arguments:
+        enabled: Whether the run of the parent process collects metrics.
+    Yields: Metrics of the worker, RunMetrics, or DisabledRunMetrics if not enabled.
+    """
+
+    global run_metrics
+    metrics = RunMetrics() if enabled else DISABLED_RUN_METRICS
+    rejected_before = get_rejected_records()
+    run_metrics = metrics
+    try:
+        yield metrics
+    finally:
+        run_metrics = DISABLED_RUN_METRICS
+        if metrics.enabled:
+            count_rejected_records(metrics, rejected_before)
+
+
+def count_rejected_records(metrics: RunMetrics, rejected_before):
+    """
+    Function that counts detail records rejected by the filters since the run started, by rule.
+    Arguments:
+        metrics: Metrics of the run.
+        rejected_before: Counter of rejected records by rule, when the run started.
+    """
+
+    for rule, rejected in (get_rejected_records() - rejected_before).items():
+        metrics.count(f"records_rejected_{rule}", rejected)
+
+
+def start_profiler(profile: str):
+    """
+    Function that starts the profiler.
+    Arguments:
+        profile: Profiler name, cprofile or tracemalloc, or empty if the run is not profiled.
+    Return: cProfile profiler, or None for the other profilers.
+    """
+
+    if profile == "cprofile":
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+    if profile == "tracemalloc":
+        import tracemalloc
+
+        tracemalloc.start()
+    return None
+
+
+def stop_profiler(profile: str, profiler, metrics):
+    """
+    Function that stops the profiler, and logs its results.
+    Peak traced memory is added to the metrics when traced by tracemalloc.
+    Arguments:
+        profile: Profiler name, cprofile or tracemalloc, or empty if the run is not profiled.
+        profiler: cProfile profiler, or None for the other profilers.
+        metrics: Metrics of the run.
+    """
+
+    if profile == "cprofile":
+        import io
+        import pstats
+
+        profiler.disable()
+        stream = io.StringIO()
+        pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(
+            cc.IMPORT_PROFILE_TOP_ENTRIES
+        )
+        logger.info(f"Import run profile:\n{stream.getvalue()}")
+    elif profile == "tracemalloc":
+        import tracemalloc
+
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        metrics.count("peak_traced_memory_bytes", peak)
+        top_stats = snapshot.statistics("lineno")[: cc.IMPORT_PROFILE_TOP_ENTRIES]
+        logger.info(
+            f"Import run peak traced memory: {peak} bytes, top allocations:\n"
+            + "\n".join(str(stat) for stat in top_stats)
+        )
@@ -1,462 +1,1103 @@
+import argparse
+import gzip
+import hashlib
+import json
 import logging
-from datetime import datetime
+import os
+import time
+import zlib
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from http import HTTPStatus
-from os import environ, listdir, stat
-
-import boto3
-import jsonpickle
-import requests
+from typing import TYPE_CHECKING
+from urllib.parse import unquote_plus
 
+import buffer_parser
 import conversion_constants as cc
-from models import DetailRecordModel, HeaderModel, RequestModel, TrailerModel
+import parallel_parser
+from buffer_parser import (
+    IMPROPER_FILE_FORMAT_ERROR,
+    iter_file_lines,
+    log_error_and_return,
+    stream_detail_records,
+)
+from file_discovery import (
+    DiscoveredFile,
+    FileCatalog,
+    get_file_sort_key,
+    is_file_name_valid,
+)
+from fingerprints import get_exchange_rates_delta, get_fingerprint
+from instrumentation import get_run_metrics, instrumented_run, worker_run
+from models import (
+    DetailRecordModel,
+    ImportBatchModel,
+    ImportCommitModel,
+    ImportDeltaModel,
+    RequestModel,
+)
+from runtime import get_runtime_context, reset_runtime_context
+from s3_reader import iter_object_parts
+
+# boto3 and requests are loaded by the runtime context on the first use of S3 and the API,
+# so they are not imported at cold start by the code paths which do not need them
+if TYPE_CHECKING:
+    import requests
+
+    from http_session import RetryingHttpSession
 
 logger = logging.getLogger()
 logger.setLevel(logging.DEBUG)
-run_on_aws = True if environ.get("IMPORT_RATES_URL") else False
-import_rates_url = (
-    environ.get("IMPORT_RATES_URL") if run_on_aws else cc.IMPORT_RATES_URL
-)
-currency_rates_file_name = ""
-s3_session = boto3.Session(
-    aws_access_key_id=environ.get("ACCESS_KEY_ID"),
-    aws_secret_access_key=environ.get("SECRET_ACCESS_KEY"),
+BackfillSummary = namedtuple(
+    "BackfillSummary", ["files", "imported_files", "records", "elapsed"]
 )
+EventFile = namedtuple("EventFile", ["file", "message_id"])
+ParsedFile = namedtuple("ParsedFile", ["data", "metrics"])
 
 
 def lambda_handler(event, context):
     """
     Funtction that processes events.
+    S3 ObjectCreated events, directly or wrapped in SQS messages, import exactly
+    the files which arrived. Other events, such as scheduled ones, import the latest
+    file found on the bucket.
     Arguments:
         event: The event dict that contains the parameters sent when the function is invoked.
         context: The context in which the function is called.
-    Return: The result of the action.
+    Return: The result of the action, which reports the SQS messages whose files
+        failed to import, or None if the latest file is imported.
     """
-    import_rates()
 
+    with instrumented_run(get_runtime_context().config, "lambda_handler"):
+        with get_run_metrics().stage("discovery"):
+            event_files = get_event_files(event)
+        if event_files is None:
+            import_rates()
+            return None
+
+        failed_message_ids = []
+        for event_file in import_event_files(event_files):
+            if (
+                event_file.message_id
+                and event_file.message_id not in failed_message_ids
+            ):
+                failed_message_ids.append(event_file.message_id)
+    return {
+        "batchItemFailures": [
+            {"itemIdentifier": message_id} for message_id in failed_message_ids
+        ]
+    }
 
-def import_rates():
+
+def import_rates(parallel: bool = False):
     """
     Function that imports exchange rates to the API.
+    Arguments:
+        parallel: Whether a large file can be parsed in parallel worker processes,
+            which is requested by the local runs only.
     """
 
     logger.info("Importing exchange rates...")
-    data = get_exchange_rates_for_import()
-    if data.error:
-        logger.error("Aborting exchange rates import because of the error")
+    runtime_context = get_runtime_context()
+    with get_run_metrics().stage("discovery"):
+        currency_rates_file = get_currency_rates_file()
+    if (
+        not currency_rates_file
+        and runtime_context.config.run_on_aws
+        and runtime_context.file_discovery.get_last_processed_key()
+    ):
+        logger.info("No exchange rates file newer than the last processed one")
         return
-    json_data = jsonpickle.encode(get_exchange_rates_for_import(), unpicklable=False)
-    res = requests.post(
-        import_rates_url,
-        data=json_data,
-        verify=False,
-        headers={"Content-Type": "application/json"},
+
+    file_name = currency_rates_file.key if currency_rates_file else None
+    digest = get_content_digest(currency_rates_file)
+    if is_content_imported(currency_rates_file, digest):
+        return
+
+    data = get_exchange_rates_for_import(file_name, parallel)
+    if import_parsed_exchange_rates(data, digest):
+        if runtime_context.config.run_on_aws:
+            runtime_context.file_discovery.save_last_processed_key(file_name)
+
+
+def import_event_files(event_files: list) -> list:
+    """
+    Function that imports exchange rates from the files which arrived with the event.
+    Files are downloaded and parsed concurrently by at most EVENT_MAX_WORKERS workers,
+    and imported in date order, so the rates of the later file are imported last.
+    Import of the earlier files overlaps download and parse of the later ones,
+    so the asynchronous pipeline of backfill is not used for the event. Files are parsed
+    in threads, since worker processes are not forked for the event import.
+    Arguments:
+        event_files: List of EventFiles.
+    Return: List of EventFiles which failed to import.
+    """
+
+    runtime_context = get_runtime_context()
+    logger.info(f"Importing exchange rates from {len(event_files)} arrived files...")
+    failed_files = []
+    imported_files = []
+    max_workers = max(
+        min(runtime_context.config.event_max_workers, len(event_files)), 1
     )
-    if res.status_code == HTTPStatus.OK:
-        logger.info("Exchange rates imported successfully")
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        parsed_files = []
+        for event_file in sorted(
+            event_files, key=lambda event_file: get_file_sort_key(event_file.file)
+        ):
+            digest = get_content_digest(event_file.file)
+            if not is_content_imported(event_file.file, digest):
+                parsed_files.append(
+                    (
+                        event_file,
+                        digest,
+                        executor.submit(
+                            get_exchange_rates_for_import, event_file.file.key
+                        ),
+                    )
+                )
+
+        for event_file, digest, parsed in parsed_files:
+            try:
+                data = parsed.result()
+            except Exception:
+                logger.exception(f"Error reading {event_file.file.key}")
+                failed_files.append(event_file)
+                continue
+            if import_parsed_file(event_file.file.key, data, digest):
+                imported_files.append(event_file.file)
+            else:
+                failed_files.append(event_file)
+
+    if imported_files and runtime_context.config.run_on_aws:
+        save_latest_processed_file(imported_files)
+    return failed_files
+
+
+def get_event_files(event) -> list:
+    """
+    Function that finds the exchange rates files which arrived with the event.
+    Files are found in S3 ObjectCreated event records, which can be delivered directly,
+    or wrapped in SQS messages, optionally through SNS notifications.
+    Files with invalid names, and files on other buckets, are left out.
+    Arguments:
+        event: The event dict that contains the parameters sent when the function is invoked.
+    Return: List of EventFiles in the order of arrival, without duplicates,
+        or None if the event contains no records, such as scheduled event.
+    """
+
+    if not isinstance(event, dict) or not event.get("Records"):
+        return None
+
+    event_files = {}
+    for record in event["Records"]:
+        for event_file in get_event_record_files(record, None):
+            event_files.setdefault(event_file.file.key, event_file)
+    return list(event_files.values())
+
+
+def get_event_record_files(record: dict, message_id: str):
+    """
+    Generator that finds the exchange rates files in the event record.
+    Arguments:
+        record: S3 or SQS event record.
+        message_id: Id of the SQS message containing the record,
+            or None if the record is not delivered through SQS.
+    Yields: EventFiles.
+    """
+
+    event_source = record.get("eventSource")
+    if event_source == "aws:sqs":
+        try:
+            body = json.loads(record["body"])
+            if body.get("Type") == "Notification":
+                body = json.loads(body["Message"])
+        except (KeyError, ValueError, AttributeError):
+            logger.warning(f"Unsupported SQS message {record.get('messageId')}")
+            return
+        for s3_record in body.get("Records", []):
+            yield from get_event_record_files(s3_record, record.get("messageId"))
+    elif event_source == "aws:s3":
+        if not record.get("eventName", "").startswith("ObjectCreated:"):
+            return
+        bucket_name = record["s3"]["bucket"]["name"]
+        s3_object = record["s3"]["object"]
+        key = unquote_plus(s3_object["key"])
+        config_bucket_name = get_runtime_context().config.s3_bucket_name
+        if config_bucket_name and bucket_name != config_bucket_name:
+            logger.warning(f"Skipping {key} on other bucket {bucket_name}")
+        elif not is_file_name_valid(key):
+            logger.warning(f"Skipping {key} with invalid exchange rates file name")
+        else:
+            yield EventFile(
+                DiscoveredFile(key, s3_object.get("size"), s3_object.get("eTag")),
+                message_id,
+            )
     else:
-        logger.error("Error importing exchange rates")
-        logger.error(f"Status code: {res.status_code}")
-        logger.error(res.text)
+        logger.warning(f"Unsupported event record source {event_source}")
 
 
-def get_exchange_rates_for_import():
+def get_content_digest(currency_rates_file: DiscoveredFile) -> str:
     """
-    Function that reads and processes the file.
-    Return: Exchange rates for import
+    Function that returns the digest of the file content, if already imported content is skipped.
+    Arguments:
+        currency_rates_file: DiscoveredFile, or None if there is no file.
+    Return: Digest of the file content, or None if already imported content is not skipped.
     """
 
-    if not file_exists_and_not_empty():
-        return log_error_and_return("File does not exist or it is empty")
+    if currency_rates_file and get_runtime_context().config.import_rates_dedup:
+        return get_file_digest(currency_rates_file)
+    return None
 
-    if not run_on_aws:
-        with open(
-            cc.CURRENCY_RATES_FILE_PATH + currency_rates_file_name, mode="rt"
-        ) as file:
-            return process_file(file.readlines())
-    else:
-        file = (
-            s3_session.client("s3")
-            .get_object(
-                Bucket=environ.get("S3_BUCKET_NAME"), Key=currency_rates_file_name
-            )["Body"]
-            .read()
-            .decode("utf-8")
-            .splitlines()
+
+def is_content_imported(currency_rates_file: DiscoveredFile, digest: str) -> bool:
+    """
+    Function that checks whether the file content is already imported.
+    Arguments:
+        currency_rates_file: DiscoveredFile.
+        digest: Digest of the file content, or None if already imported content is not skipped.
+    Return: True if the file content is already imported. Otherwise False.
+    """
+
+    if digest and get_runtime_context().imported_digests.contains(digest):
+        logger.info(
+            f"Content of {currency_rates_file.key} is already imported, skipping"
         )
-        return process_file(file)
+        return True
+    return False
 
 
-def log_error_and_return(error_message: str) -> RequestModel:
+def import_parsed_file(file_name: str, data: RequestModel, digest: str) -> bool:
     """
-    Function that logs error and creates RequestModel containing error message.
+    Function that imports the exchange rates parsed from one of several files.
+    Error raised by the import, such as the connection error which is left
+    after the retries, is logged and fails only this file, so the other files are still imported.
     Arguments:
-        error_message: Error message.
-    Return: RequestModel containing error message.
+        file_name: Exchange rates file name.
+        data: RequestModel containing data from the file.
+        digest: Digest of the file content, or None if already imported content is not skipped.
+    Return: True if the exchange rates are imported. Otherwise False.
     """
 
-    ret = RequestModel(header=None, detail_records=[], trailer=None, error=None)
-    logger.error(error_message)
-    ret.error = error_message
-    return ret
+    try:
+        return import_parsed_exchange_rates(data, digest)
+    except Exception:
+        logger.exception(f"Error importing {file_name}")
+        get_run_metrics().count("files_failed")
+        return False
 
 
-def process_file(file_lines) -> RequestModel:
+def import_parsed_exchange_rates(data: RequestModel, digest: str) -> bool:
     """
-    Function processes file lines into RequestModel.
+    Function that imports the exchange rates parsed from the file,
+    and stores the digest of the imported file content.
     Arguments:
-        file_lines: file lines
-    Return: RequestModel containing data from file lines.
+        data: RequestModel containing data from the file.
+        digest: Digest of the file content, or None if already imported content is not skipped.
+    Return: True if the exchange rates are imported. Otherwise False.
     """
 
-    ret = RequestModel(header=None, detail_records=[], trailer=None, error=None)
-    file_lines = [line for line in (line.strip() for line in file_lines) if line]
+    if data.error:
+        logger.error("Aborting exchange rates import because of the error")
+        get_run_metrics().count("files_failed")
+        return False
+    if not import_exchange_rates(data):
+        get_run_metrics().count("files_failed")
+        return False
+    logger.info("Exchange rates imported successfully")
+    get_run_metrics().count("files_imported")
+    if digest:
+        get_runtime_context().imported_digests.add(digest)
+    return True
 
-    if not is_file_format_valid(file_lines):
-        return log_error_and_return("Improper file format")
 
-    ret.header = convert_file_line_to_header(file_lines[0])
-    ret.trailer = convert_file_line_to_trailer(file_lines[-1])
-    if ret.trailer.total_records != len(file_lines) - 2:
-        return log_error_and_return(
-            "Number of data records does not match with trailer"
+def save_latest_processed_file(processed_files: list):
+    """
+    Function that stores the latest of the processed files to the manifest,
+    unless a later file is already processed.
+    Arguments:
+        processed_files: List of processed DiscoveredFiles.
+    """
+
+    file_discovery = get_runtime_context().file_discovery
+    latest_file = max(processed_files, key=get_file_sort_key)
+    last_processed_key = file_discovery.get_last_processed_key()
+    if not last_processed_key or get_file_sort_key(latest_file) > get_file_sort_key(
+        DiscoveredFile(last_processed_key, None)
+    ):
+        file_discovery.save_last_processed_key(latest_file.key)
+
+
+def backfill(
+    start_date: int, end_date: int, pipelined: bool = False
+) -> BackfillSummary:
+    """
+    Function that imports all exchange rates files between two dates.
+    Files are parsed in parallel worker processes, or in the asynchronous pipeline
+    which overlaps download, parse and import of the files, and imported in date order,
+    so the rates of the later file are imported last.
+    Arguments:
+        start_date: Date of the first file, as number in the format of YYMMDD.
+        end_date: Date of the last file, as number in the format of YYMMDD.
+        pipelined: Whether the files are imported in the asynchronous pipeline.
+    Return: BackfillSummary.
+    """
+
+    discovered_files = get_file_catalog().between(start_date, end_date)
+    file_names = [discovered_file.key for discovered_file in discovered_files]
+    logger.info(f"Backfilling {len(file_names)} exchange rates files...")
+    start = time.perf_counter()
+    if pipelined:
+        imported_files, records = import_files_in_pipeline(discovered_files)
+    else:
+        imported_files, records = import_files_in_worker_processes(discovered_files)
+
+    summary = BackfillSummary(
+        files=len(file_names),
+        imported_files=imported_files,
+        records=records,
+        elapsed=time.perf_counter() - start,
+    )
+    logger.info(
+        f"Backfilled {summary.imported_files} of {summary.files} files "
+        f"and {summary.records} records in {summary.elapsed:.2f}s "
+        f"({summary.imported_files / summary.elapsed:.2f} files/s, "
+        f"{summary.records / summary.elapsed:.0f} records/s)"
+    )
+    return summary
+
+
+def import_files_in_worker_processes(discovered_files: list) -> tuple:
+    """
+    Function that parses the files in parallel worker processes, and imports them in order.
+    Parsing runs at most BACKFILL_FILES_PER_WORKER files per worker ahead of the import,
+    so only these are held in memory. Metrics of the workers are merged into the parent process,
+    which stores the digests of the imported files, and the latest imported file to the manifest.
+    Arguments:
+        discovered_files: DiscoveredFiles, in the order of import.
+    Return: Tuple of number of imported files and detail records.
+    """
+
+    # multiprocessing is loaded only when the files are parsed in worker processes
+    from concurrent.futures import ProcessPoolExecutor
+
+    imported_files = []
+    instrumented = get_run_metrics().enabled
+    max_workers = max(
+        min(parallel_parser.get_available_cores(), len(discovered_files)), 1
+    )
+    with ProcessPoolExecutor(
+        max_workers=max_workers, initializer=reset_runtime_context, initargs=(False,)
+    ) as executor:
+        pending = deque()
+        for discovered_file in discovered_files:
+            pending.append(
+                (
+                    discovered_file,
+                    executor.submit(
+                        parse_backfilled_file, discovered_file, instrumented
+                    ),
+                )
+            )
+            if len(pending) >= max_workers * cc.BACKFILL_FILES_PER_WORKER:
+                import_backfilled_file(*pending.popleft(), imported_files)
+        while pending:
+            import_backfilled_file(*pending.popleft(), imported_files)
+
+    if imported_files and get_runtime_context().config.run_on_aws:
+        save_latest_processed_file(
+            [discovered_file for discovered_file, _ in imported_files]
         )
+    return len(imported_files), sum(records for _, records in imported_files)
 
-    # skip header and trailer
-    for line in file_lines[1:-1]:
-        detail_record = convert_file_line_to_detail_record(line)
-        if is_data_record_allowed(detail_record):
-            ret.detail_records.append(detail_record)
 
-    if not is_hash_valid(ret):
-        return log_error_and_return("Hash do not match")
+def parse_backfilled_file(discovered_file: DiscoveredFile, instrumented: bool):
+    """
+    Function that parses the exchange rates file in the backfill worker process.
+    Worker process has its own metrics and record filters, so the metrics of the parse,
+    including the rejected records, are returned with the data.
+    Arguments:
+        discovered_file: DiscoveredFile.
+        instrumented: Whether the run of the parent process collects metrics.
+    Return: ParsedFile.
+    """
 
-    return ret
+    with worker_run(instrumented) as metrics:
+        # files are already parsed in parallel, one per worker
+        data = get_exchange_rates_for_import(discovered_file.key, batch=True)
+    return ParsedFile(data, metrics)
 
 
-def file_exists_and_not_empty() -> bool:
+def import_backfilled_file(
+    discovered_file: DiscoveredFile, parsed, imported_files: list
+):
     """
-    Function that checks whether the file exists and whether it is empty.
-    Return: True if the file exists and it is not empty. False otherwise.
+    Function that imports the exchange rates file parsed in the worker process during the backfill,
+    merges the metrics of the worker into the run, and stores the digest of the imported file content.
+    Arguments:
+        discovered_file: DiscoveredFile.
+        parsed: Future of ParsedFile.
+        imported_files: List of tuples of imported DiscoveredFile and its number of detail records,
+            to which the file is added if it is imported.
     """
-    if run_on_aws:
-        return file_exists_and_not_empty_aws()
 
-    return file_exists_and_not_empty_local_file_storage()
+    parsed_file = parsed.result()
+    get_run_metrics().merge(parsed_file.metrics)
+    if import_parsed_file(
+        discovered_file.key, parsed_file.data, get_content_digest(discovered_file)
+    ):
+        logger.info(f"Exchange rates from {discovered_file.key} imported successfully")
+        imported_files.append((discovered_file, len(parsed_file.data.detail_records)))
+    else:
+        logger.error(f"Skipping {discovered_file.key} because of the error")
 
 
-def file_exists_and_not_empty_aws() -> bool:
+def import_files_in_pipeline(
+    discovered_files: list, queue_size: int = cc.PIPELINE_QUEUE_SIZE
+) -> tuple:
     """
-    Function that checks whether the file exists on AWS S3 bucket, and whether it is empty.
-    Return: True if the file exists and it is not empty. False otherwise.
+    Function that imports the files in order in the asynchronous pipeline, which overlaps
+    download, parse and import of the files. Digests of the imported files are stored,
+    and the latest imported file to the manifest, the same way as in the backfill
+    in worker processes.
+    Arguments:
+        discovered_files: DiscoveredFiles, in the order of import.
+        queue_size: Maximum number of files waiting between two stages of the pipeline.
+    Return: Tuple of number of imported files and detail records.
     """
 
-    rates_bucket = s3_session.resource("s3").Bucket(environ.get("S3_BUCKET_NAME"))
-    file_names = [
-        file.key
-        for file in rates_bucket.objects.all()
-        if is_file_name_valid(file.key) and int(file.get()["ContentLength"])
-    ]
+    # asyncio is loaded only for the pipelined backfill
+    import asyncio
 
-    if not file_names:
-        return False
+    import async_pipeline
 
-    set_currency_rates_file_name(file_names)
+    imported_files, records = asyncio.run(
+        async_pipeline.import_files_async(
+            discovered_files,
+            read_file_content,
+            parse_file_content,
+            import_pipelined_file,
+            queue_size,
+        )
+    )
+    if imported_files and get_runtime_context().config.run_on_aws:
+        save_latest_processed_file(imported_files)
+    return len(imported_files), records
 
-    return True
 
+def read_file_content(file_name: str) -> bytes:
+    """
+    Function that downloads the whole file content.
+    Arguments:
+        file_name: Exchange rates file name.
+    Return: File content.
+    """
 
-def file_exists_and_not_empty_local_file_storage() -> bool:
+    metrics = get_run_metrics()
+    if not get_runtime_context().config.run_on_aws:
+        with metrics.stage("download"), open(
+            cc.CURRENCY_RATES_FILE_PATH + file_name, mode="rb"
+        ) as file:
+            content = file.read()
+        metrics.count("download_bytes", len(content))
+        return content
+    chunks, _ = get_s3_object_chunks(file_name)
+    return b"".join(metrics.iter_stage("download", chunks))
+
+
+def parse_file_content(content: bytes) -> RequestModel:
     """
-    Function that checks whether the file exists on local file storage, and whether it is empty.
-    Return: True if the file exists and it is not empty. False otherwise.
+    Function that parses the whole file content in the asynchronous pipeline.
+    Content is parsed in the thread of the pipeline, and never in worker processes,
+    since forking from the thread can deadlock. Large files are decoded all at once,
+    see is_batch_decode_worthwhile.
+    Arguments:
+        content: File content.
+    Return: RequestModel containing data from the file content.
     """
 
-    file_names = [
-        file_name
-        for file_name in listdir(cc.CURRENCY_RATES_FILE_PATH)
-        if is_file_name_valid(file_name)
-    ]
+    with get_run_metrics().stage("parse"):
+        if is_batch_decode_worthwhile(len(content)):
+            import batch_decoder
 
-    if not file_names:
-        return False
+            return batch_decoder.process_buffer_batch(content)
+        return buffer_parser.process_buffer(content)
 
-    set_currency_rates_file_name(file_names)
 
-    if stat(currency_rates_file_name).st_size == 0:
-        return False
-    return True
+def import_pipelined_file(discovered_file: DiscoveredFile, data: RequestModel) -> bool:
+    """
+    Function that imports the file parsed in the asynchronous pipeline,
+    and stores the digest of its content.
+    Arguments:
+        discovered_file: DiscoveredFile.
+        data: RequestModel containing data from the file.
+    Return: True if the exchange rates are imported. Otherwise False.
+    """
 
+    digest = None if data.error else get_content_digest(discovered_file)
+    return import_parsed_file(discovered_file.key, data, digest)
 
-def is_file_name_valid(file_name) -> bool:
+
+def import_exchange_rates(data: RequestModel) -> bool:
     """
-    Function that check wheather the exchange rates file name is valid.
-    File name is valid if its exstension matches with the one defined in the conversion contstants,
-    if it contains two underscore characters, and string between two underscores is number.
-    Return: True, if the file name is valid. Otherwise false.
+    Function that imports exchange rates to the API, either in batches or in a single request.
+    In delta mode only the currencies which changed since the last import are sent,
+    falling back to the full import if there is no last import to compare with.
+    Arguments:
+        data: Data to be sent to API.
+    Return: True if exchange rates are imported. Otherwise False.
     """
 
-    return (
-        file_name.endswith(cc.CURRENCY_RATES_FILE_EXTENSION)
-        and file_name.count("_") == 2
-        and file_name.split("_")[1].isnumeric()
+    runtime_context = get_runtime_context()
+    config = runtime_context.config
+    if not config.import_rates_delta:
+        return import_all_exchange_rates(data)
+
+    fingerprint = get_fingerprint(data)
+    delta = get_exchange_rates_delta(
+        runtime_context.fingerprint_store.load(),
+        fingerprint,
+        data.detail_records,
+        config.base_currency_number,
     )
+    if delta is None:
+        logger.info("No comparable last import, importing all exchange rates")
+        imported = import_all_exchange_rates(data)
+    else:
+        imported = import_rates_delta(data, *delta) or import_all_exchange_rates(data)
+    if imported:
+        runtime_context.fingerprint_store.save(fingerprint)
+    return imported
 
 
-def set_currency_rates_file_name(file_names):
+def import_all_exchange_rates(data: RequestModel) -> bool:
     """
-    Function that sets the latest currency file name from the list of possible file names.
-    Latest file name is determined from its name section between two underscores, which
-    represents date in the format of YYMMDD.
+    Function that imports all the exchange rates to the API, either in batches or in a single request.
     Arguments:
-        file_lines: File lines.
+        data: Data to be sent to API.
+    Return: True if exchange rates are imported. Otherwise False.
     """
 
-    global currency_rates_file_name
-    for file_name in file_names:
-        if not currency_rates_file_name:
-            currency_rates_file_name = file_name
-        elif int(file_name.split("_")[1]) > int(currency_rates_file_name.split("_")[1]):
-            currency_rates_file_name = file_name
-    logger.info(f"Exchange rates file name: {currency_rates_file_name}")
+    config = get_runtime_context().config
+    if config.import_rates_batch_size:
+        return import_rates_in_batches(data, config.import_rates_batch_size)
+    return import_rates_in_single_request(data)
 
 
-def is_file_format_valid(file_lines) -> bool:
+def import_rates_delta(
+    data: RequestModel, changed_records: list, removed_currency_codes: list
+) -> bool:
     """
-    Function check whether the file lines are in correct format.
-    File format is valid if the first line is header line, last line is trailer line,
-    and in between are only detail record lines.
+    Function that imports only the exchange rates which changed since the last import.
     Arguments:
-        file_lines: File lines.
-    Return: True if the file format is valid. Otherwise false.
+        data: Data to be sent to API.
+        changed_records: Changed and added detail records, including the base currency one.
+        removed_currency_codes: Codes of the currencies which are not in the data anymore.
+    Return: True if exchange rates are imported. Otherwise False.
     """
 
-    if not file_lines:
-        logger.error("No file lines")
-        return False
-    if (
-        len([line for line in file_lines if line.startswith(cc.HEADER_DESCRIPTION)])
-        != 1
-    ):
-        logger.error("Number of header lines in file is not 1")
-        return False
-    if (
-        len([line for line in file_lines if line.startswith(cc.TRAILER_DESCRIPTION)])
-        != 1
-    ):
-        logger.error("Number of trailer lines in file is not 1")
-        return False
-    if not file_lines[0].startswith(cc.HEADER_DESCRIPTION):
-        logger.error("First line in the file is not the header")
-        return False
-    if not file_lines[-1].startswith(cc.TRAILER_DESCRIPTION):
-        logger.error("Last line in the file is not the trailer")
+    logger.info(
+        f"Importing {len(changed_records)} changed and {len(removed_currency_codes)} "
+        f"removed of {len(data.detail_records)} exchange rates"
+    )
+    runtime_context = get_runtime_context()
+    return post_import_request(
+        runtime_context.http_session,
+        runtime_context.config.import_rates_url + cc.IMPORT_RATES_DELTA_PATH,
+        ImportDeltaModel(
+            data.header, changed_records, removed_currency_codes, data.trailer
+        ),
+        "Error importing exchange rates delta",
+    )
+
+
+def import_rates_in_single_request(data: RequestModel) -> bool:
+    """
+    Function that imports all the exchange rates to the API in a single request.
+    Arguments:
+        data: Data to be sent to API.
+    Return: True if exchange rates are imported. Otherwise False.
+    """
+
+    # generator body is sent with chunked transfer encoding,
+    # and it is created again for every attempt
+    runtime_context = get_runtime_context()
+    config = runtime_context.config
+    with get_run_metrics().stage("post"):
+        res = runtime_context.http_session.post(
+            config.import_rates_url,
+            data=lambda: iter_request_body(data, config.import_rates_gzip),
+            headers=get_import_request_headers(),
+        )
+    return is_response_ok(res, "Error importing exchange rates")
+
+
+def import_rates_in_batches(data: RequestModel, batch_size: int) -> bool:
+    """
+    Function that imports exchange rates to the API in batches of detail records.
+    Batches belong to the import session whose id is derived from the file, so when
+    the import is repeated after failure, batches already received by the API are
+    not sent again. Batches are sent concurrently over pooled connections, with at most
+    IMPORT_RATES_MAX_IN_FLIGHT requests in flight, and the session is committed
+    once all the batches are received.
+    Arguments:
+        data: Data to be sent to API.
+        batch_size: Number of detail records per batch.
+    Return: True if exchange rates are imported. Otherwise False.
+    """
+
+    runtime_context = get_runtime_context()
+    config = runtime_context.config
+    session_id = get_import_session_id(data, batch_size)
+    batches = [
+        data.detail_records[start : start + batch_size]
+        for start in range(0, len(data.detail_records), batch_size)
+    ]
+    session = runtime_context.http_session
+    received_sequence_numbers = get_received_import_batches(session, session_id)
+    sequence_numbers = [
+        sequence_number
+        for sequence_number in range(len(batches))
+        if sequence_number not in received_sequence_numbers
+    ]
+    logger.info(
+        f"Import session {session_id}: sending {len(sequence_numbers)} of {len(batches)} batches"
+    )
+
+    def post_batch(sequence_number: int) -> bool:
+        # failed batch leaves the session uncommitted, while the other batches are still sent
+        try:
+            return post_import_request(
+                session,
+                config.import_rates_url + cc.IMPORT_RATES_BATCH_PATH,
+                ImportBatchModel(session_id, sequence_number, batches[sequence_number]),
+                f"Error importing exchange rates batch {sequence_number}",
+            )
+        except Exception:
+            logger.exception(f"Error importing exchange rates batch {sequence_number}")
+            return False
+
+    with ThreadPoolExecutor(max_workers=config.import_rates_max_in_flight) as executor:
+        sent = list(executor.map(post_batch, sequence_numbers))
+    if not all(sent):
+        logger.error(
+            f"Import session {session_id} is not committed, because not all batches are imported"
+        )
         return False
-    if len(
+
+    return post_import_request(
+        session,
+        config.import_rates_url + cc.IMPORT_RATES_COMMIT_PATH,
+        ImportCommitModel(session_id, len(batches), data.header, data.trailer),
+        f"Error committing import session {session_id}",
+    )
+
+
+def get_import_session_id(data: RequestModel, batch_size: int) -> str:
+    """
+    Function that derives import session id from the file header and trailer,
+    and the batch size, so the repeated import of the same file resumes the same session.
+    Arguments:
+        data: Data to be sent to API.
+        batch_size: Number of detail records per batch.
+    Return: Import session id.
+    """
+
+    file_id = "|".join(
         [
-            line
-            for line in file_lines[1:-1]
-            if not line.startswith(cc.DETAIL_DESCRIPTION)
+            data.header.to_wire() if data.header else "",
+            data.trailer.to_wire() if data.trailer else "",
+            str(batch_size),
         ]
-    ):
-        logger.error("Not all lines except the first and last one are detail records")
-        return False
-
-    return True
+    )
+    return hashlib.sha256(file_id.encode("utf-8")).hexdigest()[:32]
 
 
-def is_data_record_allowed(data_record: DetailRecordModel) -> bool:
+def get_received_import_batches(session: "RetryingHttpSession", session_id: str) -> set:
     """
-    Function that check wheather the data record is allowed to be sent to API.
-    Data record is allowed if its reference currency code is in the list of
-    allowed reference codes defined in conversion constants,
-    if its rate class is in the list of
-    allowed rate classes defined in conversion constants,
-    if its format indicator is in the list of
-    allowed format indicators in conversion constants
-    and its source currency code is in the list of
-    allowed source codes defined in conversion constants.
+    Function that gets sequence numbers of the batches API already received for the import session.
     Arguments:
-        data_record: Data record.
-    Return: True if the data record is allowed. Otherwise False.
+        session: HTTP session.
+        session_id: Import session id.
+    Return: Set of received batch sequence numbers. Empty if the session is unknown.
     """
 
-    return (
-        data_record != None
-        and data_record.reference_currency_code in cc.ALLOWED_REFERENCE_CURRENCY_CODES
-        and data_record.rate_class in cc.ALLOWED_RATE_CLASSES
-        and data_record.rate_format_indicator in cc.ALLOWED_RATE_FORMAT_INDICATORS
-        and data_record.source_currency_code not in cc.NOT_ALLOWED_SOURCE_CURRENCY_CODES
+    res = session.get(
+        get_runtime_context().config.import_rates_url
+        + cc.IMPORT_RATES_SESSION_PATH
+        + session_id
     )
+    if res.status_code != HTTPStatus.OK:
+        return set()
+    return set(res.json().get("received_sequence_numbers", []))
 
 
-def is_hash_valid(data: RequestModel) -> bool:
+def post_import_request(
+    session: "RetryingHttpSession", url: str, request_model, error_message: str
+) -> bool:
     """
-    Function that checks weather the total hash is valid.
+    Function that posts the request model as JSON to the API, compressing it with gzip if configured.
     Arguments:
-        data: Data to be sent to API.
-    Return: True if the total hash is valid.
+        session: HTTP session.
+        url: Url to post to.
+        request_model: Model of the request, serialized with its to_wire function.
+        error_message: Message logged if the request is not successful.
+    Return: True if the request is successful. Otherwise False.
     """
 
-    # after conulting with Taryn, hash check is a good idea but a bit of a an overkill for this project
-    return True
+    metrics = get_run_metrics()
+    with metrics.stage("serialization"):
+        body = request_model.to_wire().encode("utf-8")
+        if get_runtime_context().config.import_rates_gzip:
+            body = gzip.compress(body)
+    metrics.count("post_bytes", len(body))
+    with metrics.stage("post"):
+        res = session.post(url, data=body, headers=get_import_request_headers())
+    return is_response_ok(res, error_message)
 
 
-def convert_file_line_to_header(file_line: str) -> HeaderModel:
+def get_import_request_headers() -> dict:
+    """
+    Function that returns headers of the requests importing exchange rates.
+    Return: Request headers.
     """
-    Function that converts file line to HeaderModel.
+
+    headers = {"Content-Type": "application/json"}
+    if get_runtime_context().config.import_rates_gzip:
+        headers["Content-Encoding"] = "gzip"
+    return headers
+
+
+def is_response_ok(res: "requests.Response", error_message: str) -> bool:
+    """
+    Function that checks whether the API response is successful, and logs the error if it is not.
     Arguments:
-        file_line: File line.
-    Return: HeaderModel containing data from file line.
+        res: API response.
+        error_message: Message logged if the response is not successful.
+    Return: True if the response is successful. Otherwise False.
     """
 
-    if not file_line or len(file_line) < cc.HEADER_FORMAT_VERSION_POSITION + 1:
-        logger.error("Header length improper")
-        return None
-    elif (
-        file_line[
-            cc.HEADER_FORMAT_VERSION_POSITION : cc.HEADER_FORMAT_VERSION_POSITION + 1
-        ]
-        != cc.HEADER_FORMAT_VERSION
-    ):
-        logger.error("Header format unsupported")
-        return None
-    try:
-        date = datetime.strptime(
-            file_line[
-                cc.HEADER_DATETIME_START_POSITION : cc.HEADER_DATETIME_END_POSITION + 1
-            ],
-            cc.HEADER_DATETIME_FORMAT,
-        )
-        return HeaderModel(date=str(date))
-    except:
-        logger.error("Header datetime improper format")
-        return None
+    if res.status_code == HTTPStatus.OK:
+        return True
+    logger.error(error_message)
+    logger.error(f"Status code: {res.status_code}")
+    logger.error(res.text)
+    return False
 
 
-def convert_file_line_to_detail_record(file_line: str) -> DetailRecordModel:
+def iter_request_body(data: RequestModel, compress: bool = False):
     """
-    Function that converts file line to DetailRecordModel.
+    Generator that encodes the request to JSON in chunks of IMPORT_RATES_CHUNK_SIZE bytes,
+    optionally compressed with gzip, so the serialized request is never held in memory.
+    Time spent creating the chunks is measured as serialization stage.
     Arguments:
-        file_line: File line.
-    Return: DetailRecordModel containing data from file line.
+        data: Data to be sent to API.
+        compress: Whether the chunks are compressed with gzip.
+    Yields: Request body chunks.
     """
 
-    if (
-        file_line == None
-        or len(file_line) < cc.SELL_CURRENCY_CONVERSION_RATE_END_POSSITION + 1
-    ):
-        logger.error("Detail record length improper")
-        return None
+    metrics = get_run_metrics()
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16) if compress else None
+    parts = []
+    parts_size = 0
+    start = time.perf_counter()
+    for part in data.iter_wire():
+        parts.append(part)
+        parts_size += len(part)
+        if parts_size < cc.IMPORT_RATES_CHUNK_SIZE:
+            continue
+        chunk = "".join(parts).encode("utf-8")
+        parts.clear()
+        parts_size = 0
+        if compressor:
+            chunk = compressor.compress(chunk)
+        if chunk:
+            metrics.add_duration("serialization", time.perf_counter() - start)
+            metrics.count("post_bytes", len(chunk))
+            yield chunk
+            start = time.perf_counter()
+
+    chunk = "".join(parts).encode("utf-8")
+    if compressor:
+        chunk = compressor.compress(chunk) + compressor.flush()
+    metrics.add_duration("serialization", time.perf_counter() - start)
+    if chunk:
+        metrics.count("post_bytes", len(chunk))
+        yield chunk
+
+
+def get_exchange_rates_for_import(
+    file_name: str, parallel: bool = False, batch: bool = False
+):
+    """
+    Function that reads and processes the file.
+    If parallel parse is requested, files of PARALLEL_PARSE_MIN_FILE_SIZE or larger
+    are parsed in parallel worker processes. It is requested only by local runs and backfill,
+    since worker processes can not be started on AWS Lambda, which has no shared memory,
+    and forking from the threads importing event files can deadlock.
+    If batch decode is requested, files of BATCH_DECODE_MIN_FILE_SIZE or larger
+    are decoded all at once with NumPy, see is_batch_decode_worthwhile.
+    Arguments:
+        file_name: Exchange rates file name, or None if there is no file.
+        parallel: Whether large files can be parsed in parallel.
+        batch: Whether large files can be decoded all at once.
+    Return: Exchange rates for import
+    """
 
-    source_currency_number = file_line[
-        cc.SOURCE_CURRENCY_START_POSSITION : cc.SOURCE_CURRENCY_END_POSSITION + 1
-    ]
-    reference_currency_code = file_line[
-        cc.REFERENCE_CURRENCY_START_POSSITION : cc.REFERENCE_CURRENCY_END_POSSITION + 1
-    ]
-    source_currency_exponent = file_line[
-        cc.SOURCE_CURRENCY_EXPONENT_START_POSSITION : cc.SOURCE_CURRENCY_EXPONENT_END_POSSITION
-        + 1
-    ]
-    rate_class = file_line[
-        cc.RATE_CLASS_START_POSSITION : cc.RATE_CLASS_END_POSSITION + 1
-    ]
-    rate_format_indicator = file_line[
-        cc.RATE_FORMAT_INDICATOR_CLASS_START_POSSITION : cc.RATE_FORMAT_INDICATOR_CLASS_END_POSSITION
-        + 1
-    ]
-    buy_currency_conversion_rate = file_line[
-        cc.BUY_CURRENCY_CONVERSION_RATE_START_POSSITION : cc.BUY_CURRENCY_CONVERSION_RATE_END_POSSITION
-        + 1
-    ]
-    mid_currency_conversion_rate = file_line[
-        cc.MID_CURRENCY_CONVERSION_RATE_START_POSSITION : cc.MID_CURRENCY_CONVERSION_RATE_END_POSSITION
-        + 1
-    ]
-    sell_currency_conversion_rate = file_line[
-        cc.SELL_CURRENCY_CONVERSION_RATE_START_POSSITION : cc.SELL_CURRENCY_CONVERSION_RATE_END_POSSITION
-        + 1
-    ]
+    if not file_name:
+        return log_error_and_return("File does not exist or it is empty")
 
-    try:
-        record = DetailRecordModel(
-            source_currency_number=int(source_currency_number),
-            reference_currency_number=int(reference_currency_code),
-            source_currency_exponent=int(source_currency_exponent),
-            rate_class=rate_class,
-            rate_format_indicator=rate_format_indicator,
-            buy_currency_conversion_rate=convert_exchange_rate(
-                buy_currency_conversion_rate
-            ),
-            mid_currency_conversion_rate=convert_exchange_rate(
-                mid_currency_conversion_rate
-            ),
-            sell_currency_conversion_rate=convert_exchange_rate(
-                sell_currency_conversion_rate
+    runtime_context = get_runtime_context()
+    metrics = get_run_metrics()
+    if not runtime_context.config.run_on_aws:
+        file_path = cc.CURRENCY_RATES_FILE_PATH + file_name
+        file_size = os.path.getsize(file_path)
+        # local file is memory-mapped by the parser, so only its size is counted as download
+        metrics.count("download_bytes", file_size)
+        with metrics.stage("parse"):
+            if parallel and is_parallel_parse_worthwhile(file_size):
+                data = parallel_parser.process_file_parallel(file_path)
+            elif batch and is_batch_decode_worthwhile(file_size):
+                import batch_decoder
+
+                data = batch_decoder.process_local_file_batch(file_path)
+            else:
+                data = buffer_parser.process_local_file(file_path)
+    else:
+        chunks, file_size = get_s3_object_chunks(file_name)
+        chunks = metrics.iter_stage("download", chunks)
+        with metrics.stage("parse"):
+            if parallel and is_parallel_parse_worthwhile(file_size):
+                data = parallel_parser.process_file_parallel(b"".join(chunks))
+            elif batch and is_batch_decode_worthwhile(file_size):
+                import batch_decoder
+
+                data = batch_decoder.process_buffer_batch(b"".join(chunks))
+            else:
+                data = buffer_parser.process_chunks(chunks)
+
+    if not data.error:
+        metrics.count("records_read", data.trailer.total_records)
+        metrics.count("records_accepted", len(data.detail_records))
+    return data
+
+
+def get_s3_object_chunks(file_name: str) -> tuple:
+    """
+    Function that opens the exchange rates file on AWS S3 bucket for streaming download,
+    so its content can be parsed while it is downloaded.
+    Files of S3_RANGED_GET_MIN_FILE_SIZE or larger are downloaded in parts
+    with parallel ranged GET requests.
+    Arguments:
+        file_name: Exchange rates file name.
+    Return: Tuple of iterator of the file content chunks, and the file size.
+    """
+
+    runtime_context = get_runtime_context()
+    config = runtime_context.config
+    metrics = get_run_metrics()
+    with metrics.stage("download"):
+        s3_object = runtime_context.s3_client.get_object(
+            Bucket=config.s3_bucket_name, Key=file_name
+        )
+    metrics.count(
+        "download_retries",
+        s3_object.get("ResponseMetadata", {}).get("RetryAttempts", 0),
+    )
+    file_size = s3_object["ContentLength"]
+    if file_size >= config.s3_ranged_get_min_file_size:
+        return (
+            iter_object_parts(
+                runtime_context.s3_client,
+                config.s3_bucket_name,
+                file_name,
+                s3_object,
+                cc.S3_RANGED_GET_PART_SIZE,
+                config.s3_ranged_get_max_in_flight,
             ),
+            file_size,
         )
-        return record
-    except:
-        logger.error(f"Improper data record: {file_line}")
-        return None
+    return s3_object["Body"].iter_chunks(cc.S3_READ_CHUNK_SIZE), file_size
 
 
-def convert_exchange_rate(conversion_rate: str) -> float:
+def is_parallel_parse_worthwhile(file_size: int) -> bool:
     """
-    Function that converts exchange rate as found in exchange
-    rates file, to the float.
+    Function that checks whether the file is large enough to be parsed in parallel.
     Arguments:
-        conversion_rate: Conversion rate to be converted to float.
-    Return: Exchange rate as float.
+        file_size: Size of the file in bytes.
+    Return: True if the file is parsed in parallel. Otherwise False.
     """
 
-    # letting exceptions be caught by calling method
-    if not conversion_rate or len(conversion_rate) != (
-        cc.CURRENCY_COVERSION_INTEGER_PLACES + cc.CURRENCY_COVERSION_DECIMAL_PLACES
-    ):
-        logger.error("Conversion rate improper length")
-        raise Exception()
-    return float(
-        conversion_rate[: cc.CURRENCY_COVERSION_INTEGER_PLACES]
-        + "."
-        + conversion_rate[cc.CURRENCY_COVERSION_INTEGER_PLACES :]
+    return (
+        file_size >= get_runtime_context().config.parallel_parse_min_file_size
+        and parallel_parser.get_available_cores() > 1
     )
 
 
-def convert_file_line_to_trailer(file_line: str) -> TrailerModel:
+def is_batch_decode_worthwhile(file_size: int) -> bool:
     """
-    Function that converts file line to TrailerModel.
+    Function that checks whether the file is large enough to be decoded all at once with NumPy.
+    NumPy is imported only by the backfill, which pays for its import once per process,
+    and it is optional, so without it all files are parsed by buffer_parser.
     Arguments:
-        file_line: File line.
-    Return: TrailerModel containing data from file line.
+        file_size: Size of the file in bytes.
+    Return: True if the file is decoded all at once. Otherwise False.
     """
 
-    if file_line == None or len(file_line) < cc.TRAILER_HASH_TOTAL_END_POSITION + 1:
-        logger.error("Trailer length improper")
-        return None
-    try:
-        return TrailerModel(
-            total_records=int(
-                file_line[
-                    cc.TRAILER_TOTAL_RECORDS_START_POSITION : cc.TRAILER_TOTAL_RECORDS_END_POSITION
-                    + 1
-                ]
-            ),
-            hash_total=int(
-                file_line[
-                    cc.TRAILER_HASH_TOTAL_START_POSITION : cc.TRAILER_HASH_TOTAL_END_POSITION
-                    + 1
-                ]
-            ),
-        )
-    except:
-        logger.error("Trailer total records or hash improper format")
+    if file_size < get_runtime_context().config.batch_decode_min_file_size:
+        return False
+    # importlib.util is loaded only when the file is large enough
+    import importlib.util
+
+    return importlib.util.find_spec("numpy") is not None
+
+
+def file_exists_and_not_empty() -> bool:
+    """
+    Function that checks whether the file exists and whether it is empty.
+    Return: True if the file exists and it is not empty. False otherwise.
+    """
+
+    return get_currency_rates_file() is not None
+
+
+def get_currency_rates_file() -> DiscoveredFile:
+    """
+    Function that finds the latest not empty exchange rates file,
+    either on AWS S3 bucket or on local file storage.
+    Latest file is determined from its name section between two underscores, which
+    represents date in the format of YYMMDD.
+    Return: DiscoveredFile, or None if there is no such file.
+    """
+
+    runtime_context = get_runtime_context()
+    if runtime_context.config.run_on_aws:
+        latest_file = runtime_context.file_discovery.find_latest_file()
+    else:
+        latest_file = get_file_catalog().latest()
+
+    if not latest_file:
         return None
 
+    logger.info(f"Exchange rates file name: {latest_file.key}")
+    return latest_file
+
+
+def get_file_digest(currency_rates_file: DiscoveredFile) -> str:
+    """
+    Function that returns digest of the exchange rates file content, without parsing it.
+    On AWS S3 bucket the object ETag is used, which is read from the bucket listing,
+    or from the object metadata if the listing did not return it.
+    On local file storage SHA-256 of the file bytes is computed, reading the file in chunks.
+    Arguments:
+        currency_rates_file: DiscoveredFile.
+    Return: Digest, prefixed with the name of the algorithm.
+    """
+
+    runtime_context = get_runtime_context()
+    if runtime_context.config.run_on_aws:
+        etag = currency_rates_file.etag or runtime_context.s3_client.head_object(
+            Bucket=runtime_context.config.s3_bucket_name, Key=currency_rates_file.key
+        )["ETag"].strip('"')
+        return "etag:" + etag
+
+    sha256 = hashlib.sha256()
+    with open(cc.CURRENCY_RATES_FILE_PATH + currency_rates_file.key, mode="rb") as file:
+        for chunk in iter(lambda: file.read(cc.IMPORT_RATES_CHUNK_SIZE), b""):
+            sha256.update(chunk)
+    return "sha256:" + sha256.hexdigest()
+
+
+def get_file_catalog() -> FileCatalog:
+    """
+    Function that creates catalog of all exchange rates files,
+    either on AWS S3 bucket or on local file storage.
+    Return: FileCatalog.
+    """
+
+    runtime_context = get_runtime_context()
+    if runtime_context.config.run_on_aws:
+        return FileCatalog(runtime_context.file_discovery.list_files())
+    return FileCatalog.from_local_file_storage(cc.CURRENCY_RATES_FILE_PATH)
+
+
+def is_file_format_valid(file_lines) -> bool:
+    """
+    Function check whether the file lines are in correct format.
+    File format is valid if the first line is header line, last line is trailer line,
+    and in between are only detail record lines.
+    Arguments:
+        file_lines: File lines.
+    Return: True if the file format is valid. Otherwise false.
+    """
+
+    if not file_lines:
+        logger.error("No file lines")
+        return False
+
+    request = RequestModel(header=None, detail_records=[], trailer=None, error=None)
+    for _ in stream_detail_records(iter_file_lines(file_lines), request):
+        pass
+    return request.error != IMPROPER_FILE_FORMAT_ERROR
+
+
+def is_data_record_allowed(data_record: DetailRecordModel) -> bool:
+    """
+    Function that check wheather the data record is allowed to be sent to API.
+    Data record is allowed if its reference currency code is in the set of
+    allowed reference codes of the configured filter rules,
+    if its rate class is in the set of
+    allowed rate classes of the configured filter rules,
+    if its format indicator is in the set of
+    allowed format indicators of the configured filter rules
+    and its source currency code is not in the set of
+    not allowed source codes of the configured filter rules.
+    File lines are checked by the same rules with RecordFilter, before they are converted.
+    Arguments:
+        data_record: Data record.
+    Return: True if the data record is allowed. Otherwise False.
+    """
+
+    rules = get_runtime_context().config.record_filter_rules
+    return (
+        data_record != None
+        and data_record.reference_currency_code
+        in rules.allowed_reference_currency_codes
+        and data_record.rate_class in rules.allowed_rate_classes
+        and data_record.rate_format_indicator in rules.allowed_rate_format_indicators
+        and data_record.source_currency_code
+        not in rules.not_allowed_source_currency_codes
+    )
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="Imports exchange rates to the API.")
+    parser.add_argument(
+        "--backfill",
+        nargs=2,
+        type=int,
+        metavar=("START_DATE", "END_DATE"),
+        help="import all files between two dates, in the format of YYMMDD",
+    )
+    parser.add_argument(
+        "--async-pipeline",
+        action="store_true",
+        help="overlap download, parse and import of the backfilled files",
+    )
+    arguments = parser.parse_args(arguments)
+    config = get_runtime_context().config
+    if arguments.backfill:
+        with instrumented_run(config, "backfill"):
+            backfill(*arguments.backfill, pipelined=arguments.async_pipeline)
+    else:
+        with instrumented_run(config, "import_rates"):
+            import_rates(parallel=True)
 
-def main():
-    import_rates()
 
+# configuration is loaded during the Lambda initialization, so the invalid
+# configuration fails the deployment instead of the first import run
+if os.environ.get("AWS_LAMBDA_FUNCTION_NAME"):
+    get_runtime_context()
 
 if __name__ == "__main__":
     main()
@@ -1,17 +1,50 @@
+from json.encoder import encode_basestring_ascii
+
+import conversion_constants as cc
+
+
 class HeaderModel:
     """
     Class representing header row in exchange rates file.
     """
 
+    __slots__ = ("date",)
+    WIRE_FORMAT = '{"date": %s}'
+
     def __init__(self, date):
         self.date = date
 
+    def to_wire(self) -> str:
+        """
+        Function that serializes the header to JSON sent to API.
+        Return: JSON string.
+        """
+
+        return self.WIRE_FORMAT % encode_nullable_string(self.date)
+
 
 class DetailRecordModel:
     """
     Class representing detail record row in exchange rates file.
     """
 
+    __slots__ = (
+        "source_currency_code",
+        "reference_currency_code",
+        "source_currency_exponent",
+        "rate_class",
+        "rate_format_indicator",
+        "buy_currency_conversion_rate",
+        "mid_currency_conversion_rate",
+        "sell_currency_conversion_rate",
+    )
+    WIRE_FORMAT = (
+        '{"source_currency_code": %d, "reference_currency_code": %d, '
+        '"source_currency_exponent": %d, "rate_class": %s, "rate_format_indicator": %s, '
+        '"buy_currency_conversion_rate": %s, "mid_currency_conversion_rate": %s, '
+        '"sell_currency_conversion_rate": %s}'
+    )
+
     def __init__(
         self,
         source_currency_number,
@@ -32,16 +65,44 @@ class DetailRecordModel:
         self.mid_currency_conversion_rate = mid_currency_conversion_rate
         self.sell_currency_conversion_rate = sell_currency_conversion_rate
 
+    def to_wire(self) -> str:
+        """
+        Function that serializes the detail record to JSON sent to API.
+        Return: JSON string.
+        """
+
+        return self.WIRE_FORMAT % (
+            self.source_currency_code,
+            self.reference_currency_code,
+            self.source_currency_exponent,
+            encode_nullable_string(self.rate_class),
+            encode_nullable_string(self.rate_format_indicator),
+            format_exchange_rate(self.buy_currency_conversion_rate),
+            format_exchange_rate(self.mid_currency_conversion_rate),
+            format_exchange_rate(self.sell_currency_conversion_rate),
+        )
+
 
 class TrailerModel:
     """
     Class representing trailer row in exchange rates file.
     """
 
+    __slots__ = ("total_records", "hash_total")
+    WIRE_FORMAT = '{"total_records": %d, "hash_total": %d}'
+
     def __init__(self, total_records, hash_total):
         self.total_records = total_records
         self.hash_total = hash_total
 
+    def to_wire(self) -> str:
+        """
+        Function that serializes the trailer to JSON sent to API.
+        Return: JSON string.
+        """
+
+        return self.WIRE_FORMAT % (self.total_records, self.hash_total)
+
 
 class RequestModel:
     """
@@ -49,8 +110,175 @@ class RequestModel:
     the file, which are going to be sent to API.
     """
 
+    __slots__ = ("header", "detail_records", "trailer", "error")
+    WIRE_FORMAT = '{"header": %s, "detail_records": [%s], "trailer": %s, "error": %s}'
+
     def __init__(self, header, detail_records, trailer, error):
         self.header = header
         self.detail_records = detail_records
         self.trailer = trailer
         self.error = error
+
+    def to_wire(self) -> str:
+        """
+        Function that serializes the request to JSON sent to API.
+        JSON has the same shape as the one previously produced by jsonpickle.
+        Return: JSON string.
+        """
+
+        return self.WIRE_FORMAT % (
+            self.header.to_wire() if self.header else "null",
+            ", ".join([record.to_wire() for record in self.detail_records]),
+            self.trailer.to_wire() if self.trailer else "null",
+            encode_nullable_string(self.error),
+        )
+
+    def iter_wire(self):
+        """
+        Generator that serializes the request to JSON sent to API in parts,
+        so the whole JSON is never held in memory.
+        Detail records can be any iterable, including the generator which fills
+        header, trailer and error of the request while it is consumed,
+        since the header is serialized after the first detail record is read,
+        and the trailer and error after the last one.
+        Yields: Parts of JSON string.
+        """
+
+        detail_records = iter(self.detail_records)
+        detail_record = next(detail_records, None)
+        yield '{"header": %s, "detail_records": [' % (
+            self.header.to_wire() if self.header else "null"
+        )
+        if detail_record is not None:
+            yield detail_record.to_wire()
+            for detail_record in detail_records:
+                yield ", " + detail_record.to_wire()
+        yield '], "trailer": %s, "error": %s}' % (
+            self.trailer.to_wire() if self.trailer else "null",
+            encode_nullable_string(self.error),
+        )
+
+
+class ImportBatchModel:
+    """
+    Class representing model which contains batch of detail records
+    sent to API as a part of the import session.
+    """
+
+    __slots__ = ("session_id", "sequence_number", "detail_records")
+    WIRE_FORMAT = '{"session_id": %s, "sequence_number": %d, "detail_records": [%s]}'
+
+    def __init__(self, session_id, sequence_number, detail_records):
+        self.session_id = session_id
+        self.sequence_number = sequence_number
+        self.detail_records = detail_records
+
+    def to_wire(self) -> str:
+        """
+        Function that serializes the batch to JSON sent to API.
+        Return: JSON string.
+        """
+
+        return self.WIRE_FORMAT % (
+            encode_nullable_string(self.session_id),
+            self.sequence_number,
+            ", ".join([record.to_wire() for record in self.detail_records]),
+        )
+
+
+class ImportCommitModel:
+    """
+    Class representing model which commits the import session,
+    once all its batches are sent to API.
+    """
+
+    __slots__ = ("session_id", "batch_count", "header", "trailer")
+    WIRE_FORMAT = '{"session_id": %s, "batch_count": %d, "header": %s, "trailer": %s}'
+
+    def __init__(self, session_id, batch_count, header, trailer):
+        self.session_id = session_id
+        self.batch_count = batch_count
+        self.header = header
+        self.trailer = trailer
+
+    def to_wire(self) -> str:
+        """
+        Function that serializes the commit to JSON sent to API.
+        Return: JSON string.
+        """
+
+        return self.WIRE_FORMAT % (
+            encode_nullable_string(self.session_id),
+            self.batch_count,
+            self.header.to_wire() if self.header else "null",
+            self.trailer.to_wire() if self.trailer else "null",
+        )
+
+
+class ImportDeltaModel:
+    """
+    Class representing model which contains only the exchange rates
+    which changed since the last import.
+    """
+
+    __slots__ = ("header", "detail_records", "removed_currency_codes", "trailer")
+    WIRE_FORMAT = (
+        '{"header": %s, "detail_records": [%s], '
+        '"removed_currency_codes": [%s], "trailer": %s}'
+    )
+
+    def __init__(self, header, detail_records, removed_currency_codes, trailer):
+        self.header = header
+        self.detail_records = detail_records
+        self.removed_currency_codes = removed_currency_codes
+        self.trailer = trailer
+
+    def to_wire(self) -> str:
+        """
+        Function that serializes the delta to JSON sent to API.
+        Return: JSON string.
+        """
+
+        return self.WIRE_FORMAT % (
+            self.header.to_wire() if self.header else "null",
+            ", ".join([record.to_wire() for record in self.detail_records]),
+            ", ".join([str(code) for code in self.removed_currency_codes]),
+            self.trailer.to_wire() if self.trailer else "null",
+        )
+
+
+def encode_nullable_string(value) -> str:
+    """
+    Function that encodes string value as JSON.
+    Arguments:
+        value: String value or None.
+    Return: JSON string, or null if the value is None.
+    """
+
+    return "null" if value is None else encode_basestring_ascii(value)
+
+
+def format_exchange_rate(conversion_rate) -> str:
+    """
+    Function that formats exchange rate as JSON number.
+    Arguments:
+        conversion_rate: Exchange rate as float, or as fixed point integer.
+    Return: JSON number string.
+    """
+
+    if isinstance(conversion_rate, float):
+        return float.__repr__(conversion_rate)
+    return format_fixed_point_exchange_rate(conversion_rate)
+
+
+def format_fixed_point_exchange_rate(conversion_rate: int) -> str:
+    """
+    Function that formats fixed point exchange rate as exact decimal number.
+    Arguments:
+        conversion_rate: Exchange rate as fixed point integer.
+    Return: Exchange rate as decimal number string, e.g. 1367.5
+    """
+
+    integer_part, decimal_part = divmod(conversion_rate, cc.EXCHANGE_RATE_SCALE)
+    decimal_part = f"{decimal_part:0{cc.CURRENCY_COVERSION_DECIMAL_PLACES}d}"
+    return f"{integer_part}.{decimal_part.rstrip('0') or '0'}"
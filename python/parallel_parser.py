@@ -0,0 +1,329 @@
+import logging
+import mmap
+import os
+from collections import namedtuple
+from operator import attrgetter
+
+import buffer_parser
+import conversion_constants as cc
+from models import DetailRecordModel, RequestModel
+from record_filter import FilterRules, get_record_filter
+from record_layouts import get_record_layouts
+from runtime import get_runtime_context
+
+DetailRecordsChunk = namedtuple(
+    "DetailRecordsChunk",
+    ["lines", "detail_records_count", "hash_total", "columns", "error", "rejected"],
+)
+
+logger = logging.getLogger()
+
+
+def process_file_parallel(source, max_workers: int = None) -> RequestModel:
+    """
+    Function processes the whole file into RequestModel, parsing detail records
+    in worker processes. Detail block between the header and the trailer
+    is split into byte ranges aligned to the line ends, one per worker,
+    and every worker returns the allowed detail records of its range in columns,
+    together with the number of detail records and their hash total.
+    Chunks are merged in the file order, and the header and the trailer
+    are validated the same way as in process_file. If worker processes can not be started,
+    the file is parsed serially.
+    Arguments:
+        source: Path of the local file, which is memory-mapped,
+            or bytes of the whole file, such as downloaded S3 body.
+        max_workers: Number of worker processes. Defaults to the number of available cores.
+    Return: RequestModel containing data from the file.
+    """
+
+    if isinstance(source, str):
+        with open(source, mode="rb") as file:
+            # empty file can not be memory-mapped
+            if not file.seek(0, 2):
+                return buffer_parser.log_error_and_return("No file lines")
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                return process_buffer_parallel(buffer, source, max_workers)
+    return process_buffer_parallel(source, None, max_workers)
+
+
+def process_buffer_parallel(buffer, path: str, max_workers: int) -> RequestModel:
+    """
+    Function processes the file buffer into RequestModel, parsing detail records
+    in worker processes.
+    Arguments:
+        buffer: Memory-mapped file, or bytes of the whole file.
+        path: Path of the memory-mapped file, which workers map again,
+            or None if the byte ranges are sent to workers.
+        max_workers: Number of worker processes. Defaults to the number of available cores.
+    Return: RequestModel containing data from the file.
+    """
+
+    ret = RequestModel(header=None, detail_records=(), trailer=None, error=None)
+    header_line, header_line_number, detail_start = read_first_line(buffer)
+    trailer_start, trailer_end = find_last_line(buffer, detail_start)
+    if header_line is None:
+        return buffer_parser.log_error_and_return("No file lines")
+    if not header_line.startswith(cc.HEADER_DESCRIPTION):
+        return buffer_parser.log_error_and_return(
+            buffer_parser.IMPROPER_FILE_FORMAT_ERROR
+        )
+    trailer_line = buffer[trailer_start:trailer_end].decode("utf-8").strip()
+    if not trailer_line.startswith(cc.TRAILER_DESCRIPTION):
+        return buffer_parser.log_error_and_return(
+            buffer_parser.IMPROPER_FILE_FORMAT_ERROR
+        )
+
+    format_version = buffer_parser.get_header_format_version(header_line)
+    if not get_record_layouts(format_version):
+        format_version = cc.HEADER_FORMAT_VERSION
+    layouts = get_record_layouts(format_version)
+    ret.header = buffer_parser.convert_file_line_to_header(header_line)
+    config = get_runtime_context().config
+
+    ranges = split_line_aligned_ranges(
+        buffer,
+        detail_start,
+        trailer_start,
+        max_workers or get_available_cores(),
+    )
+    chunks = []
+    if ranges:
+        chunks = parse_detail_records_in_workers(
+            buffer, path, ranges, format_version, config
+        )
+        if chunks is None:
+            return buffer_parser.process_buffer(buffer)
+
+    line_number = header_line_number
+    detail_records_count = 0
+    hash_total = 0
+    for chunk in chunks:
+        if chunk.error:
+            error_line_number, error_message = chunk.error
+            logger.error(f"Line {line_number + error_line_number}: {error_message}")
+            return buffer_parser.log_error_and_return(
+                buffer_parser.IMPROPER_FILE_FORMAT_ERROR
+            )
+        line_number += chunk.lines
+        detail_records_count += chunk.detail_records_count
+        hash_total += chunk.hash_total
+
+    buffer_parser.validate_trailer(
+        ret,
+        trailer_line,
+        line_number + 1,
+        layouts.trailer,
+        detail_records_count,
+        hash_total,
+    )
+    if ret.error:
+        return buffer_parser.log_error_and_return(ret.error)
+
+    # lines rejected in the workers are counted by the filter of the parent process
+    record_filter = get_record_filter(
+        config.record_filter_rules,
+        buffer_parser.get_detail_record_layout(layouts, config.fixed_point_rates),
+    )
+    for chunk in chunks:
+        record_filter.rejected.update(chunk.rejected)
+    ret.detail_records = tuple(
+        DetailRecordModel(*values) for chunk in chunks for values in zip(*chunk.columns)
+    )
+    return ret
+
+
+def parse_detail_records_in_workers(
+    buffer, path: str, ranges: list, format_version: str, config
+) -> list:
+    """
+    Function that parses the byte ranges of detail records in worker processes, one per range.
+    Arguments:
+        buffer: Memory-mapped file, or bytes of the whole file.
+        path: Path of the memory-mapped file, which workers map again,
+            or None if the byte ranges are sent to workers.
+        ranges: List of tuples of start and end of the byte ranges.
+        format_version: Header format version of the file.
+        config: Importer configuration.
+    Return: List of DetailRecordsChunks in the file order, or None if worker processes
+        can not be started, such as on AWS Lambda, which has no shared memory.
+    """
+
+    # multiprocessing is loaded only when a large file is parsed
+    from concurrent.futures import ProcessPoolExecutor
+    from concurrent.futures.process import BrokenProcessPool
+
+    try:
+        with ProcessPoolExecutor(max_workers=len(ranges)) as executor:
+            chunks = [
+                executor.submit(
+                    parse_detail_records_chunk,
+                    path if path else bytes(buffer[start:end]),
+                    (start, end) if path else None,
+                    format_version,
+                    config.fixed_point_rates,
+                    config.record_filter_rules,
+                )
+                for start, end in ranges
+            ]
+            return [chunk.result() for chunk in chunks]
+    except (OSError, NotImplementedError, BrokenProcessPool) as e:
+        logger.warning(
+            f"Worker processes can not be started ({e!r}), parsing the file serially"
+        )
+        return None
+
+
+def parse_detail_records_chunk(
+    source,
+    byte_range: tuple,
+    format_version: str,
+    fixed_point_rates: bool,
+    filter_rules: FilterRules,
+) -> DetailRecordsChunk:
+    """
+    Function that parses detail records of the byte range in the worker process.
+    Only the columns of allowed detail records are sent back to the parent process,
+    in the order of DetailRecordModel attributes.
+    Arguments:
+        source: Path of the local file, or bytes of the byte range.
+        byte_range: Tuple of start and end position of the byte range in the local file,
+            or None if the bytes are passed.
+        format_version: Header format version, whose detail record layout is used.
+        fixed_point_rates: Whether exchange rates are parsed into fixed point integers.
+        filter_rules: Rules by which detail records are allowed.
+    Return: DetailRecordsChunk, with the number of lines rejected by the filter in the range.
+    """
+
+    parser = buffer_parser.DetailRecordsParser(
+        get_record_layouts(format_version), fixed_point_rates, filter_rules
+    )
+    if not byte_range:
+        return parse_detail_records_range(parser, source, 0, len(source))
+    with open(source, mode="rb") as file, mmap.mmap(
+        file.fileno(), 0, access=mmap.ACCESS_READ
+    ) as buffer:
+        return parse_detail_records_range(parser, buffer, *byte_range)
+
+
+def parse_detail_records_range(
+    parser: buffer_parser.DetailRecordsParser, buffer, start: int, end: int
+) -> DetailRecordsChunk:
+    """
+    Function that parses detail records of the byte range with the same parser
+    as the whole file content, so the lines are sliced in the buffer itself.
+    Arguments:
+        parser: DetailRecordsParser of the file.
+        buffer: Memory-mapped file, or bytes of the byte range.
+        start: Start position of the byte range, at the line start.
+        end: End position of the byte range, right after the line end.
+    Return: DetailRecordsChunk, with the number of lines rejected by the filter in the range.
+    """
+
+    rejected_before = parser.record_filter.rejected.copy()
+    get_values = attrgetter(*DetailRecordModel.__slots__)
+    with memoryview(buffer) as view:
+        lines = enumerate(
+            (
+                (buffer, view, line_start, line_end)
+                for line_start, line_end in buffer_parser.iter_line_bounds(
+                    buffer, start, end
+                )
+            ),
+            1,
+        )
+        rows = [get_values(detail_record) for detail_record in parser.parse(lines)]
+    error = parser.error
+    if parser.stop_line:
+        error = (
+            parser.stop_line[0],
+            "Not all lines except the first and last one are detail records",
+        )
+    if error:
+        return DetailRecordsChunk(
+            parser.line_number,
+            parser.detail_records_count,
+            parser.hash_total,
+            (),
+            error,
+            None,
+        )
+
+    return DetailRecordsChunk(
+        parser.line_number,
+        parser.detail_records_count,
+        parser.hash_total,
+        tuple(zip(*rows)),
+        None,
+        parser.record_filter.rejected - rejected_before,
+    )
+
+
+def get_available_cores() -> int:
+    """
+    Function that returns number of cores available to the process.
+    Return: Number of cores.
+    """
+
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def read_first_line(buffer) -> tuple:
+    """
+    Function that reads the first not empty line of the buffer.
+    Arguments:
+        buffer: Memory-mapped file, or bytes of the whole file.
+    Return: Tuple of the stripped line, or None if there is no such line,
+        its line number, and the position after its line end.
+    """
+
+    start = 0
+    line_number = 0
+    while start < len(buffer):
+        end = buffer.find(b"\n", start)
+        end = len(buffer) if end < 0 else end + 1
+        line_number += 1
+        line = buffer[start:end].strip()
+        if line:
+            return line.decode("utf-8"), line_number, end
+        start = end
+    return None, line_number, len(buffer)
+
+
+def find_last_line(buffer, start: int) -> tuple:
+    """
+    Function that finds the last not empty line of the buffer, after the start position.
+    Arguments:
+        buffer: Memory-mapped file, or bytes of the whole file.
+        start: Position from which the line is searched.
+    Return: Tuple of start and end position of the line, without trailing whitespace.
+    """
+
+    end = len(buffer)
+    while end > start and buffer[end - 1] in buffer_parser.WHITESPACE:
+        end -= 1
+    return max(buffer.rfind(b"\n", start, end) + 1, start), end
+
+
+def split_line_aligned_ranges(buffer, start: int, end: int, parts: int) -> list:
+    """
+    Function that splits the buffer section into byte ranges of about the same size,
+    which end right after the line end, so no line is split between two ranges.
+    Arguments:
+        buffer: Memory-mapped file, or bytes of the whole file.
+        start: Start position of the section, at the line start.
+        end: End position of the section, right after the line end.
+        parts: Maximum number of ranges.
+    Return: List of tuples of start and end position of the ranges.
+    """
+
+    boundaries = [start]
+    for part in range(1, parts):
+        boundary = buffer.find(b"\n", start + (end - start) * part // parts, end)
+        boundary = end if boundary < 0 else boundary + 1
+        if boundaries[-1] < boundary < end:
+            boundaries.append(boundary)
+    if boundaries[-1] < end:
+        boundaries.append(end)
+    return list(zip(boundaries, boundaries[1:]))
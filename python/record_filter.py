@@ -0,0 +1,222 @@
+import json
+from collections import Counter, namedtuple
+
+import conversion_constants as cc
+from record_layouts import RecordLayout
+
+FilterRules = namedtuple(
+    "FilterRules",
+    [
+        "allowed_reference_currency_codes",
+        "allowed_rate_classes",
+        "allowed_rate_format_indicators",
+        "not_allowed_source_currency_codes",
+    ],
+)
+
+# filter rules mapped to the detail record layout field they check, and the type of its values
+FILTER_RULE_FIELDS = {
+    "allowed_reference_currency_codes": ("reference_currency_number", int),
+    "allowed_rate_classes": ("rate_class", str),
+    "allowed_rate_format_indicators": ("rate_format_indicator", str),
+    "not_allowed_source_currency_codes": ("source_currency_number", int),
+}
+MAX_FILTER_DECISIONS = 100000
+# decision of the allowed key, and the rejecting rule of the key whose fields are not numbers
+ALLOWED = ""
+INVALID_KEY = "invalid_key"
+
+record_filters = {}
+
+
+def load_filter_rules(environment) -> FilterRules:
+    """
+    Function that loads the rules by which detail records are allowed to be sent to API.
+    Rules default to the lists in conversion constants. They are overridden by
+    the JSON file named in RECORD_FILTER_CONFIG environment variable, which contains
+    the lists by the rule name, and then by the environment variables named
+    as the rules in upper case, which contain comma separated values,
+    e.g. ALLOWED_REFERENCE_CURRENCY_CODES=840,978
+    Arguments:
+        environment: Environment variables.
+    Return: FilterRules with the values in frozensets.
+    Raises: ValueError if the configuration file is not a JSON object, contains unknown rule,
+        or any rule has a value which is not a list or not of the rule type.
+    """
+
+    rules = {
+        "allowed_reference_currency_codes": cc.ALLOWED_REFERENCE_CURRENCY_CODES,
+        "allowed_rate_classes": cc.ALLOWED_RATE_CLASSES,
+        "allowed_rate_format_indicators": cc.ALLOWED_RATE_FORMAT_INDICATORS,
+        "not_allowed_source_currency_codes": cc.NOT_ALLOWED_SOURCE_CURRENCY_CODES,
+    }
+    config_path = environment.get("RECORD_FILTER_CONFIG")
+    if config_path:
+        with open(config_path, mode="rt") as file:
+            try:
+                config = json.load(file)
+            except json.JSONDecodeError as error:
+                raise ValueError(
+                    f"Invalid record filter configuration {config_path}: {error}"
+                ) from error
+        if not isinstance(config, dict):
+            raise ValueError(
+                f"Record filter configuration {config_path} is not a JSON object"
+            )
+        unknown_rules = set(config) - set(rules)
+        if unknown_rules:
+            raise ValueError(
+                f"Unknown record filter rules in {config_path}: {sorted(unknown_rules)}"
+            )
+        rules.update(config)
+    for name in FilterRules._fields:
+        value = environment.get(name.upper())
+        if value is not None:
+            rules[name] = [item.strip() for item in value.split(",") if item.strip()]
+
+    return FilterRules(
+        **{name: convert_filter_rule(name, values) for name, values in rules.items()}
+    )
+
+
+def convert_filter_rule(name: str, values) -> frozenset:
+    """
+    Function that converts the values of the filter rule to the type of its field.
+    Arguments:
+        name: Rule name.
+        values: List of the rule values.
+    Return: Frozenset of the converted values.
+    Raises: ValueError if the values are not a list, or any value is not of the rule type.
+    """
+
+    if not isinstance(values, (list, tuple, set, frozenset)):
+        raise ValueError(
+            f"Invalid record filter rule {name}: expected a list of values, got {values!r}"
+        )
+    converter = FILTER_RULE_FIELDS[name][1]
+    converted = set()
+    for value in values:
+        # values come either from JSON or from comma separated environment variables,
+        # so only strings and numbers of the rule type are accepted
+        if isinstance(value, bool) or not isinstance(value, (str, converter)):
+            raise ValueError(f"Invalid value {value!r} of record filter rule {name}")
+        try:
+            converted.add(converter(value))
+        except ValueError as error:
+            raise ValueError(
+                f"Invalid value {value!r} of record filter rule {name}"
+            ) from error
+    return frozenset(converted)
+
+
+class RecordFilter:
+    """
+    Class representing filter of detail record lines by their raw key,
+    which spans the fields checked by the filter rules. Key of the line is checked
+    before any of its fields is converted, so not allowed lines are discarded
+    with a single slice and dictionary lookup. Decision is made once for every
+    distinct key, and kept in the lookup table, since the files repeat the same
+    currency pairs. Rejected lines are counted by the first rule which rejects them.
+    Filter accepts both str and bytes lines.
+    """
+
+    def __init__(self, rules: FilterRules, layout: RecordLayout):
+        """
+        Arguments:
+            rules: Filter rules.
+            layout: Detail record layout.
+        """
+
+        fields = {name: (start, end + 1) for name, start, end, _ in layout.fields}
+        key_fields = [fields[name] for name, _ in FILTER_RULE_FIELDS.values()]
+        key_start = min(start for start, _ in key_fields)
+        self.key = slice(key_start, max(end for _, end in key_fields))
+        self.rules = rules
+        self.rule_fields = tuple(
+            (
+                rule,
+                getattr(rules, rule),
+                slice(fields[name][0] - key_start, fields[name][1] - key_start),
+                converter,
+                rule.startswith("allowed_"),
+            )
+            for rule, (name, converter) in FILTER_RULE_FIELDS.items()
+        )
+        self.decisions = {}
+        self.rejected = Counter()
+
+    def is_line_allowed(self, line) -> bool:
+        """
+        Function that checks whether the detail record line is allowed to be sent to API.
+        Arguments:
+            line: Detail record line, either as str or bytes.
+        Return: True if the line is allowed. Otherwise False.
+        """
+
+        return self.is_key_allowed(line[self.key])
+
+    def is_key_allowed(self, key) -> bool:
+        """
+        Function that checks whether the detail record with the raw key is allowed to be sent to API.
+        Arguments:
+            key: Raw key of the detail record line, either as str or bytes.
+        Return: True if the detail record is allowed. Otherwise False.
+        """
+
+        rejecting_rule = self.decisions.get(key)
+        if rejecting_rule is None:
+            rejecting_rule = self.decide(key)
+            if len(self.decisions) < MAX_FILTER_DECISIONS:
+                self.decisions[key] = rejecting_rule
+        if rejecting_rule:
+            self.rejected[rejecting_rule] += 1
+            return False
+        return True
+
+    def decide(self, key) -> str:
+        """
+        Function that checks the fields of the raw key against the filter rules,
+        the same way as is_data_record_allowed checks the converted detail record.
+        Arguments:
+            key: Raw key of the detail record line, either as str or bytes.
+        Return: Name of the first rule which rejects the detail record,
+            INVALID_KEY if its fields are not numbers, or ALLOWED if it is allowed.
+        """
+
+        try:
+            if isinstance(key, bytes):
+                key = key.decode("ascii")
+            for rule, values, field, converter, allowed in self.rule_fields:
+                if (converter(key[field]) in values) != allowed:
+                    return rule
+            return ALLOWED
+        except ValueError:
+            return INVALID_KEY
+
+
+def get_record_filter(rules: FilterRules, layout: RecordLayout) -> RecordFilter:
+    """
+    Function that returns the filter of detail records, compiled once for the rules and the layout.
+    Arguments:
+        rules: Filter rules.
+        layout: Detail record layout.
+    Return: RecordFilter.
+    """
+
+    record_filter = record_filters.get((rules, layout))
+    if record_filter is None:
+        record_filter = record_filters[(rules, layout)] = RecordFilter(rules, layout)
+    return record_filter
+
+
+def get_rejected_records() -> Counter:
+    """
+    Function that returns the number of detail record lines rejected so far
+    by all the filters, by the rejecting rule.
+    Return: Counter of rejected lines by rule name.
+    """
+
+    rejected = Counter()
+    for record_filter in list(record_filters.values()):
+        rejected.update(record_filter.rejected)
+    return rejected
@@ -0,0 +1,246 @@
+import logging
+from collections import namedtuple
+from datetime import datetime
+from operator import itemgetter
+
+import conversion_constants as cc
+from models import DetailRecordModel, TrailerModel
+
+try:
+    from operator import call
+except ImportError:
+    # operator.call is available since Python 3.11
+    def call(function, value):
+        return function(value)
+
+
+logger = logging.getLogger()
+
+RecordLayouts = namedtuple("RecordLayouts", ["header", "detail", "trailer"])
+
+record_layouts = {}
+
+
+class RecordLayout:
+    """
+    Class representing fixed-width layout of a row in exchange rates file.
+    Field positions are compiled once into a single itemgetter over slice objects,
+    so the field values of a file line are cut out with a single call,
+    and converted in the field order with map(call, layout.converters, layout.slice(file_line)).
+    """
+
+    def __init__(self, fields):
+        """
+        Arguments:
+            fields: Tuples of field name, start position, end position (inclusive)
+                and function converting the field value, in the order of the row.
+        """
+
+        self.fields = tuple(fields)
+        self.field_names = tuple(name for name, _, _, _ in fields)
+        self.converters = tuple(converter for _, _, _, converter in fields)
+        self.length = max(end for _, _, end, _ in fields) + 1
+        slices = [slice(start, end + 1) for _, start, end, _ in fields]
+        if len(slices) == 1:
+            field_slice = slices[0]
+            self.slice = lambda file_line: (file_line[field_slice],)
+        else:
+            self.slice = itemgetter(*slices)
+
+    def parse(self, file_line) -> dict:
+        """
+        Function that parses the file line into converted field values.
+        Exceptions raised by the converters are left to the caller.
+        Arguments:
+            file_line: File line.
+        Return: Dictionary of converted field values by field name.
+        """
+
+        return dict(
+            zip(self.field_names, map(call, self.converters, self.slice(file_line)))
+        )
+
+
+def register_record_layouts(
+    format_version: str,
+    header: RecordLayout,
+    detail: RecordLayout,
+    trailer: RecordLayout,
+):
+    """
+    Function that registers record layouts for the header format version.
+    Detail and trailer records are created from the converted values in the field order,
+    so their fields have to be in the order of DetailRecordModel and TrailerModel arguments.
+    Arguments:
+        format_version: Header format version, as found in the header line.
+        header: Header record layout.
+        detail: Detail record layout.
+        trailer: Trailer record layout.
+    Raises: ValueError if detail or trailer fields are not in the order of the model arguments.
+    """
+
+    for layout, model in ((detail, DetailRecordModel), (trailer, TrailerModel)):
+        code = model.__init__.__code__
+        if layout.field_names != code.co_varnames[1 : code.co_argcount]:
+            raise ValueError(
+                f"Fields {layout.field_names} of format version {format_version} "
+                f"are not in the order of {model.__name__} arguments"
+            )
+    record_layouts[format_version] = RecordLayouts(
+        header=header, detail=detail, trailer=trailer
+    )
+
+
+def get_record_layouts(format_version: str) -> RecordLayouts:
+    """
+    Function that returns record layouts registered for the header format version.
+    Arguments:
+        format_version: Header format version, as found in the header line.
+    Return: Record layouts, or None if the format version is not supported.
+    """
+
+    return record_layouts.get(format_version)
+
+
+def convert_header_datetime(header_datetime: str) -> str:
+    """
+    Function that converts header datetime as found in exchange rates file,
+    to the string sent to API.
+    Arguments:
+        header_datetime: Header datetime.
+    Return: Header datetime as string.
+    """
+
+    return str(datetime.strptime(header_datetime, cc.HEADER_DATETIME_FORMAT))
+
+
+def convert_exchange_rate(conversion_rate: str) -> float:
+    """
+    Function that converts exchange rate as found in exchange
+    rates file, to the float.
+    Arguments:
+        conversion_rate: Conversion rate to be converted to float.
+    Return: Exchange rate as float.
+    """
+
+    # letting exceptions be caught by calling method
+    if not conversion_rate or len(conversion_rate) != (
+        cc.CURRENCY_COVERSION_INTEGER_PLACES + cc.CURRENCY_COVERSION_DECIMAL_PLACES
+    ):
+        logger.error("Conversion rate improper length")
+        raise Exception()
+    return float(
+        conversion_rate[: cc.CURRENCY_COVERSION_INTEGER_PLACES]
+        + "."
+        + conversion_rate[cc.CURRENCY_COVERSION_INTEGER_PLACES :]
+    )
+
+
+def convert_exchange_rate_to_fixed_point(conversion_rate: str) -> int:
+    """
+    Function that converts exchange rate as found in exchange
+    rates file, to the fixed point integer, which is exchange rate
+    multiplied by EXCHANGE_RATE_SCALE. Conversion is exact.
+    Arguments:
+        conversion_rate: Conversion rate to be converted to fixed point integer.
+    Return: Exchange rate as fixed point integer.
+    """
+
+    # letting exceptions be caught by calling method
+    if not conversion_rate or len(conversion_rate) != (
+        cc.CURRENCY_COVERSION_INTEGER_PLACES + cc.CURRENCY_COVERSION_DECIMAL_PLACES
+    ):
+        logger.error("Conversion rate improper length")
+        raise Exception()
+    if not conversion_rate.isdigit():
+        raise ValueError(f"Conversion rate improper format: {conversion_rate}")
+    return int(conversion_rate)
+
+
+register_record_layouts(
+    cc.HEADER_FORMAT_VERSION,
+    header=RecordLayout(
+        [
+            (
+                "date",
+                cc.HEADER_DATETIME_START_POSITION,
+                cc.HEADER_DATETIME_END_POSITION,
+                convert_header_datetime,
+            ),
+            (
+                "format_version",
+                cc.HEADER_FORMAT_VERSION_POSITION,
+                cc.HEADER_FORMAT_VERSION_POSITION,
+                str,
+            ),
+        ]
+    ),
+    detail=RecordLayout(
+        [
+            (
+                "source_currency_number",
+                cc.SOURCE_CURRENCY_START_POSSITION,
+                cc.SOURCE_CURRENCY_END_POSSITION,
+                int,
+            ),
+            (
+                "reference_currency_number",
+                cc.REFERENCE_CURRENCY_START_POSSITION,
+                cc.REFERENCE_CURRENCY_END_POSSITION,
+                int,
+            ),
+            (
+                "source_currency_exponent",
+                cc.SOURCE_CURRENCY_EXPONENT_START_POSSITION,
+                cc.SOURCE_CURRENCY_EXPONENT_END_POSSITION,
+                int,
+            ),
+            (
+                "rate_class",
+                cc.RATE_CLASS_START_POSSITION,
+                cc.RATE_CLASS_END_POSSITION,
+                str,
+            ),
+            (
+                "rate_format_indicator",
+                cc.RATE_FORMAT_INDICATOR_CLASS_START_POSSITION,
+                cc.RATE_FORMAT_INDICATOR_CLASS_END_POSSITION,
+                str,
+            ),
+            (
+                "buy_currency_conversion_rate",
+                cc.BUY_CURRENCY_CONVERSION_RATE_START_POSSITION,
+                cc.BUY_CURRENCY_CONVERSION_RATE_END_POSSITION,
+                convert_exchange_rate,
+            ),
+            (
+                "mid_currency_conversion_rate",
+                cc.MID_CURRENCY_CONVERSION_RATE_START_POSSITION,
+                cc.MID_CURRENCY_CONVERSION_RATE_END_POSSITION,
+                convert_exchange_rate,
+            ),
+            (
+                "sell_currency_conversion_rate",
+                cc.SELL_CURRENCY_CONVERSION_RATE_START_POSSITION,
+                cc.SELL_CURRENCY_CONVERSION_RATE_END_POSSITION,
+                convert_exchange_rate,
+            ),
+        ]
+    ),
+    trailer=RecordLayout(
+        [
+            (
+                "total_records",
+                cc.TRAILER_TOTAL_RECORDS_START_POSITION,
+                cc.TRAILER_TOTAL_RECORDS_END_POSITION,
+                int,
+            ),
+            (
+                "hash_total",
+                cc.TRAILER_HASH_TOTAL_START_POSITION,
+                cc.TRAILER_HASH_TOTAL_END_POSITION,
+                int,
+            ),
+        ]
+    ),
+)
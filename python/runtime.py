@@ -0,0 +1,274 @@
+from os import environ
+from typing import TYPE_CHECKING
+
+import conversion_constants as cc
+from file_discovery import S3FileDiscovery
+from record_filter import load_filter_rules
+from state_store import ImportedDigests, LocalJsonStore, S3JsonStore
+
+if TYPE_CHECKING:
+    from http_session import RetryingHttpSession
+
+runtime_context = None
+
+
+class ImporterConfig:
+    """
+    Class representing importer configuration, parsed once from environment variables.
+    """
+
+    def __init__(self, environment):
+        """
+        Arguments:
+            environment: Environment variables.
+        """
+
+        self.run_on_aws = True if environment.get("IMPORT_RATES_URL") else False
+        self.import_rates_url = (
+            environment.get("IMPORT_RATES_URL")
+            if self.run_on_aws
+            else cc.IMPORT_RATES_URL
+        )
+        self.s3_bucket_name = environment.get("S3_BUCKET_NAME")
+        self.s3_key_prefix = environment.get(
+            "S3_KEY_PREFIX", cc.CURRENCY_RATES_FILE_PREFIX
+        )
+        self.s3_manifest_key = environment.get("S3_MANIFEST_KEY")
+        self.fingerprint_name = environment.get(
+            "IMPORT_RATES_FINGERPRINT_NAME", cc.IMPORT_RATES_FINGERPRINT_NAME
+        )
+        self.access_key_id = environment.get("ACCESS_KEY_ID")
+        self.secret_access_key = environment.get("SECRET_ACCESS_KEY")
+        self.fixed_point_rates = True if environment.get("FIXED_POINT_RATES") else False
+        self.import_rates_gzip = True if environment.get("IMPORT_RATES_GZIP") else False
+        self.import_rates_delta = (
+            True if environment.get("IMPORT_RATES_DELTA") else False
+        )
+        self.import_rates_dedup = (
+            True if environment.get("IMPORT_RATES_DEDUP") else False
+        )
+        self.imported_digests_name = environment.get(
+            "IMPORTED_DIGESTS_NAME", cc.IMPORTED_DIGESTS_NAME
+        )
+        self.record_filter_rules = load_filter_rules(environment)
+        self.base_currency_number = int(
+            environment.get("BASE_CURRENCY_NUMBER") or cc.BASE_CURRENCY_NUMBER
+        )
+        self.event_max_workers = int(
+            environment.get("EVENT_MAX_WORKERS") or cc.EVENT_MAX_WORKERS
+        )
+        self.parallel_parse_min_file_size = int(
+            environment.get("PARALLEL_PARSE_MIN_FILE_SIZE")
+            or cc.PARALLEL_PARSE_MIN_FILE_SIZE
+        )
+        self.batch_decode_min_file_size = int(
+            environment.get("BATCH_DECODE_MIN_FILE_SIZE")
+            or cc.BATCH_DECODE_MIN_FILE_SIZE
+        )
+        self.s3_ranged_get_min_file_size = int(
+            environment.get("S3_RANGED_GET_MIN_FILE_SIZE")
+            or cc.S3_RANGED_GET_MIN_FILE_SIZE
+        )
+        self.s3_ranged_get_max_in_flight = int(
+            environment.get("S3_RANGED_GET_MAX_IN_FLIGHT")
+            or cc.S3_RANGED_GET_MAX_IN_FLIGHT
+        )
+        self.import_rates_batch_size = int(
+            environment.get("IMPORT_RATES_BATCH_SIZE") or 0
+        )
+        self.import_rates_max_in_flight = int(
+            environment.get("IMPORT_RATES_MAX_IN_FLIGHT")
+            or cc.IMPORT_RATES_MAX_IN_FLIGHT
+        )
+        self.import_rates_timeout = float(
+            environment.get("IMPORT_RATES_TIMEOUT") or cc.IMPORT_RATES_TIMEOUT
+        )
+        self.import_rates_max_retries = int(
+            environment.get("IMPORT_RATES_MAX_RETRIES") or cc.IMPORT_RATES_MAX_RETRIES
+        )
+        self.import_rates_backoff_base = float(
+            environment.get("IMPORT_RATES_BACKOFF_BASE") or cc.IMPORT_RATES_BACKOFF_BASE
+        )
+        self.import_rates_backoff_max = float(
+            environment.get("IMPORT_RATES_BACKOFF_MAX") or cc.IMPORT_RATES_BACKOFF_MAX
+        )
+        self.import_rates_keep_alive = (
+            environment.get("IMPORT_RATES_KEEP_ALIVE", "true").lower() != "false"
+        )
+        self.import_metrics = True if environment.get("IMPORT_METRICS") else False
+        self.import_metrics_namespace = environment.get(
+            "IMPORT_METRICS_NAMESPACE", cc.IMPORT_METRICS_NAMESPACE
+        )
+        # CloudWatch drops the metrics whose namespace is empty or longer than 255 characters
+        namespace = self.import_metrics_namespace
+        if not namespace.strip() or len(namespace) > 255:
+            raise ValueError(
+                f"Invalid IMPORT_METRICS_NAMESPACE {namespace!r}, "
+                "expected 1 to 255 characters"
+            )
+        self.import_profile = (environment.get("IMPORT_PROFILE") or "").lower()
+        if self.import_profile not in ("", "cprofile", "tracemalloc"):
+            raise ValueError(
+                f"Unknown IMPORT_PROFILE {self.import_profile}, "
+                "expected cprofile or tracemalloc"
+            )
+
+
+class RuntimeContext:
+    """
+    Class representing importer configuration and clients, which are kept
+    between warm Lambda invocations. Clients are created on the first use only.
+    """
+
+    def __init__(self, config: ImporterConfig, s3_session=None, http_session=None):
+        """
+        Arguments:
+            config: Importer configuration.
+            s3_session: AWS session. Created from the configuration if not provided.
+            http_session: HTTP session to the API. Created from the configuration if not provided.
+        """
+
+        self.config = config
+        self._s3_session = s3_session
+        self._s3_client = None
+        self._file_discovery = None
+        self._fingerprint_store = None
+        self._imported_digests = None
+        self._http_session = http_session
+
+    @property
+    def s3_session(self):
+        """
+        AWS session.
+        """
+
+        if self._s3_session is None:
+            # boto3 is imported on the first use of S3, since it is the slowest import of the importer
+            import boto3
+
+            self._s3_session = boto3.Session(
+                aws_access_key_id=self.config.access_key_id,
+                aws_secret_access_key=self.config.secret_access_key,
+            )
+        return self._s3_session
+
+    @property
+    def s3_client(self):
+        """
+        AWS S3 client.
+        """
+
+        if self._s3_client is None:
+            self._s3_client = self.s3_session.client("s3")
+        return self._s3_client
+
+    @property
+    def file_discovery(self) -> S3FileDiscovery:
+        """
+        Discovery of exchange rates files on AWS S3 bucket.
+        """
+
+        if self._file_discovery is None:
+            self._file_discovery = S3FileDiscovery(
+                self.s3_client,
+                self.config.s3_bucket_name,
+                self.config.s3_key_prefix,
+                (
+                    self.create_state_store(self.config.s3_manifest_key)
+                    if self.config.s3_manifest_key
+                    else None
+                ),
+            )
+        return self._file_discovery
+
+    @property
+    def fingerprint_store(self):
+        """
+        Store of the fingerprint of the last imported exchange rates.
+        """
+
+        if self._fingerprint_store is None:
+            self._fingerprint_store = self.create_state_store(
+                self.config.fingerprint_name
+            )
+        return self._fingerprint_store
+
+    @property
+    def imported_digests(self) -> ImportedDigests:
+        """
+        Digests of the content of the already imported files.
+        """
+
+        if self._imported_digests is None:
+            self._imported_digests = ImportedDigests(
+                self.create_state_store(self.config.imported_digests_name),
+                cc.IMPORTED_DIGESTS_MAX,
+            )
+        return self._imported_digests
+
+    def create_state_store(self, name: str):
+        """
+        Function that creates store of the importer state, next to the exchange rates files.
+        Arguments:
+            name: Name of the state object on AWS S3 bucket, or of the file on local file storage.
+        Return: S3JsonStore when run on AWS. Otherwise LocalJsonStore.
+        """
+
+        if self.config.run_on_aws:
+            return S3JsonStore(self.s3_client, self.config.s3_bucket_name, name)
+        return LocalJsonStore(cc.CURRENCY_RATES_FILE_PATH + name)
+
+    @property
+    def http_session(self) -> "RetryingHttpSession":
+        """
+        HTTP session to the API.
+        """
+
+        if self._http_session is None:
+            # requests is imported on the first use of the API
+            from http_session import RetryingHttpSession
+
+            self._http_session = RetryingHttpSession(
+                pool_size=self.config.import_rates_max_in_flight,
+                timeout=self.config.import_rates_timeout,
+                max_retries=self.config.import_rates_max_retries,
+                backoff_base=self.config.import_rates_backoff_base,
+                backoff_max=self.config.import_rates_backoff_max,
+                keep_alive=self.config.import_rates_keep_alive,
+            )
+        return self._http_session
+
+    def close(self):
+        """
+        Function that closes the connections opened by the clients.
+        """
+
+        if self._http_session is not None:
+            self._http_session.close()
+
+
+def get_runtime_context() -> RuntimeContext:
+    """
+    Function that returns runtime context, creating it on the first call.
+    Return: Runtime context.
+    """
+
+    global runtime_context
+    if runtime_context is None:
+        runtime_context = RuntimeContext(ImporterConfig(environ))
+    return runtime_context
+
+
+def reset_runtime_context(close: bool = True):
+    """
+    Function that drops the runtime context, so the configuration is read again
+    and the clients are created again on the next use.
+    Arguments:
+        close: Whether the connections of the clients are closed. Worker processes
+            drop the context inherited from the parent process without closing its connections.
+    """
+
+    global runtime_context
+    if runtime_context is not None and close:
+        runtime_context.close()
+    runtime_context = None
@@ -0,0 +1,107 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+def iter_object_parts(
+    s3_client,
+    bucket_name: str,
+    key: str,
+    s3_object: dict,
+    part_size: int,
+    max_in_flight: int,
+):
+    """
+    Generator that downloads the object in parts with parallel ranged GET requests,
+    and yields the parts in order, as soon as they are downloaded.
+    First part is read from the body of the already opened object, while the next
+    max_in_flight parts are downloaded, so at most max_in_flight + 1 parts are held in memory.
+    Ranged requests are made only for the same object version, by its ETag,
+    and every part, including the first one, is checked to have the expected size.
+    Arguments:
+        s3_client: AWS S3 client.
+        bucket_name: Name of the bucket.
+        key: Key of the object.
+        s3_object: Response of the get_object request of the whole object.
+        part_size: Size of the part in bytes.
+        max_in_flight: Maximum number of parts downloaded at the same time.
+    Yields: Parts of the object content as bytes.
+    Raises: IOError if less content than expected is downloaded for any part.
+    """
+
+    size = s3_object["ContentLength"]
+    body = s3_object["Body"]
+    byte_ranges = iter(
+        [
+            (start, min(start + part_size, size) - 1)
+            for start in range(part_size, size, part_size)
+        ]
+    )
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        pending = deque(
+            executor.submit(
+                get_object_range,
+                s3_client,
+                bucket_name,
+                key,
+                s3_object.get("ETag"),
+                *byte_range,
+            )
+            for _, byte_range in zip(range(max_in_flight), byte_ranges)
+        )
+        try:
+            try:
+                part = body.read(part_size)
+            finally:
+                body.close()
+            if len(part) != min(part_size, size):
+                raise IOError(
+                    f"Downloaded {len(part)} bytes of {key} first part, "
+                    f"expected {min(part_size, size)}"
+                )
+            yield part
+            while pending:
+                part = pending.popleft().result()
+                byte_range = next(byte_ranges, None)
+                if byte_range:
+                    pending.append(
+                        executor.submit(
+                            get_object_range,
+                            s3_client,
+                            bucket_name,
+                            key,
+                            s3_object.get("ETag"),
+                            *byte_range,
+                        )
+                    )
+                yield part
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def get_object_range(
+    s3_client, bucket_name: str, key: str, etag: str, start: int, end: int
+) -> bytes:
+    """
+    Function that downloads the byte range of the object.
+    Arguments:
+        s3_client: AWS S3 client.
+        bucket_name: Name of the bucket.
+        key: Key of the object.
+        etag: ETag of the object version, or None if any version can be downloaded.
+        start: Start position of the byte range.
+        end: End position of the byte range, inclusive.
+    Return: Content of the byte range.
+    Raises: IOError if less content than requested is downloaded.
+    """
+
+    arguments = {"Bucket": bucket_name, "Key": key, "Range": f"bytes={start}-{end}"}
+    if etag:
+        arguments["IfMatch"] = etag
+    part = s3_client.get_object(**arguments)["Body"].read()
+    if len(part) != end - start + 1:
+        raise IOError(
+            f"Downloaded {len(part)} bytes of {key} range {start}-{end}, "
+            f"expected {end - start + 1}"
+        )
+    return part
@@ -0,0 +1,155 @@
+import json
+import logging
+import os
+
+logger = logging.getLogger()
+
+
+class LocalJsonStore:
+    """
+    Class representing small JSON document kept on local file storage,
+    which preserves importer state between the runs.
+    """
+
+    def __init__(self, path: str):
+        """
+        Arguments:
+            path: Path of the JSON file.
+        """
+
+        self.path = path
+
+    def load(self):
+        """
+        Function that reads the document.
+        Return: Document, or None if it is not stored yet.
+        """
+
+        try:
+            with open(self.path, mode="rt") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return None
+        except ValueError as e:
+            logger.warning(f"Error reading {self.path}: {e}")
+            return None
+
+    def save(self, document):
+        """
+        Function that stores the document, replacing the previous one.
+        File is replaced at once, so the readers never see partially written document.
+        Arguments:
+            document: JSON serializable document.
+        """
+
+        temporary_path = self.path + ".tmp"
+        with open(temporary_path, mode="wt") as file:
+            json.dump(document, file)
+        os.replace(temporary_path, self.path)
+
+
+class S3JsonStore:
+    """
+    Class representing small JSON document kept as an object on AWS S3 bucket,
+    which preserves importer state between the runs.
+    """
+
+    def __init__(self, s3_client, bucket_name: str, key: str):
+        """
+        Arguments:
+            s3_client: AWS S3 client.
+            bucket_name: Name of the bucket.
+            key: Key of the JSON object.
+        """
+
+        self.s3_client = s3_client
+        self.bucket_name = bucket_name
+        self.key = key
+
+    def load(self):
+        """
+        Function that reads the document.
+        Return: Document, or None if it is not stored yet or it can not be read.
+        """
+
+        from botocore.exceptions import ClientError
+
+        try:
+            body = self.s3_client.get_object(Bucket=self.bucket_name, Key=self.key)[
+                "Body"
+            ]
+            return json.loads(body.read())
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "NoSuchKey":
+                logger.warning(f"Error reading {self.key}: {e}")
+            return None
+
+    def save(self, document):
+        """
+        Function that stores the document, replacing the previous one.
+        Errors are logged only, since the state is an optimization.
+        Arguments:
+            document: JSON serializable document.
+        """
+
+        from botocore.exceptions import ClientError
+
+        try:
+            self.s3_client.put_object(
+                Bucket=self.bucket_name,
+                Key=self.key,
+                Body=json.dumps(document).encode("utf-8"),
+            )
+        except ClientError as e:
+            logger.warning(f"Error storing {self.key}: {e}")
+
+
+class ImportedDigests:
+    """
+    Class representing the digests of the most recently imported files' content,
+    kept in the store, so the same content delivered again is not imported again.
+    """
+
+    def __init__(self, store, max_digests: int):
+        """
+        Arguments:
+            store: Store of the digests, which loads and saves JSON document,
+                such as LocalJsonStore or S3JsonStore.
+            max_digests: Maximum number of digests kept. The oldest ones are dropped first.
+        """
+
+        self.store = store
+        self.max_digests = max_digests
+        self.digests = None
+
+    def load(self) -> list:
+        """
+        Function that returns the digests, reading them from the store on the first call only.
+        Return: List of digests, from the oldest to the newest one.
+        """
+
+        if self.digests is None:
+            self.digests = (self.store.load() or {}).get("digests", [])
+        return self.digests
+
+    def contains(self, digest: str) -> bool:
+        """
+        Function that checks whether the content with the digest is already imported.
+        Arguments:
+            digest: Digest of the file content.
+        Return: True if the content is already imported. Otherwise False.
+        """
+
+        return digest in self.load()
+
+    def add(self, digest: str):
+        """
+        Function that stores the digest of the imported content.
+        Arguments:
+            digest: Digest of the file content.
+        """
+
+        digests = [existing for existing in self.load() if existing != digest]
+        digests.append(digest)
+        self.digests = digests[-self.max_digests :]
+        self.store.save({"digests": self.digests})
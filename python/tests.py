@@ -1,12 +1,210 @@
+import gzip
+import hashlib
+import io
+import json
 import os
 import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
 import unittest
 from datetime import datetime
+from decimal import Decimal
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
 
+import boto3
+import jsonpickle
+import requests
+from botocore.response import StreamingBody
+from botocore.stub import Stubber
+
+import benchmarks
+import buffer_parser
 import conversion_constants as cc
+import file_discovery
+import instrumentation
+import http_session
 import lambda_function
+import models
+import parallel_parser
+import record_filter
+import record_layouts
+import runtime
+import s3_reader
+import state_store
 from models import DetailRecordModel
 
+# budget of the lambda_function import time at cold start, in seconds
+IMPORT_TIME_BUDGET = 0.2
+
+try:
+    import batch_decoder
+except ImportError:
+    batch_decoder = None
+
+
+def patch_runtime_context(s3_session=None, http_session=None, **config):
+    """
+    Function that patches runtime context with the one created from default configuration.
+    Arguments:
+        s3_session: AWS session used by the runtime context.
+        http_session: HTTP session used by the runtime context.
+        config: Configuration values overriding the default ones.
+    Return: Patcher of the runtime context.
+    """
+
+    context = runtime.RuntimeContext(
+        runtime.ImporterConfig({}), s3_session=s3_session, http_session=http_session
+    )
+    for name, value in config.items():
+        setattr(context.config, name, value)
+    return mock.patch.object(runtime, "runtime_context", context)
+
+
+def create_stubbed_s3_client():
+    """
+    Function that creates AWS S3 client with stubbed responses, which fails
+    on any request which is not expected.
+    Return: Tuple of AWS S3 client and its Stubber.
+    """
+
+    s3_client = boto3.client(
+        "s3",
+        region_name="us-east-1",
+        aws_access_key_id="test",
+        aws_secret_access_key="test",
+    )
+    return s3_client, Stubber(s3_client)
+
+
+def create_s3_event(
+    bucket_name: str, key: str, size: int = 1, event_name: str = "ObjectCreated:Put"
+) -> dict:
+    """
+    Function that creates S3 event notification of the object.
+    Arguments:
+        bucket_name: Name of the bucket.
+        key: URL encoded key of the object.
+        size: Size of the object.
+        event_name: Name of the S3 event.
+    Return: S3 event.
+    """
+
+    return {
+        "Records": [
+            {
+                "eventSource": "aws:s3",
+                "eventName": event_name,
+                "s3": {
+                    "bucket": {"name": bucket_name},
+                    "object": {"key": key, "size": size, "eTag": "a1b2"},
+                },
+            }
+        ]
+    }
+
+
+class ImportRatesStandIn:
+    """
+    Local HTTP server standing in for the exchange rates API.
+    It records every received request, with the body decoded from
+    chunked transfer encoding and decompressed from gzip, and every opened connection.
+    """
+
+    def __init__(self, status_codes=(), received_sequence_numbers=None):
+        """
+        Arguments:
+            status_codes: Status codes returned for the first POST requests. OK afterwards.
+            received_sequence_numbers: Batch sequence numbers received by import session id.
+        """
+
+        self.status_codes = list(status_codes)
+        self.received_sequence_numbers = received_sequence_numbers or {}
+        self.requests = []
+        self.connections = set()
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                stand_in.connections.add(self.client_address)
+
+            def do_GET(self):
+                session_id = self.path.rsplit("/", 1)[-1]
+                if session_id not in stand_in.received_sequence_numbers:
+                    self.send_response(HTTPStatus.NOT_FOUND)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                body = json.dumps(
+                    {
+                        "session_id": session_id,
+                        "received_sequence_numbers": stand_in.received_sequence_numbers[
+                            session_id
+                        ],
+                    }
+                ).encode("utf-8")
+                self.send_response(HTTPStatus.OK)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                chunks = []
+                if self.headers.get("Transfer-Encoding") == "chunked":
+                    while True:
+                        size = int(self.rfile.readline().strip(), 16)
+                        chunk = self.rfile.read(size + 2)[:size]
+                        if not size:
+                            break
+                        chunks.append(chunk)
+                else:
+                    chunks.append(
+                        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                    )
+                body = b"".join(chunks)
+                if self.headers.get("Content-Encoding") == "gzip":
+                    body = gzip.decompress(body)
+                stand_in.requests.append(
+                    {
+                        "path": self.path,
+                        "headers": dict(self.headers),
+                        "chunks": len(chunks),
+                        "body": body,
+                    }
+                )
+                status_code = (
+                    stand_in.status_codes.pop(0)
+                    if stand_in.status_codes
+                    else HTTPStatus.OK
+                )
+                self.send_response(status_code)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/ExchangeRate/import"
+
+    def __enter__(self):
+        threading.Thread(
+            target=self.server.serve_forever, args=(0.01,), daemon=True
+        ).start()
+        return self
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
+
 
 class TestConversion(unittest.TestCase):
     def test_file_exists_and_not_empty_should_return_false_on_non_existing_file(self):
@@ -204,21 +402,21 @@ class TestConversion(unittest.TestCase):
         self.assertEqual(lambda_function.is_data_record_allowed(data), True)
 
     def test_convert_file_line_to_header_should_return_none_on_none_line(self):
-        self.assertEqual(lambda_function.convert_file_line_to_header(None), None)
+        self.assertEqual(buffer_parser.convert_file_line_to_header(None), None)
 
     def test_convert_file_line_to_header_should_return_none_on_improper_line_length(
         self,
     ):
-        self.assertEqual(lambda_function.convert_file_line_to_header("test"), None)
+        self.assertEqual(buffer_parser.convert_file_line_to_header("test"), None)
 
     def test_convert_file_line_to_header_return_none_on_unsupported_header_format(self):
-        self.assertEqual(lambda_function.convert_file_line_to_header("test" * 10), None)
+        self.assertEqual(buffer_parser.convert_file_line_to_header("test" * 10), None)
 
     def test_convert_file_line_to_header_should_return_none_on_improper_date_format(
         self,
     ):
         self.assertEqual(
-            lambda_function.convert_file_line_to_header(
+            buffer_parser.convert_file_line_to_header(
                 "H15321a15645641fdsa15641fads16546"
             ),
             None,
@@ -226,21 +424,21 @@ class TestConversion(unittest.TestCase):
 
     def test_convert_file_line_to_header_should_return_header(self):
         line = "H201710211400191                                                                                                             "
-        data = lambda_function.convert_file_line_to_header(line)
+        data = buffer_parser.convert_file_line_to_header(line)
         date = str(datetime(2017, 10, 21, 14, 0, 19))
         self.assertEqual(data.date, date)
 
     def test_get_rate_should_raises_exception_on_improper_conversion_rate_length(self):
         with self.assertRaises(Exception):
-            lambda_function.convert_exchange_rate(None)
+            record_layouts.convert_exchange_rate(None)
 
     def test_get_rate_should_raises_exception_on_improper_conversion_rate_length(self):
         with self.assertRaises(Exception):
-            lambda_function.convert_exchange_rate("123")
+            record_layouts.convert_exchange_rate("123")
 
     def test_get_rate_should_raises_exception_on_improper_conversion_rate(self):
         with self.assertRaises(ValueError):
-            lambda_function.convert_exchange_rate(
+            record_layouts.convert_exchange_rate(
                 "t"
                 * (
                     cc.CURRENCY_COVERSION_INTEGER_PLACES
@@ -249,73 +447,71 @@ class TestConversion(unittest.TestCase):
             )
 
     def test_convert_file_line_to_trailer_should_return_none_on_none_line(self):
-        self.assertEqual(lambda_function.convert_file_line_to_trailer(None), None)
+        self.assertEqual(buffer_parser.convert_file_line_to_trailer(None), None)
 
     def test_convert_file_line_to_trailer_should_return_none_on_improper_line_length(
         self,
     ):
-        self.assertEqual(lambda_function.convert_file_line_to_trailer("test"), None)
+        self.assertEqual(buffer_parser.convert_file_line_to_trailer("test"), None)
 
     def test_convert_file_line_to_trailer_should_return_none_on_improper_line_format(
         self,
     ):
-        self.assertEqual(lambda_function.convert_file_line_to_header("test" * 10), None)
+        self.assertEqual(buffer_parser.convert_file_line_to_header("test" * 10), None)
 
     def test_convert_file_line_to_trailer_should_return_trailer(self):
         line = "T00022200001731625193984                                                                                                     "
-        data = lambda_function.convert_file_line_to_trailer(line)
+        data = buffer_parser.convert_file_line_to_trailer(line)
         self.assertEqual(data.total_records, 222)
         self.assertEqual(data.hash_total, 1731625193984)
 
     def test_convert_file_line_to_detail_record_should_return_none_on_none_line(self):
-        self.assertEqual(lambda_function.convert_file_line_to_detail_record(None), None)
+        self.assertEqual(buffer_parser.convert_file_line_to_detail_record(None), None)
 
     def test_convert_file_line_to_detail_record_should_return_none_on_improper_line_length(
         self,
     ):
-        self.assertEqual(
-            lambda_function.convert_file_line_to_detail_record("test"), None
-        )
+        self.assertEqual(buffer_parser.convert_file_line_to_detail_record("test"), None)
 
     def test_convert_file_line_to_detail_record_should_return_none_on_improper_source_currency_code(
         self,
     ):
         line = "Dana8402MD000013674316250000013675000000000013675683750999999999999999                                                       "
-        self.assertEqual(lambda_function.convert_file_line_to_detail_record(line), None)
+        self.assertEqual(buffer_parser.convert_file_line_to_detail_record(line), None)
 
     def test_convert_file_line_to_detail_record_should_return_none_on_improper_reference_currency_code(
         self,
     ):
         line = "D555ana2MD000013674316250000013675000000000013675683750999999999999999                                                       "
-        self.assertEqual(lambda_function.convert_file_line_to_detail_record(line), None)
+        self.assertEqual(buffer_parser.convert_file_line_to_detail_record(line), None)
 
     def test_convert_file_line_to_detail_record_should_return_none_on_improper_source_currency_exponent(
         self,
     ):
         line = "D555777pMD000013674316250000013675000000000013675683750999999999999999                                                       "
-        self.assertEqual(lambda_function.convert_file_line_to_detail_record(line), None)
+        self.assertEqual(buffer_parser.convert_file_line_to_detail_record(line), None)
 
     def test_convert_file_line_to_detail_record_should_return_none_on_improper_buy_currency_conversion_rate(
         self,
     ):
         line = "D5557772MD0000136p4316250000013675000000000013675683750999999999999999                                                       "
-        self.assertEqual(lambda_function.convert_file_line_to_detail_record(line), None)
+        self.assertEqual(buffer_parser.convert_file_line_to_detail_record(line), None)
 
     def test_convert_file_line_to_detail_record_should_return_none_on_improper_mid_currency_conversion_rate(
         self,
     ):
         line = "D5557772MD0000136243162500000136p5000000000013675683750999999999999999                                                       "
-        self.assertEqual(lambda_function.convert_file_line_to_detail_record(line), None)
+        self.assertEqual(buffer_parser.convert_file_line_to_detail_record(line), None)
 
     def test_convert_file_line_to_detail_record_should_return_none_on_improper_sell_currency_conversion_rate(
         self,
     ):
         line = "D5557772MD0000136543162500000136750000000000136p5683750999999999999999                                                       "
-        self.assertEqual(lambda_function.convert_file_line_to_detail_record(line), None)
+        self.assertEqual(buffer_parser.convert_file_line_to_detail_record(line), None)
 
     def test_convert_file_line_to_detail_record_should_return_detail_record(self):
         line = "D5557772MD000013654316250000013675000000000013675683750999999999999999                                                       "
-        data = lambda_function.convert_file_line_to_detail_record(line)
+        data = buffer_parser.convert_file_line_to_detail_record(line)
         self.assertEqual(data.source_currency_code, 555)
         self.assertEqual(data.reference_currency_code, 777)
         self.assertEqual(data.source_currency_exponent, 2)
@@ -335,10 +531,1814 @@ class TestConversion(unittest.TestCase):
         data = lambda_function.is_file_name_valid(file_name)
         self.assertEqual(data, True)
 
-    def test_set_currency_rates_file_name_should_set_latest_file_name(self):
+    def test_file_catalog_should_return_latest_file_name(self):
         file_names = ["I_171022_T057.sw0", "I_171025_T057.sw0", "I_171019_T057.sw0"]
-        lambda_function.set_currency_rates_file_name(file_names)
-        self.assertEqual(lambda_function.currency_rates_file_name, "I_171025_T057.sw0")
+        catalog = file_discovery.FileCatalog(
+            file_discovery.DiscoveredFile(file_name, 100) for file_name in file_names
+        )
+        self.assertEqual(catalog.latest().key, "I_171025_T057.sw0")
+
+    def test_file_catalog_should_answer_date_queries(self):
+        catalog = file_discovery.FileCatalog(
+            file_discovery.DiscoveredFile(file_name, size)
+            for file_name, size in [
+                ("I_171025_T057.sw0", 100),
+                ("I_171019_T057.sw0", 100),
+                ("I_171022_T058.sw0", 100),
+                ("I_171022_T057.sw0", 100),
+                ("I_171026_T057.sw0", 0),
+                ("I_171027_T057.txt", 100),
+            ]
+        )
+        self.assertEqual(len(catalog), 4)
+        self.assertEqual(catalog.latest().key, "I_171025_T057.sw0")
+        self.assertEqual(
+            [file.key for file in catalog.since(171022)],
+            ["I_171022_T057.sw0", "I_171022_T058.sw0", "I_171025_T057.sw0"],
+        )
+        self.assertEqual(
+            [file.key for file in catalog.between(171020, 171024)],
+            ["I_171022_T057.sw0", "I_171022_T058.sw0"],
+        )
+        self.assertEqual(
+            [file.key for file in catalog.not_processed("I_171022_T057.sw0")],
+            ["I_171022_T058.sw0", "I_171025_T057.sw0"],
+        )
+        self.assertEqual(len(catalog.not_processed(None)), 4)
+        self.assertEqual(catalog.not_processed("I_171025_T057.sw0"), [])
+        self.assertIsNone(file_discovery.FileCatalog([]).latest())
+
+    def test_process_file_should_return_allowed_detail_records_from_file(self):
+        with open("I_171021_T057.sw0", "rt") as file:
+            data = buffer_parser.process_file(file)
+        self.assertEqual(data.error, None)
+        self.assertEqual(data.header.date, str(datetime(2017, 10, 21, 14, 0, 19)))
+        self.assertEqual(data.trailer.total_records, 222)
+        self.assertEqual(len(data.detail_records), 150)
+
+    def test_process_file_should_accept_bytes_lines_iterator(self):
+        lines = iter(
+            [
+                b"H201710211400191",
+                b"D0088402MD000001134066410000001134350000000001134633590999999999999999",
+                b"T00000100000001134350000",
+            ]
+        )
+        data = buffer_parser.process_file(lines)
+        self.assertEqual(data.error, None)
+        self.assertEqual(len(data.detail_records), 1)
+        self.assertEqual(data.detail_records[0].source_currency_code, 8)
+
+    def test_process_file_should_return_error_on_trailer_total_records_mismatch(self):
+        lines = [
+            "H201710211400191",
+            "D0088402MD000001134066410000001134350000000001134633590999999999999999",
+            "T00022200001731625193984",
+        ]
+        data = buffer_parser.process_file(lines)
+        self.assertEqual(
+            data.error, "Number of data records does not match with trailer"
+        )
+        self.assertEqual(data.detail_records, [])
+
+    def test_process_file_should_return_error_on_improper_file_format(self):
+        lines = [
+            "H201710211400191",
+            "T00000000001731625193984",
+            "D0088402MD000001134066410000001134350000000001134633590999999999999999",
+        ]
+        data = buffer_parser.process_file(lines)
+        self.assertEqual(data.error, buffer_parser.IMPROPER_FILE_FORMAT_ERROR)
+
+    def test_import_rates_should_download_and_parse_file_once(self):
+        with open("I_171021_T057.sw0", "rb") as file:
+            body = file.read()
+        s3_client, stubber = create_stubbed_s3_client()
+        stubber.add_response(
+            "list_objects_v2",
+            {"Contents": [{"Key": "I_171021_T057.sw0", "Size": len(body)}]},
+            {"Bucket": "rates", "Prefix": cc.CURRENCY_RATES_FILE_PREFIX},
+        )
+        stubber.add_response(
+            "get_object",
+            {
+                "Body": StreamingBody(io.BytesIO(body), len(body)),
+                "ContentLength": len(body),
+            },
+            {"Bucket": "rates", "Key": "I_171021_T057.sw0"},
+        )
+        s3_session = mock.Mock()
+        s3_session.client.return_value = s3_client
+        http_session = mock.Mock()
+        with stubber, patch_runtime_context(
+            s3_session=s3_session,
+            http_session=http_session,
+            run_on_aws=True,
+            s3_bucket_name="rates",
+        ), mock.patch.object(
+            buffer_parser, "process_chunks", wraps=buffer_parser.process_chunks
+        ) as process_chunks:
+            post = http_session.post
+            post.return_value.status_code = HTTPStatus.OK
+            lambda_function.import_rates()
+            stubber.assert_no_pending_responses()
+
+        self.assertEqual(process_chunks.call_count, 1)
+        self.assertEqual(post.call_count, 1)
+        self.assertIn(
+            b'"total_records": 222', b"".join(post.call_args.kwargs["data"]())
+        )
+
+    def test_s3_file_discovery_should_find_latest_file_with_single_listing(self):
+        s3_client, stubber = create_stubbed_s3_client()
+        stubber.add_response(
+            "list_objects_v2",
+            {
+                "Contents": [
+                    {"Key": "I_171019_T057.sw0", "Size": 100},
+                    {"Key": "I_171021_T057.sw0", "Size": 100},
+                    {"Key": "I_171022_T057.sw0", "Size": 0},
+                    {"Key": "I_171022_T057.txt", "Size": 100},
+                ]
+            },
+            {"Bucket": "rates", "Prefix": cc.CURRENCY_RATES_FILE_PREFIX},
+        )
+        discovery = file_discovery.S3FileDiscovery(
+            s3_client, "rates", cc.CURRENCY_RATES_FILE_PREFIX
+        )
+        with stubber:
+            latest_file = discovery.find_latest_file()
+            stubber.assert_no_pending_responses()
+
+        self.assertEqual(latest_file, ("I_171021_T057.sw0", 100, None))
+
+    def test_s3_file_discovery_should_find_files_newer_than_last_processed_file(self):
+        s3_client, stubber = create_stubbed_s3_client()
+        stubber.add_client_error(
+            "get_object",
+            "NoSuchKey",
+            expected_params={"Bucket": "rates", "Key": "manifest.json"},
+        )
+        stubber.add_response(
+            "list_objects_v2",
+            {"Contents": [{"Key": "I_171021_T057.sw0", "Size": 100}]},
+            {"Bucket": "rates", "Prefix": "rates/"},
+        )
+        stubber.add_response(
+            "put_object",
+            {},
+            {
+                "Bucket": "rates",
+                "Key": "manifest.json",
+                "Body": b'{"last_processed_key": "I_171021_T057.sw0"}',
+            },
+        )
+        stubber.add_response(
+            "list_objects_v2",
+            {"Contents": [{"Key": "I_171021_T057.sw0", "Size": 100}]},
+            {"Bucket": "rates", "Prefix": "rates/"},
+        )
+        # late uploaded file of the later date, whose key sorts before the processed one
+        stubber.add_response(
+            "list_objects_v2",
+            {
+                "Contents": [
+                    {"Key": "A_171022_T057.sw0", "Size": 100},
+                    {"Key": "I_171020_T057.sw0", "Size": 100},
+                    {"Key": "I_171021_T057.sw0", "Size": 100},
+                ]
+            },
+            {"Bucket": "rates", "Prefix": "rates/"},
+        )
+        discovery = file_discovery.S3FileDiscovery(
+            s3_client,
+            "rates",
+            "rates/",
+            state_store.S3JsonStore(s3_client, "rates", "manifest.json"),
+        )
+        with stubber:
+            self.assertEqual(discovery.find_latest_file().key, "I_171021_T057.sw0")
+            discovery.save_last_processed_key("I_171021_T057.sw0")
+            self.assertIsNone(discovery.find_latest_file())
+            self.assertEqual(discovery.find_latest_file().key, "A_171022_T057.sw0")
+            stubber.assert_no_pending_responses()
+
+    def test_import_rates_should_skip_when_no_new_s3_file(self):
+        s3_client, stubber = create_stubbed_s3_client()
+        stubber.add_response(
+            "list_objects_v2",
+            {"Contents": [{"Key": "I_171021_T057.sw0", "Size": 100}]},
+            {"Bucket": "rates", "Prefix": cc.CURRENCY_RATES_FILE_PREFIX},
+        )
+        s3_session = mock.Mock()
+        s3_session.client.return_value = s3_client
+        http_session = mock.Mock()
+        with stubber, patch_runtime_context(
+            s3_session=s3_session,
+            http_session=http_session,
+            run_on_aws=True,
+            s3_bucket_name="rates",
+        ):
+            runtime.get_runtime_context().file_discovery.save_last_processed_key(
+                "I_171021_T057.sw0"
+            )
+            with self.assertNoLogs(level="ERROR"):
+                lambda_function.import_rates()
+            stubber.assert_no_pending_responses()
+
+        self.assertEqual(http_session.post.call_count, 0)
+
+    def test_record_layout_should_parse_fields(self):
+        layout = record_layouts.RecordLayout(
+            [("name", 0, 1, str), ("number", 2, 4, int)]
+        )
+        self.assertEqual(layout.length, 5)
+        self.assertEqual(layout.parse("ab123   "), {"name": "ab", "number": 123})
+        self.assertEqual(
+            record_layouts.RecordLayout([("number", 2, 4, int)]).parse("ab123"),
+            {"number": 123},
+        )
+
+    def test_record_layout_should_convert_as_fast_as_written_out_positions(self):
+        detail_lines = benchmarks.read_sample_file_lines(20)[1:-1]
+        layout_time, slicing_time = benchmarks.measure_detail_record_conversion(
+            detail_lines, repeat=15
+        )
+        layout = record_layouts.get_record_layouts(cc.HEADER_FORMAT_VERSION).detail
+        self.assertEqual(
+            buffer_parser.convert_file_line_to_detail_record(
+                detail_lines[0], layout
+            ).to_wire(),
+            benchmarks.convert_file_line_by_slicing(detail_lines[0]).to_wire(),
+        )
+        self.assertLessEqual(
+            layout_time, slicing_time * (1 + benchmarks.RECORD_LAYOUT_TOLERANCE)
+        )
+
+    def test_record_layout_registration_should_require_model_argument_order(self):
+        layouts = record_layouts.get_record_layouts(cc.HEADER_FORMAT_VERSION)
+        with self.assertRaises(ValueError):
+            record_layouts.register_record_layouts(
+                "2",
+                header=layouts.header,
+                detail=record_layouts.RecordLayout(reversed(layouts.detail.fields)),
+                trailer=layouts.trailer,
+            )
+        self.assertIsNone(record_layouts.get_record_layouts("2"))
+
+    def test_record_layouts_should_be_registered_without_lambda_function(self):
+        result = subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                "import sys, record_layouts; "
+                "print(record_layouts.get_record_layouts('1') is not None, "
+                "'lambda_function' in sys.modules)",
+            ],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        )
+
+        self.assertEqual(result.stdout.split(), ["True", "False"])
+
+    def test_process_file_should_use_layouts_registered_for_header_format_version(
+        self,
+    ):
+        layouts = record_layouts.get_record_layouts(cc.HEADER_FORMAT_VERSION)
+        # format version 2 in this test has one additional character before the fields
+        detail_fields = [
+            (name, start + 1, end + 1, convert)
+            for name, start, end, convert in layouts.detail.fields
+        ]
+        record_layouts.register_record_layouts(
+            "2",
+            header=layouts.header,
+            detail=record_layouts.RecordLayout(detail_fields),
+            trailer=layouts.trailer,
+        )
+        lines = [
+            "H201710211400192",
+            "DX0088402MD000001134066410000001134350000000001134633590999999999999999",
+            "T00000100000001134350000",
+        ]
+        try:
+            data = buffer_parser.process_file(lines)
+        finally:
+            del record_layouts.record_layouts["2"]
+        self.assertEqual(data.error, None)
+        self.assertEqual(data.header.date, str(datetime(2017, 10, 21, 14, 0, 19)))
+        self.assertEqual(data.detail_records[0].source_currency_code, 8)
+        self.assertEqual(data.detail_records[0].mid_currency_conversion_rate, 113.435)
+
+    def test_convert_exchange_rate_to_fixed_point_should_return_scaled_integer(self):
+        self.assertEqual(
+            record_layouts.convert_exchange_rate_to_fixed_point("000013654316250"),
+            13654316250,
+        )
+
+    def test_convert_exchange_rate_to_fixed_point_should_raise_exception_on_improper_conversion_rate(
+        self,
+    ):
+        with self.assertRaises(ValueError):
+            record_layouts.convert_exchange_rate_to_fixed_point("+00013654316250")
+
+    def test_format_fixed_point_exchange_rate_should_return_exact_decimal(self):
+        self.assertEqual(
+            models.format_fixed_point_exchange_rate(13675683750),
+            "1367.568375",
+        )
+        self.assertEqual(models.format_fixed_point_exchange_rate(13675000000), "1367.5")
+        self.assertEqual(models.format_fixed_point_exchange_rate(10000000), "1.0")
+
+    def test_to_wire_should_encode_fixed_point_rates_as_float_wire_values(self):
+        with open("I_171021_T057.sw0", "rt") as file:
+            float_data = buffer_parser.process_file(file)
+        with open("I_171021_T057.sw0", "rt") as file, patch_runtime_context(
+            fixed_point_rates=True
+        ):
+            fixed_point_data = buffer_parser.process_file(file)
+        self.assertEqual(
+            fixed_point_data.detail_records[0].buy_currency_conversion_rate,
+            1134066410,
+        )
+        self.assertEqual(
+            json.loads(
+                fixed_point_data.to_wire(),
+                parse_float=Decimal,
+            ),
+            json.loads(
+                jsonpickle.encode(float_data, unpicklable=False), parse_float=Decimal
+            ),
+        )
+
+    def test_to_wire_should_match_jsonpickle_encoding(self):
+        with open("I_171021_T057.sw0", "rt") as file:
+            data = buffer_parser.process_file(file)
+        self.assertEqual(data.to_wire(), jsonpickle.encode(data, unpicklable=False))
+
+    def test_to_wire_should_encode_error_request_model(self):
+        data = models.RequestModel(
+            header=None, detail_records=[], trailer=None, error="Improper file format"
+        )
+        self.assertEqual(data.to_wire(), jsonpickle.encode(data, unpicklable=False))
+
+    def test_detail_record_model_should_not_have_instance_dict(self):
+        data = DetailRecordModel(978, 840, 2, "M", "D", 1.0, 1.0, 1.0)
+        self.assertFalse(hasattr(data, "__dict__"))
+
+    def test_iter_wire_should_serialize_detail_records_generator(self):
+        with open("I_171021_T057.sw0", "rt") as file:
+            expected = buffer_parser.process_file(file).to_wire()
+        with open("I_171021_T057.sw0", "rt") as file:
+            data = models.RequestModel(
+                header=None, detail_records=None, trailer=None, error=None
+            )
+            data.detail_records = buffer_parser.stream_detail_records(
+                buffer_parser.iter_file_lines(file), data
+            )
+            self.assertEqual("".join(data.iter_wire()), expected)
+
+    def test_import_rates_should_send_chunked_request_body(self):
+        with open("I_171021_T057.sw0", "rt") as file:
+            data = buffer_parser.process_file(file)
+        with ImportRatesStandIn() as stand_in, patch_runtime_context(
+            import_rates_url=stand_in.url
+        ), mock.patch.object(
+            lambda_function, "get_exchange_rates_for_import", return_value=data
+        ), mock.patch.object(
+            cc, "IMPORT_RATES_CHUNK_SIZE", 1024
+        ):
+            lambda_function.import_rates()
+
+        self.assertEqual(len(stand_in.requests), 1)
+        request = stand_in.requests[0]
+        self.assertEqual(request["headers"]["Transfer-Encoding"], "chunked")
+        self.assertGreater(request["chunks"], 1)
+        self.assertEqual(request["body"], data.to_wire().encode("utf-8"))
+
+    def test_import_rates_should_send_gzip_compressed_request_body(self):
+        with open("I_171021_T057.sw0", "rt") as file:
+            data = buffer_parser.process_file(file)
+        with ImportRatesStandIn() as stand_in, patch_runtime_context(
+            import_rates_url=stand_in.url, import_rates_gzip=True
+        ), mock.patch.object(
+            lambda_function, "get_exchange_rates_for_import", return_value=data
+        ):
+            lambda_function.import_rates()
+
+        request = stand_in.requests[0]
+        self.assertEqual(request["headers"]["Content-Encoding"], "gzip")
+        self.assertEqual(request["body"], data.to_wire().encode("utf-8"))
+
+    def test_import_rates_should_send_batches_and_commit_import_session(self):
+        with open("I_171021_T057.sw0", "rt") as file:
+            data = buffer_parser.process_file(file)
+        with ImportRatesStandIn() as stand_in, patch_runtime_context(
+            import_rates_url=stand_in.url, import_rates_batch_size=40
+        ), mock.patch.object(
+            lambda_function, "get_exchange_rates_for_import", return_value=data
+        ):
+            lambda_function.import_rates()
+
+        batches = [
+            json.loads(request["body"])
+            for request in stand_in.requests
+            if request["path"].endswith(cc.IMPORT_RATES_BATCH_PATH)
+        ]
+        commit = json.loads(stand_in.requests[-1]["body"])
+        self.assertEqual(len(stand_in.requests), 5)
+        self.assertTrue(
+            stand_in.requests[-1]["path"].endswith(cc.IMPORT_RATES_COMMIT_PATH)
+        )
+        self.assertEqual(
+            sorted(batch["sequence_number"] for batch in batches), [0, 1, 2, 3]
+        )
+        self.assertEqual(
+            {batch["session_id"] for batch in batches}, {commit["session_id"]}
+        )
+        self.assertEqual(commit["batch_count"], 4)
+        self.assertEqual(commit["trailer"]["total_records"], 222)
+        self.assertEqual(
+            [
+                record
+                for batch in sorted(batches, key=lambda batch: batch["sequence_number"])
+                for record in batch["detail_records"]
+            ],
+            json.loads(data.to_wire())["detail_records"],
+        )
+
+    def test_import_rates_in_batches_should_send_other_batches_when_batch_raises(self):
+        with open("I_171021_T057.sw0", "rt") as file:
+            data = buffer_parser.process_file(file)
+        with ImportRatesStandIn() as stand_in, patch_runtime_context(
+            import_rates_url=stand_in.url
+        ), mock.patch.object(
+            lambda_function,
+            "post_import_request",
+            side_effect=[requests.ConnectionError(), True, True, True],
+        ) as post_import_request:
+            with self.assertLogs(level="ERROR"):
+                imported = lambda_function.import_rates_in_batches(data, 40)
+
+        self.assertFalse(imported)
+        self.assertEqual(post_import_request.call_count, 4)
+
+    def test_import_rates_should_resume_import_session_with_missing_batches(self):
+        with open("I_171021_T057.sw0", "rt") as file:
+            data = buffer_parser.process_file(file)
+        session_id = lambda_function.get_import_session_id(data, 40)
+        with ImportRatesStandIn(
+            received_sequence_numbers={session_id: [0, 2]}
+        ) as stand_in, patch_runtime_context(
+            import_rates_url=stand_in.url, import_rates_batch_size=40
+        ), mock.patch.object(
+            lambda_function, "get_exchange_rates_for_import", return_value=data
+        ):
+            lambda_function.import_rates()
+
+        self.assertEqual(
+            sorted(
+                json.loads(request["body"])["sequence_number"]
+                for request in stand_in.requests[:-1]
+            ),
+            [1, 3],
+        )
+        self.assertEqual(json.loads(stand_in.requests[-1]["body"])["batch_count"], 4)
+
+    def test_import_rates_should_not_commit_import_session_on_failed_batch(self):
+        with open("I_171021_T057.sw0", "rt") as file:
+            data = buffer_parser.process_file(file)
+        with ImportRatesStandIn(
+            status_codes=[HTTPStatus.BAD_REQUEST]
+        ) as stand_in, patch_runtime_context(
+            import_rates_url=stand_in.url, import_rates_batch_size=40
+        ), mock.patch.object(
+            lambda_function, "get_exchange_rates_for_import", return_value=data
+        ):
+            lambda_function.import_rates()
+
+        self.assertEqual(len(stand_in.requests), 4)
+        self.assertFalse(
+            any(
+                request["path"].endswith(cc.IMPORT_RATES_COMMIT_PATH)
+                for request in stand_in.requests
+            )
+        )
+
+    def test_retrying_http_session_should_retry_unavailable_service(self):
+        session = http_session.RetryingHttpSession(
+            pool_size=1, timeout=5, max_retries=3, backoff_base=0, backoff_max=0
+        )
+        with ImportRatesStandIn(
+            status_codes=[HTTPStatus.SERVICE_UNAVAILABLE, HTTPStatus.TOO_MANY_REQUESTS]
+        ) as stand_in:
+            res = session.post(stand_in.url, data=lambda: iter([b"{}"]))
+
+        self.assertEqual(res.status_code, HTTPStatus.OK)
+        self.assertEqual(len(stand_in.requests), 3)
+        self.assertEqual(
+            [request["body"] for request in stand_in.requests], [b"{}"] * 3
+        )
+        self.assertEqual(
+            [metric.status_code for metric in session.attempt_metrics],
+            [
+                HTTPStatus.SERVICE_UNAVAILABLE,
+                HTTPStatus.TOO_MANY_REQUESTS,
+                HTTPStatus.OK,
+            ],
+        )
+        self.assertTrue(all(metric.latency > 0 for metric in session.attempt_metrics))
+
+    def test_retrying_http_session_should_not_retry_bad_request(self):
+        session = http_session.RetryingHttpSession(
+            pool_size=1, timeout=5, max_retries=3, backoff_base=0, backoff_max=0
+        )
+        with ImportRatesStandIn(status_codes=[HTTPStatus.BAD_REQUEST]) as stand_in:
+            res = session.post(stand_in.url, data=b"{}")
+
+        self.assertEqual(res.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertEqual(len(stand_in.requests), 1)
+
+    def test_retrying_http_session_should_retry_bad_gateway_only_for_idempotent_requests(
+        self,
+    ):
+        session = http_session.RetryingHttpSession(
+            pool_size=1, timeout=5, max_retries=3, backoff_base=0, backoff_max=0
+        )
+        with ImportRatesStandIn(status_codes=[HTTPStatus.BAD_GATEWAY]) as stand_in:
+            res = session.post(stand_in.url, data=b"{}")
+        self.assertEqual(res.status_code, HTTPStatus.BAD_GATEWAY)
+        self.assertEqual(len(stand_in.requests), 1)
+
+        responses = [
+            mock.Mock(status_code=HTTPStatus.BAD_GATEWAY),
+            mock.Mock(status_code=HTTPStatus.OK),
+        ]
+        with mock.patch.object(session.session, "request", side_effect=responses):
+            res = session.get("http://api/import/sessions/id")
+        self.assertEqual(res.status_code, HTTPStatus.OK)
+
+    def test_retrying_http_session_should_not_retry_post_after_read_timeout(self):
+        session = http_session.RetryingHttpSession(
+            pool_size=1, timeout=5, max_retries=3, backoff_base=0, backoff_max=0
+        )
+        response = mock.Mock(status_code=HTTPStatus.OK)
+        with mock.patch.object(
+            session.session,
+            "request",
+            side_effect=[requests.ReadTimeout(), requests.ReadTimeout(), response],
+        ) as request:
+            with self.assertRaises(requests.ReadTimeout):
+                session.post("http://api/import", data=b"{}")
+            self.assertEqual(request.call_count, 1)
+            self.assertIs(session.get("http://api/import"), response)
+            self.assertEqual(request.call_count, 3)
+
+    def test_retrying_http_session_should_raise_error_after_last_retry(self):
+        session = http_session.RetryingHttpSession(
+            pool_size=1, timeout=5, max_retries=2, backoff_base=0, backoff_max=0
+        )
+        with ImportRatesStandIn() as stand_in:
+            url = stand_in.url
+        with self.assertRaises(requests.ConnectionError):
+            session.post(url, data=b"{}")
+        self.assertEqual(len(session.attempt_metrics), 3)
+        self.assertTrue(all(metric.error for metric in session.attempt_metrics))
+
+    def test_retrying_http_session_should_reuse_connection(self):
+        session = http_session.RetryingHttpSession(
+            pool_size=1, timeout=5, max_retries=0, backoff_base=0, backoff_max=0
+        )
+        with ImportRatesStandIn() as stand_in:
+            session.post(stand_in.url, data=b"{}")
+            session.post(stand_in.url, data=b"{}")
+
+        self.assertEqual(len(stand_in.connections), 1)
+
+    def test_runtime_context_should_be_created_once_across_invocations(self):
+        with mock.patch.object(runtime, "runtime_context", None), mock.patch.object(
+            runtime, "ImporterConfig", wraps=runtime.ImporterConfig
+        ) as importer_config, mock.patch("boto3.Session") as session:
+            context = runtime.get_runtime_context()
+            for _ in range(3):
+                self.assertIs(runtime.get_runtime_context(), context)
+                self.assertIs(context.s3_client, context.s3_client)
+                self.assertIs(context.file_discovery, context.file_discovery)
+                self.assertIs(context.http_session, context.http_session)
+
+            self.assertEqual(importer_config.call_count, 1)
+            self.assertEqual(session.call_count, 1)
+            self.assertEqual(session.return_value.client.call_count, 1)
+
+    def test_reset_runtime_context_should_read_configuration_again(self):
+        with mock.patch.object(runtime, "runtime_context", None), mock.patch.dict(
+            os.environ, {"IMPORT_RATES_BATCH_SIZE": "40"}
+        ):
+            context = runtime.get_runtime_context()
+            http_session = context.http_session
+            os.environ["IMPORT_RATES_BATCH_SIZE"] = "80"
+            self.assertEqual(
+                runtime.get_runtime_context().config.import_rates_batch_size, 40
+            )
+
+            with mock.patch.object(http_session, "close") as close:
+                runtime.reset_runtime_context()
+            self.assertEqual(close.call_count, 1)
+            self.assertIsNot(runtime.get_runtime_context(), context)
+            self.assertEqual(
+                runtime.get_runtime_context().config.import_rates_batch_size, 80
+            )
+
+    def test_backfill_should_import_files_between_dates_in_date_order(self):
+        with open("I_171021_T057.sw0", "rt") as file:
+            content = file.read()
+        with tempfile.TemporaryDirectory() as path:
+            for date in [171019, 171020, 171021, 171022, 171025]:
+                with open(os.path.join(path, f"I_{date}_T057.sw0"), "wt") as file:
+                    file.write(content.replace("H20171021", f"H20{date}", 1))
+            with ImportRatesStandIn() as stand_in, patch_runtime_context(
+                import_rates_url=stand_in.url
+            ), mock.patch.object(cc, "CURRENCY_RATES_FILE_PATH", path + os.sep):
+                summary = lambda_function.backfill(171020, 171022)
+
+        self.assertEqual(summary.files, 3)
+        self.assertEqual(summary.imported_files, 3)
+        self.assertEqual(summary.records, 450)
+        self.assertEqual(
+            [
+                json.loads(request["body"])["header"]["date"]
+                for request in stand_in.requests
+            ],
+            ["2017-10-20 14:00:19", "2017-10-21 14:00:19", "2017-10-22 14:00:19"],
+        )
+
+    def test_backfill_should_merge_worker_metrics_and_store_digests(self):
+        with open("I_171021_T057.sw0", "rt") as file:
+            content = file.read()
+        with tempfile.TemporaryDirectory() as path:
+            for date in [171020, 171021]:
+                with open(os.path.join(path, f"I_{date}_T057.sw0"), "wt") as file:
+                    file.write(content.replace("H20171021", f"H20{date}", 1))
+            with ImportRatesStandIn() as stand_in, patch_runtime_context(
+                import_rates_url=stand_in.url,
+                import_metrics=True,
+                import_rates_dedup=True,
+            ), mock.patch.object(
+                cc, "CURRENCY_RATES_FILE_PATH", path + os.sep
+            ), mock.patch(
+                "sys.stdout", new_callable=io.StringIO
+            ) as stdout:
+                with instrumentation.instrumented_run(
+                    runtime.get_runtime_context().config, "backfill"
+                ):
+                    lambda_function.backfill(171020, 171021)
+                digests = runtime.get_runtime_context().imported_digests.digests
+
+        summary = json.loads(stdout.getvalue())
+        self.assertGreater(summary["parse_duration"], 0)
+        self.assertEqual(summary["records_read"], 444)
+        self.assertEqual(summary["records_accepted"], 300)
+        self.assertEqual(
+            sum(
+                value
+                for name, value in summary.items()
+                if name.startswith("records_rejected_")
+            ),
+            144,
+        )
+        self.assertEqual(summary["files_imported"], 2)
+        self.assertEqual(len(digests), 2)
+
+    def test_import_rates_should_send_only_changed_exchange_rates_in_delta_mode(self):
+        with open("I_171021_T057.sw0", "rt") as file:
+            data = buffer_parser.process_file(file)
+        with open("I_171021_T057.sw0", "rt") as file:
+            changed_data = buffer_parser.process_file(file)
+        changed_data.detail_records[0].buy_currency_conversion_rate += 1
+        removed_record = changed_data.detail_records[-1]
+        changed_data.detail_records = changed_data.detail_records[:-1]
+        with tempfile.TemporaryDirectory() as path, ImportRatesStandIn() as stand_in, patch_runtime_context(
+            import_rates_url=stand_in.url, import_rates_delta=True
+        ), mock.patch.object(
+            cc, "CURRENCY_RATES_FILE_PATH", path + os.sep
+        ):
+            self.assertTrue(lambda_function.import_exchange_rates(data))
+            self.assertTrue(lambda_function.import_exchange_rates(changed_data))
+
+        self.assertEqual(len(stand_in.requests), 2)
+        self.assertEqual(
+            len(json.loads(stand_in.requests[0]["body"])["detail_records"]), 150
+        )
+        self.assertTrue(
+            stand_in.requests[1]["path"].endswith(cc.IMPORT_RATES_DELTA_PATH)
+        )
+        delta = json.loads(stand_in.requests[1]["body"])
+        self.assertEqual(
+            [record["source_currency_code"] for record in delta["detail_records"]],
+            [
+                changed_data.detail_records[0].source_currency_code,
+                cc.BASE_CURRENCY_NUMBER,
+            ],
+        )
+        self.assertEqual(
+            delta["removed_currency_codes"], [removed_record.source_currency_code]
+        )
+        self.assertEqual(delta["header"], json.loads(data.header.to_wire()))
+
+    def test_import_rates_should_send_all_exchange_rates_on_changed_base_currency(self):
+        with open("I_171021_T057.sw0", "rt") as file:
+            data = buffer_parser.process_file(file)
+        with tempfile.TemporaryDirectory() as path, ImportRatesStandIn() as stand_in, patch_runtime_context(
+            import_rates_url=stand_in.url, import_rates_delta=True
+        ), mock.patch.object(
+            cc, "CURRENCY_RATES_FILE_PATH", path + os.sep
+        ):
+            self.assertTrue(lambda_function.import_exchange_rates(data))
+            for record in data.detail_records:
+                if record.source_currency_code == cc.BASE_CURRENCY_NUMBER:
+                    record.buy_currency_conversion_rate += 1
+            self.assertTrue(lambda_function.import_exchange_rates(data))
+
+        self.assertEqual(
+            [request["path"] for request in stand_in.requests],
+            [stand_in.requests[0]["path"]] * 2,
+        )
+        self.assertEqual(
+            len(json.loads(stand_in.requests[1]["body"])["detail_records"]), 150
+        )
+
+    def test_import_rates_should_skip_redelivered_file_content(self):
+        with open("I_171021_T057.sw0", "rb") as file:
+            content = file.read()
+        with tempfile.TemporaryDirectory() as path, ImportRatesStandIn() as stand_in, patch_runtime_context(
+            import_rates_url=stand_in.url, import_rates_dedup=True
+        ), mock.patch.object(
+            cc, "CURRENCY_RATES_FILE_PATH", path + os.sep
+        ), mock.patch.object(
+            buffer_parser, "process_chunks", wraps=buffer_parser.process_chunks
+        ) as process_chunks:
+            with open(os.path.join(path, "I_171021_T057.sw0"), "wb") as file:
+                file.write(content)
+            lambda_function.import_rates()
+            with open(os.path.join(path, "I_171022_T057.sw0"), "wb") as file:
+                file.write(content)
+            lambda_function.import_rates()
+            digests = state_store.LocalJsonStore(
+                os.path.join(path, cc.IMPORTED_DIGESTS_NAME)
+            ).load()
+
+        self.assertEqual(process_chunks.call_count, 1)
+        self.assertEqual(len(stand_in.requests), 1)
+        self.assertEqual(
+            digests["digests"], ["sha256:" + hashlib.sha256(content).hexdigest()]
+        )
+
+    def test_import_rates_should_skip_already_imported_s3_etag_without_download(self):
+        s3_client, stubber = create_stubbed_s3_client()
+        stubber.add_response(
+            "list_objects_v2",
+            {"Contents": [{"Key": "I_171022_T057.sw0", "Size": 100, "ETag": '"abc"'}]},
+            {"Bucket": "rates", "Prefix": cc.CURRENCY_RATES_FILE_PREFIX},
+        )
+        s3_session = mock.Mock()
+        s3_session.client.return_value = s3_client
+        http_session = mock.Mock()
+        with stubber, patch_runtime_context(
+            s3_session=s3_session,
+            http_session=http_session,
+            run_on_aws=True,
+            s3_bucket_name="rates",
+            import_rates_dedup=True,
+        ):
+            runtime.get_runtime_context().imported_digests.digests = ["etag:abc"]
+            lambda_function.import_rates()
+            stubber.assert_no_pending_responses()
+
+        self.assertEqual(http_session.post.call_count, 0)
+
+    def test_imported_digests_should_keep_most_recent_digests(self):
+        with tempfile.TemporaryDirectory() as path:
+            store = state_store.LocalJsonStore(os.path.join(path, "digests.json"))
+            digests = state_store.ImportedDigests(store, max_digests=2)
+            for digest in ["a", "b", "a", "c"]:
+                digests.add(digest)
+
+            self.assertEqual(store.load(), {"digests": ["a", "c"]})
+            self.assertTrue(state_store.ImportedDigests(store, 2).contains("a"))
+            self.assertFalse(state_store.ImportedDigests(store, 2).contains("b"))
+
+    def test_process_file_should_return_error_on_hash_total_mismatch(self):
+        lines = [
+            "H201710211400191",
+            "D0088402MD000001134066410000001134360000000001134633590999999999999999",
+            "T00000100000001134350000",
+        ]
+        with self.assertLogs(level="ERROR") as logs:
+            data = buffer_parser.process_file(lines)
+        self.assertEqual(data.error, "Hash do not match")
+        self.assertIn("Line 3", logs.output[0])
+        self.assertIn("1134360000", logs.output[0])
+
+    def test_process_file_should_report_line_of_improper_hash_total_field(self):
+        lines = [
+            "H201710211400191",
+            "D0088402MD000001134066410000001134350000000001134633590999999999999999",
+            "D0088402MD00000113406641000000113x350000000001134633590999999999999999",
+            "T00000200000002268700000",
+        ]
+        with self.assertLogs(level="ERROR") as logs:
+            data = buffer_parser.process_file(lines)
+        self.assertEqual(data.error, buffer_parser.IMPROPER_FILE_FORMAT_ERROR)
+        self.assertIn("Line 3", logs.output[0])
+
+    def test_process_file_parallel_should_return_same_result_as_process_file(self):
+        with open("I_171021_T057.sw0", "rb") as file:
+            expected = buffer_parser.process_file(file)
+        data = parallel_parser.process_file_parallel("I_171021_T057.sw0", 3)
+        self.assertEqual(data.error, None)
+        self.assertEqual(data.to_wire(), expected.to_wire())
+
+    def test_process_file_parallel_should_parse_bytes_in_fixed_point_mode(self):
+        with open("I_171021_T057.sw0", "rb") as file:
+            body = file.read()
+        with patch_runtime_context(fixed_point_rates=True):
+            expected = buffer_parser.process_file(body.splitlines())
+            data = parallel_parser.process_file_parallel(body, 4)
+        self.assertEqual(data.error, None)
+        self.assertEqual(data.to_wire(), expected.to_wire())
+        self.assertIsInstance(data.detail_records[0].mid_currency_conversion_rate, int)
+
+    def test_process_file_parallel_should_report_line_of_improper_detail_record(self):
+        with open("I_171021_T057.sw0", "rb") as file:
+            lines = file.read().splitlines()
+        lines[150] = b"X" + lines[150][1:]
+        with self.assertLogs(level="ERROR") as logs:
+            data = parallel_parser.process_file_parallel(b"\n".join(lines), 4)
+        self.assertEqual(data.error, buffer_parser.IMPROPER_FILE_FORMAT_ERROR)
+        self.assertIn("Line 151", logs.output[0])
+
+    def test_parse_detail_records_chunk_should_count_lines_and_report_hash_total(self):
+        with open("I_171021_T057.sw0", "rb") as file:
+            lines = file.read().splitlines()
+        chunk = parallel_parser.parse_detail_records_chunk(
+            b"\r\n".join(lines[1:4] + [b""]) + b"\r\n",
+            None,
+            cc.HEADER_FORMAT_VERSION,
+            False,
+            runtime.get_runtime_context().config.record_filter_rules,
+        )
+        self.assertEqual((chunk.lines, chunk.detail_records_count), (4, 3))
+        self.assertEqual(chunk.error, None)
+
+        lines[2] = lines[2][:30] + b"x" + lines[2][31:]
+        chunk = parallel_parser.parse_detail_records_chunk(
+            b"\n".join(lines[1:4]) + b"\n",
+            None,
+            cc.HEADER_FORMAT_VERSION,
+            False,
+            runtime.get_runtime_context().config.record_filter_rules,
+        )
+        self.assertEqual(chunk.error[0], 2)
+        self.assertIn("is not a number", chunk.error[1])
+
+    def test_process_file_parallel_should_return_error_on_trailer_total_records_mismatch(
+        self,
+    ):
+        with open("I_171021_T057.sw0", "rb") as file:
+            lines = file.read().splitlines()
+        del lines[100]
+        data = parallel_parser.process_file_parallel(b"\n".join(lines), 2)
+        self.assertEqual(
+            data.error, "Number of data records does not match with trailer"
+        )
+        self.assertEqual(data.detail_records, [])
+
+    def test_split_line_aligned_ranges_should_not_split_lines(self):
+        buffer = b"H\n" + b"D123\n" * 10 + b"T"
+        ranges = parallel_parser.split_line_aligned_ranges(
+            buffer, 2, len(buffer) - 1, 3
+        )
+        self.assertEqual(len(ranges), 3)
+        self.assertEqual(ranges[0][0], 2)
+        self.assertEqual(ranges[-1][1], len(buffer) - 1)
+        for (_, end), (start, _) in zip(ranges, ranges[1:]):
+            self.assertEqual(end, start)
+            self.assertEqual(buffer[end - 1 : end], b"\n")
+
+    def test_get_exchange_rates_for_import_should_parse_large_file_in_parallel(self):
+        with patch_runtime_context(parallel_parse_min_file_size=1), mock.patch.object(
+            parallel_parser, "get_available_cores", return_value=2
+        ), mock.patch.object(
+            parallel_parser,
+            "process_file_parallel",
+            wraps=parallel_parser.process_file_parallel,
+        ) as process_file_parallel:
+            data = lambda_function.get_exchange_rates_for_import(
+                "I_171021_T057.sw0", parallel=True
+            )
+            lambda_function.get_exchange_rates_for_import("I_171021_T057.sw0")
+        process_file_parallel.assert_called_once_with("./I_171021_T057.sw0")
+        self.assertEqual(data.error, None)
+        self.assertEqual(len(data.detail_records), 150)
+
+    def test_process_file_parallel_should_parse_serially_without_worker_processes(self):
+        with open("I_171021_T057.sw0", "rt") as file:
+            expected = buffer_parser.process_file(file)
+        with mock.patch(
+            "concurrent.futures.ProcessPoolExecutor",
+            side_effect=OSError(38, "Function not implemented"),
+        ), self.assertLogs(level="WARNING"):
+            data = parallel_parser.process_file_parallel("I_171021_T057.sw0", 3)
+        self.assertEqual(data.error, None)
+        self.assertEqual(data.to_wire(), expected.to_wire())
+
+    def test_process_buffer_should_return_same_result_as_process_file(self):
+        with open("I_171021_T057.sw0", "rb") as file:
+            body = file.read()
+        for fixed_point_rates in (False, True):
+            with patch_runtime_context(fixed_point_rates=fixed_point_rates):
+                expected = buffer_parser.process_file(body.splitlines())
+                data = buffer_parser.process_buffer(body)
+            self.assertEqual(data.error, None)
+            self.assertEqual(data.to_wire(), expected.to_wire())
+
+    def test_process_buffer_should_convert_only_filtered_detail_records(self):
+        with open("I_171021_T057.sw0", "rb") as file:
+            body = file.read()
+        with mock.patch.object(
+            buffer_parser,
+            "convert_file_line_to_detail_record",
+            wraps=buffer_parser.convert_file_line_to_detail_record,
+        ) as convert_file_line_to_detail_record:
+            data = buffer_parser.process_buffer(body)
+        self.assertEqual(data.trailer.total_records, 222)
+        self.assertEqual(len(data.detail_records), 150)
+        self.assertEqual(convert_file_line_to_detail_record.call_count, 150)
+
+    @unittest.skipIf(batch_decoder is None, "numpy is not installed")
+    def test_process_buffer_batch_should_return_same_result_as_process_buffer(self):
+        with open("I_171021_T057.sw0", "rb") as file:
+            body = file.read()
+        filter_rules = record_filter.load_filter_rules(
+            {"ALLOWED_REFERENCE_CURRENCY_CODES": "978", "ALLOWED_RATE_CLASSES": "M,F"}
+        )
+        for config in [
+            {},
+            {"fixed_point_rates": True},
+            {"record_filter_rules": filter_rules},
+        ]:
+            with self.subTest(**config), patch_runtime_context(**config):
+                rejected = record_filter.get_rejected_records()
+                expected = buffer_parser.process_buffer(body)
+                expected_rejected = record_filter.get_rejected_records() - rejected
+                rejected = record_filter.get_rejected_records()
+                with mock.patch.object(
+                    buffer_parser, "process_buffer"
+                ) as process_buffer:
+                    data = batch_decoder.process_buffer_batch(body)
+                process_buffer.assert_not_called()
+                self.assertEqual(data.error, None)
+                self.assertEqual(data.header.date, expected.header.date)
+                self.assertEqual(data.trailer.hash_total, expected.trailer.hash_total)
+                self.assertEqual(data.to_wire(), expected.to_wire())
+                self.assertEqual(
+                    record_filter.get_rejected_records() - rejected, expected_rejected
+                )
+
+    @unittest.skipIf(batch_decoder is None, "numpy is not installed")
+    def test_process_buffer_batch_should_parse_improper_content_by_buffer_parser(self):
+        with open("I_171021_T057.sw0", "rb") as file:
+            lines = file.read().splitlines()
+        improper_rate = list(lines)
+        improper_rate[5] = improper_rate[5][:12] + b"p" + improper_rate[5][13:]
+        short_line = list(lines)
+        short_line[5] = short_line[5].rstrip()
+        hash_mismatch = list(lines)
+        del hash_mismatch[5:7]
+        for content in [improper_rate, short_line, lines[1:]]:
+            body = b"\n".join(content)
+            self.assertEqual(batch_decoder.decode_buffer(body), None)
+            expected = buffer_parser.process_buffer(body)
+            data = batch_decoder.process_buffer_batch(body)
+            self.assertEqual(data.error, expected.error)
+            self.assertEqual(data.to_wire(), expected.to_wire())
+
+        body = b"\n".join(hash_mismatch)
+        self.assertEqual(
+            batch_decoder.process_buffer_batch(body).error,
+            buffer_parser.process_buffer(body).error,
+        )
+
+    @unittest.skipIf(batch_decoder is None, "numpy is not installed")
+    def test_decode_detail_characters_should_decode_fields_by_layout_converters(self):
+        layout = record_layouts.get_record_layouts(cc.HEADER_FORMAT_VERSION).detail
+        characters = batch_decoder.get_detail_characters(
+            b"D5557772MD000013654316250000013675000000000013675683750999999999999999\n"
+            b"D0088402FP000001134066410000001134350000000001134633590999999999999999\n",
+            layout.length,
+        )
+        columns, hash_total_values = batch_decoder.decode_detail_characters(
+            characters, layout
+        )
+        self.assertEqual(columns[0].tolist(), [555, 8])
+        self.assertEqual(columns[1].tolist(), [777, 840])
+        self.assertEqual(columns[3].tolist(), [b"M", b"F"])
+        self.assertEqual(columns[5].tolist(), [1365.431625, 113.4066410])
+        self.assertEqual(hash_total_values.tolist(), [13675000000, 1134350000])
+
+    @unittest.skipIf(batch_decoder is None, "numpy is not installed")
+    def test_backfill_should_decode_large_files_in_batch(self):
+        with ImportRatesStandIn() as stand_in, patch_runtime_context(
+            import_rates_url=stand_in.url, batch_decode_min_file_size=1
+        ), mock.patch.object(
+            batch_decoder,
+            "process_buffer_batch",
+            wraps=batch_decoder.process_buffer_batch,
+        ) as process_buffer_batch:
+            summary = lambda_function.backfill(171021, 171021, pipelined=True)
+
+        self.assertEqual((summary.imported_files, summary.records), (1, 150))
+        process_buffer_batch.assert_called_once()
+
+    def test_process_local_file_should_parse_memory_mapped_file_with_crlf_lines(self):
+        with open("I_171021_T057.sw0", "rb") as file:
+            lines = file.read().splitlines()
+        with tempfile.TemporaryDirectory() as path:
+            file_path = os.path.join(path, "I_171021_T057.sw0")
+            with open(file_path, "wb") as file:
+                file.write(b"\r\n".join(lines[:10] + [b"", b"  "] + lines[10:]))
+            data = buffer_parser.process_local_file(file_path)
+        self.assertEqual(data.error, None)
+        self.assertEqual(data.trailer.total_records, 222)
+        self.assertEqual(len(data.detail_records), 150)
+
+    def test_process_buffer_should_return_same_errors_as_process_file(self):
+        detail_line = (
+            "D0088402MD000001134066410000001134350000000001134633590999999999999999"
+        )
+        for lines in (
+            [],
+            [detail_line, "T00000100000001134350000"],
+            ["H201710211400191", detail_line],
+            ["H201710211400191", "T00000100000001134350000", detail_line],
+            ["H201710211400191", "H201710211400191", "T00000100000001134350000"],
+            ["H201710211400191", "D00884", detail_line, "T00000200000001134350000"],
+            ["H201710211400191", detail_line, "T00000200000001134350000"],
+            ["H201710211400191", detail_line, "T00000100000001134350001"],
+        ):
+            expected = buffer_parser.process_file(lines)
+            data = buffer_parser.process_buffer("\n".join(lines).encode())
+            self.assertEqual(data.error, expected.error)
+
+    def test_get_exchange_rates_for_import_should_parse_s3_body_while_streaming(self):
+        with open("I_171021_T057.sw0", "rb") as file:
+            body = file.read()
+        stream = io.BytesIO(body)
+        s3_client, stubber = create_stubbed_s3_client()
+        stubber.add_response(
+            "get_object",
+            {"Body": StreamingBody(stream, len(body)), "ContentLength": len(body)},
+            {"Bucket": "rates", "Key": "I_171021_T057.sw0"},
+        )
+        s3_session = mock.Mock()
+        s3_session.client.return_value = s3_client
+        with stubber, patch_runtime_context(
+            s3_session=s3_session, run_on_aws=True, s3_bucket_name="rates"
+        ), mock.patch.object(cc, "S3_READ_CHUNK_SIZE", 1000), mock.patch.object(
+            stream, "read", wraps=stream.read
+        ) as read:
+            data = lambda_function.get_exchange_rates_for_import("I_171021_T057.sw0")
+
+        self.assertEqual(data.error, None)
+        self.assertEqual(len(data.detail_records), 150)
+        self.assertEqual(read.call_args_list[0], mock.call(1000))
+        self.assertGreater(read.call_count, len(body) // 1000)
+
+    def test_get_exchange_rates_for_import_should_download_large_s3_object_in_ranges(
+        self,
+    ):
+        with open("I_171021_T057.sw0", "rb") as file:
+            body = file.read()
+        s3_client, stubber = create_stubbed_s3_client()
+        stubber.add_response(
+            "get_object",
+            {
+                "Body": StreamingBody(io.BytesIO(body), len(body)),
+                "ContentLength": len(body),
+                "ETag": '"a1b2"',
+            },
+            {"Bucket": "rates", "Key": "I_171021_T057.sw0"},
+        )
+        for start in range(8192, len(body), 8192):
+            end = min(start + 8192, len(body)) - 1
+            stubber.add_response(
+                "get_object",
+                {
+                    "Body": StreamingBody(
+                        io.BytesIO(body[start : end + 1]), end - start + 1
+                    )
+                },
+                {
+                    "Bucket": "rates",
+                    "Key": "I_171021_T057.sw0",
+                    "Range": f"bytes={start}-{end}",
+                    "IfMatch": '"a1b2"',
+                },
+            )
+        s3_session = mock.Mock()
+        s3_session.client.return_value = s3_client
+        with stubber, patch_runtime_context(
+            s3_session=s3_session,
+            run_on_aws=True,
+            s3_bucket_name="rates",
+            s3_ranged_get_min_file_size=1,
+            s3_ranged_get_max_in_flight=1,
+        ), mock.patch.object(cc, "S3_RANGED_GET_PART_SIZE", 8192):
+            data = lambda_function.get_exchange_rates_for_import("I_171021_T057.sw0")
+            stubber.assert_no_pending_responses()
+
+        with open("I_171021_T057.sw0", "rb") as file:
+            expected = buffer_parser.process_file(file)
+        self.assertEqual(data.error, None)
+        self.assertEqual(data.to_wire(), expected.to_wire())
+
+    def test_iter_object_parts_should_yield_parallel_ranges_in_order(self):
+        body = bytes(range(256)) * 100
+
+        def get_object(Bucket, Key, Range, IfMatch):
+            start, end = map(int, Range[len("bytes=") :].split("-"))
+            time.sleep(random.random() / 100)
+            return {"Body": io.BytesIO(body[start : end + 1])}
+
+        s3_client = mock.Mock()
+        s3_client.get_object.side_effect = get_object
+        parts = list(
+            s3_reader.iter_object_parts(
+                s3_client,
+                "rates",
+                "I_171021_T057.sw0",
+                {
+                    "Body": io.BytesIO(body),
+                    "ContentLength": len(body),
+                    "ETag": '"a1b2"',
+                },
+                1000,
+                4,
+            )
+        )
+        self.assertEqual(b"".join(parts), body)
+        self.assertEqual(len(parts), 26)
+        self.assertEqual(s3_client.get_object.call_count, 25)
+
+    def test_iter_object_parts_should_raise_error_on_short_range(self):
+        s3_client = mock.Mock()
+        s3_client.get_object.return_value = {"Body": io.BytesIO(b"123")}
+        parts = s3_reader.iter_object_parts(
+            s3_client,
+            "rates",
+            "I_171021_T057.sw0",
+            {"Body": io.BytesIO(b"0" * 2000), "ContentLength": 2000},
+            1000,
+            2,
+        )
+        self.assertEqual(next(parts), b"0" * 1000)
+        with self.assertRaises(IOError):
+            next(parts)
+
+    def test_iter_object_parts_should_raise_error_on_short_first_part(self):
+        s3_client = mock.Mock()
+        s3_client.get_object.return_value = {"Body": io.BytesIO(b"0" * 1000)}
+        parts = s3_reader.iter_object_parts(
+            s3_client,
+            "rates",
+            "I_171021_T057.sw0",
+            {"Body": io.BytesIO(b"0" * 500), "ContentLength": 2000},
+            1000,
+            2,
+        )
+        with self.assertRaises(IOError):
+            next(parts)
+
+    def test_load_filter_rules_should_default_to_conversion_constants(self):
+        rules = record_filter.load_filter_rules({})
+        self.assertEqual(
+            rules.allowed_reference_currency_codes,
+            frozenset(cc.ALLOWED_REFERENCE_CURRENCY_CODES),
+        )
+        self.assertEqual(rules.allowed_rate_classes, frozenset(cc.ALLOWED_RATE_CLASSES))
+        self.assertEqual(
+            rules.allowed_rate_format_indicators,
+            frozenset(cc.ALLOWED_RATE_FORMAT_INDICATORS),
+        )
+        self.assertEqual(
+            rules.not_allowed_source_currency_codes,
+            frozenset(cc.NOT_ALLOWED_SOURCE_CURRENCY_CODES),
+        )
+
+    def test_load_filter_rules_should_override_config_file_with_environment(self):
+        with tempfile.TemporaryDirectory() as path:
+            config_path = os.path.join(path, "record_filter.json")
+            with open(config_path, "wt") as file:
+                json.dump(
+                    {
+                        "allowed_reference_currency_codes": [840, 978],
+                        "allowed_rate_classes": ["M", "F"],
+                    },
+                    file,
+                )
+            rules = record_filter.load_filter_rules(
+                {
+                    "RECORD_FILTER_CONFIG": config_path,
+                    "ALLOWED_RATE_CLASSES": "F",
+                    "NOT_ALLOWED_SOURCE_CURRENCY_CODES": "157, 158",
+                }
+            )
+        self.assertEqual(rules.allowed_reference_currency_codes, frozenset([840, 978]))
+        self.assertEqual(rules.allowed_rate_classes, frozenset(["F"]))
+        self.assertEqual(
+            rules.allowed_rate_format_indicators,
+            frozenset(cc.ALLOWED_RATE_FORMAT_INDICATORS),
+        )
+        self.assertEqual(rules.not_allowed_source_currency_codes, frozenset([157, 158]))
+
+    def test_load_filter_rules_should_raise_error_on_unknown_rule(self):
+        with tempfile.TemporaryDirectory() as path:
+            config_path = os.path.join(path, "record_filter.json")
+            with open(config_path, "wt") as file:
+                json.dump({"allowed_currencies": [840]}, file)
+            with self.assertRaises(ValueError):
+                record_filter.load_filter_rules({"RECORD_FILTER_CONFIG": config_path})
+
+    def test_importer_config_should_raise_error_on_invalid_filter_rule(self):
+        with self.assertRaisesRegex(ValueError, "allowed_reference_currency_codes"):
+            runtime.ImporterConfig({"ALLOWED_REFERENCE_CURRENCY_CODES": "840,USD"})
+        with tempfile.TemporaryDirectory() as path:
+            config_path = os.path.join(path, "record_filter.json")
+            with open(config_path, "wt") as file:
+                json.dump({"allowed_rate_classes": "M"}, file)
+            with self.assertRaisesRegex(ValueError, "allowed_rate_classes"):
+                runtime.ImporterConfig({"RECORD_FILTER_CONFIG": config_path})
+            with open(config_path, "wt") as file:
+                file.write("{")
+            with self.assertRaisesRegex(ValueError, config_path):
+                runtime.ImporterConfig({"RECORD_FILTER_CONFIG": config_path})
+
+    def test_lambda_initialization_should_fail_on_invalid_configuration(self):
+        result = subprocess.run(
+            [sys.executable, "-c", "import lambda_function"],
+            capture_output=True,
+            text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            env={
+                **os.environ,
+                "AWS_LAMBDA_FUNCTION_NAME": "import-rates",
+                "ALLOWED_REFERENCE_CURRENCY_CODES": "840,USD",
+            },
+        )
+
+        self.assertNotEqual(result.returncode, 0)
+        self.assertIn("allowed_reference_currency_codes", result.stderr)
+
+    def test_record_filter_should_match_is_data_record_allowed(self):
+        with open("I_171021_T057.sw0", "rt") as file:
+            lines = [line.strip() for line in file if line.startswith("D")]
+        lines.append(
+            "D1578402MD000001134066410000001134350000000001134633590999999999999999"
+        )
+        lines.append(
+            "Dx088402MD000001134066410000001134350000000001134633590999999999999999"
+        )
+        layout = record_layouts.get_record_layouts(cc.HEADER_FORMAT_VERSION).detail
+        filter_rules = record_filter.load_filter_rules(
+            {
+                "ALLOWED_REFERENCE_CURRENCY_CODES": "840,978",
+                "ALLOWED_RATE_CLASSES": "M,F",
+            }
+        )
+        detail_record_filter = record_filter.RecordFilter(filter_rules, layout)
+        with patch_runtime_context(record_filter_rules=filter_rules):
+            for line in lines:
+                expected = lambda_function.is_data_record_allowed(
+                    buffer_parser.convert_file_line_to_detail_record(line, layout)
+                )
+                self.assertEqual(detail_record_filter.is_line_allowed(line), expected)
+                self.assertEqual(
+                    detail_record_filter.is_line_allowed(line.encode()), expected
+                )
+        self.assertLess(len(detail_record_filter.decisions), len(lines) * 2)
+
+    def test_process_file_should_not_convert_lines_rejected_by_configured_filter(self):
+        filter_rules = record_filter.load_filter_rules(
+            {"ALLOWED_REFERENCE_CURRENCY_CODES": "978", "ALLOWED_RATE_CLASSES": "M,F"}
+        )
+        with patch_runtime_context(record_filter_rules=filter_rules), mock.patch.object(
+            buffer_parser,
+            "convert_file_line_to_detail_record",
+            wraps=buffer_parser.convert_file_line_to_detail_record,
+        ) as convert_file_line_to_detail_record, open(
+            "I_171021_T057.sw0", "rt"
+        ) as file:
+            data = buffer_parser.process_file(file)
+
+        self.assertEqual(data.error, None)
+        self.assertEqual(len(data.detail_records), 22)
+        self.assertEqual(convert_file_line_to_detail_record.call_count, 22)
+        self.assertTrue(
+            all(record.reference_currency_code == 978 for record in data.detail_records)
+        )
+
+    def test_lambda_handler_should_import_s3_event_key_without_listing_bucket(self):
+        with open("I_171021_T057.sw0", "rb") as file:
+            body = file.read()
+        s3_client, stubber = create_stubbed_s3_client()
+        stubber.add_response(
+            "get_object",
+            {
+                "Body": StreamingBody(io.BytesIO(body), len(body)),
+                "ContentLength": len(body),
+            },
+            {"Bucket": "rates", "Key": "I_171021_T057.sw0"},
+        )
+        s3_session = mock.Mock()
+        s3_session.client.return_value = s3_client
+        http_session = mock.Mock()
+        http_session.post.return_value.status_code = HTTPStatus.OK
+        with stubber, patch_runtime_context(
+            s3_session=s3_session,
+            http_session=http_session,
+            run_on_aws=True,
+            s3_bucket_name="rates",
+        ):
+            result = lambda_function.lambda_handler(
+                create_s3_event("rates", "I_171021_T057.sw0"), None
+            )
+            stubber.assert_no_pending_responses()
+            last_processed_key = (
+                runtime.runtime_context.file_discovery.get_last_processed_key()
+            )
+
+        self.assertEqual(result, {"batchItemFailures": []})
+        self.assertEqual(http_session.post.call_count, 1)
+        self.assertEqual(last_processed_key, "I_171021_T057.sw0")
+
+    def test_lambda_handler_should_report_failed_sqs_messages(self):
+        with open("I_171021_T057.sw0", "rb") as file:
+            content = file.read()
+        event = {
+            "Records": [
+                {
+                    "eventSource": "aws:sqs",
+                    "messageId": message_id,
+                    "body": json.dumps(create_s3_event("rates", key)),
+                }
+                for message_id, key in (
+                    ("message-1", "I_171022_T057.sw0"),
+                    ("message-2", "I_171021_T057.sw0"),
+                    ("message-3", "I_171023_T057.sw0"),
+                    ("message-4", "rates.json"),
+                )
+            ]
+        }
+        with tempfile.TemporaryDirectory() as path, ImportRatesStandIn() as stand_in, patch_runtime_context(
+            import_rates_url=stand_in.url, s3_bucket_name="rates"
+        ), mock.patch.object(
+            cc, "CURRENCY_RATES_FILE_PATH", path + os.sep
+        ), mock.patch.object(
+            lambda_function, "import_rates"
+        ) as import_rates, mock.patch.object(
+            lambda_function,
+            "get_exchange_rates_for_import",
+            wraps=lambda_function.get_exchange_rates_for_import,
+        ) as get_exchange_rates_for_import:
+            for file_name in ("I_171021_T057.sw0", "I_171022_T057.sw0"):
+                with open(os.path.join(path, file_name), "wb") as file:
+                    file.write(content)
+            with self.assertLogs(level="ERROR"):
+                result = lambda_function.lambda_handler(event, None)
+
+        import_rates.assert_not_called()
+        self.assertEqual(
+            result, {"batchItemFailures": [{"itemIdentifier": "message-3"}]}
+        )
+        self.assertEqual(len(stand_in.requests), 2)
+        self.assertEqual(
+            [call.args[0] for call in get_exchange_rates_for_import.call_args_list],
+            ["I_171021_T057.sw0", "I_171022_T057.sw0", "I_171023_T057.sw0"],
+        )
+
+    def test_lambda_handler_should_report_sqs_message_whose_import_raises(self):
+        with open("I_171021_T057.sw0", "rb") as file:
+            content = file.read()
+        event = {
+            "Records": [
+                {
+                    "eventSource": "aws:sqs",
+                    "messageId": message_id,
+                    "body": json.dumps(create_s3_event("rates", key)),
+                }
+                for message_id, key in (
+                    ("message-1", "I_171021_T057.sw0"),
+                    ("message-2", "I_171022_T057.sw0"),
+                )
+            ]
+        }
+        response = mock.Mock(status_code=HTTPStatus.OK)
+        http_session = mock.Mock()
+        http_session.post.side_effect = [requests.ConnectionError(), response]
+        with tempfile.TemporaryDirectory() as path, patch_runtime_context(
+            http_session=http_session, s3_bucket_name="rates"
+        ), mock.patch.object(cc, "CURRENCY_RATES_FILE_PATH", path + os.sep):
+            for file_name in ("I_171021_T057.sw0", "I_171022_T057.sw0"):
+                with open(os.path.join(path, file_name), "wb") as file:
+                    file.write(content)
+            with self.assertLogs(level="ERROR"):
+                result = lambda_function.lambda_handler(event, None)
+
+        self.assertEqual(
+            result, {"batchItemFailures": [{"itemIdentifier": "message-1"}]}
+        )
+        self.assertEqual(http_session.post.call_count, 2)
+
+    def test_lambda_handler_should_discover_latest_file_on_scheduled_event(self):
+        with mock.patch.object(lambda_function, "import_rates") as import_rates:
+            result = lambda_function.lambda_handler(
+                {"source": "aws.events", "detail-type": "Scheduled Event"}, None
+            )
+        import_rates.assert_called_once_with()
+        self.assertEqual(result, None)
+
+    def test_get_event_files_should_skip_other_buckets_events_and_invalid_names(self):
+        event = create_s3_event("rates", "archive%2FI_171021_T057.sw0", size=100)
+        event["Records"] += create_s3_event("other", "I_171022_T057.sw0")["Records"]
+        event["Records"] += create_s3_event("rates", "I_171023.sw0")["Records"]
+        event["Records"] += create_s3_event(
+            "rates", "I_171024_T057.sw0", event_name="ObjectRemoved:Delete"
+        )["Records"]
+        event["Records"] += create_s3_event("rates", "archive/I_171021_T057.sw0")[
+            "Records"
+        ]
+        with patch_runtime_context(s3_bucket_name="rates"), self.assertLogs(
+            level="WARNING"
+        ):
+            event_files = lambda_function.get_event_files(event)
+        self.assertEqual(
+            event_files,
+            [
+                lambda_function.EventFile(
+                    file_discovery.DiscoveredFile(
+                        "archive/I_171021_T057.sw0", 100, "a1b2"
+                    ),
+                    None,
+                )
+            ],
+        )
+
+    def test_backfill_should_import_files_in_order_in_async_pipeline(self):
+        with open("I_171021_T057.sw0", "rt") as file:
+            content = file.read()
+        with tempfile.TemporaryDirectory() as path:
+            for date in [171019, 171020, 171021, 171022, 171025]:
+                with open(os.path.join(path, f"I_{date}_T057.sw0"), "wt") as file:
+                    file.write(content.replace("H20171021", f"H20{date}", 1))
+            with ImportRatesStandIn() as stand_in, patch_runtime_context(
+                import_rates_url=stand_in.url
+            ), mock.patch.object(cc, "CURRENCY_RATES_FILE_PATH", path + os.sep):
+                summary = lambda_function.backfill(171020, 171022, pipelined=True)
+
+        self.assertEqual(summary.files, 3)
+        self.assertEqual(summary.imported_files, 3)
+        self.assertEqual(summary.records, 450)
+        self.assertEqual(
+            [
+                json.loads(request["body"])["header"]["date"]
+                for request in stand_in.requests
+            ],
+            ["2017-10-20 14:00:19", "2017-10-21 14:00:19", "2017-10-22 14:00:19"],
+        )
+
+    def test_async_pipeline_should_import_other_files_when_file_can_not_be_read(self):
+        with open("I_171021_T057.sw0", "rt") as file:
+            content = file.read()
+        with tempfile.TemporaryDirectory() as path:
+            for date in [171020, 171022]:
+                with open(os.path.join(path, f"I_{date}_T057.sw0"), "wt") as file:
+                    file.write(content.replace("H20171021", f"H20{date}", 1))
+            with ImportRatesStandIn() as stand_in, patch_runtime_context(
+                import_rates_url=stand_in.url
+            ), mock.patch.object(cc, "CURRENCY_RATES_FILE_PATH", path + os.sep):
+                imported = lambda_function.import_files_in_pipeline(
+                    [
+                        file_discovery.DiscoveredFile(f"I_{date}_T057.sw0", None)
+                        for date in [171020, 171021, 171022]
+                    ],
+                    queue_size=1,
+                )
+
+        self.assertEqual(imported, (2, 300))
+        self.assertEqual(
+            [
+                json.loads(request["body"])["header"]["date"]
+                for request in stand_in.requests
+            ],
+            ["2017-10-20 14:00:19", "2017-10-22 14:00:19"],
+        )
+
+    def test_async_pipeline_should_store_digests_and_latest_file_serially_parsed(self):
+        with open("I_171021_T057.sw0", "rb") as file:
+            content = file.read()
+        discovered_files = [
+            file_discovery.DiscoveredFile(f"I_{date}_T057.sw0", len(content), etag)
+            for date, etag in [(171020, "etag-1"), (171021, "etag-2")]
+        ]
+        with tempfile.TemporaryDirectory() as path, ImportRatesStandIn() as stand_in, patch_runtime_context(
+            import_rates_url=stand_in.url,
+            import_rates_dedup=True,
+            parallel_parse_min_file_size=0,
+        ), mock.patch.object(
+            cc, "CURRENCY_RATES_FILE_PATH", path + os.sep
+        ), mock.patch.object(
+            lambda_function, "read_file_content", return_value=content
+        ), mock.patch.object(
+            parallel_parser, "process_file_parallel"
+        ) as process_file_parallel, mock.patch.object(
+            lambda_function, "save_latest_processed_file"
+        ) as save_latest_processed_file:
+            context = runtime.get_runtime_context()
+            # digests are kept in the local store, while the files are discovered on S3
+            imported_digests = context.imported_digests
+            context.config.run_on_aws = True
+            imported = lambda_function.import_files_in_pipeline(discovered_files)
+
+        self.assertEqual(imported, (2, 300))
+        self.assertEqual(set(imported_digests.digests), {"etag:etag-1", "etag:etag-2"})
+        save_latest_processed_file.assert_called_once_with(discovered_files)
+        process_file_parallel.assert_not_called()
+
+    def test_async_pipeline_should_continue_when_file_fails_to_parse_or_import(self):
+        with open("I_171021_T057.sw0", "rt") as file:
+            content = file.read()
+        parse_file_content = lambda_function.parse_file_content
+        import_exchange_rates = lambda_function.import_exchange_rates
+
+        def parse_or_fail(content):
+            if b"H20171020" in content:
+                raise RuntimeError("parse failed")
+            return parse_file_content(content)
+
+        def import_or_fail(data):
+            if data.header.date.startswith("2017-10-21"):
+                raise RuntimeError("import failed")
+            return import_exchange_rates(data)
+
+        with tempfile.TemporaryDirectory() as path:
+            for date in [171020, 171021, 171022]:
+                with open(os.path.join(path, f"I_{date}_T057.sw0"), "wt") as file:
+                    file.write(content.replace("H20171021", f"H20{date}", 1))
+            with ImportRatesStandIn() as stand_in, patch_runtime_context(
+                import_rates_url=stand_in.url
+            ), mock.patch.object(
+                cc, "CURRENCY_RATES_FILE_PATH", path + os.sep
+            ), mock.patch.object(
+                lambda_function, "parse_file_content", side_effect=parse_or_fail
+            ), mock.patch.object(
+                lambda_function, "import_exchange_rates", side_effect=import_or_fail
+            ), instrumentation.worker_run(
+                True
+            ) as metrics:
+                imported = lambda_function.import_files_in_pipeline(
+                    [
+                        file_discovery.DiscoveredFile(f"I_{date}_T057.sw0", None)
+                        for date in [171020, 171021, 171022]
+                    ],
+                    queue_size=1,
+                )
+
+        self.assertEqual(imported, (1, 150))
+        self.assertEqual(metrics.counts["files_failed"], 2)
+        self.assertEqual(metrics.counts["files_imported"], 1)
+        self.assertEqual(
+            [
+                json.loads(request["body"])["header"]["date"]
+                for request in stand_in.requests
+            ],
+            ["2017-10-22 14:00:19"],
+        )
+
+    def test_lambda_function_import_should_not_load_clients_at_cold_start(self):
+        result = subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                "import sys, lambda_function; print(' '.join(sys.modules))",
+            ],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        )
+
+        modules = set(result.stdout.split())
+        for module in ["boto3", "botocore", "requests", "asyncio", "multiprocessing"]:
+            self.assertNotIn(module, modules)
+
+    def test_lambda_function_import_time_should_be_within_budget(self):
+        import_times = []
+        for _ in range(3):
+            result = subprocess.run(
+                [sys.executable, "-X", "importtime", "-c", "import lambda_function"],
+                capture_output=True,
+                text=True,
+                check=True,
+                cwd=os.path.dirname(os.path.abspath(__file__)),
+            )
+            # lines are "import time: self [us] | cumulative | imported package"
+            import_times.append(
+                next(
+                    int(line.split("|")[1]) / 1000000
+                    for line in result.stderr.splitlines()
+                    if line.split("|")[-1].strip() == "lambda_function"
+                )
+            )
+
+        self.assertLess(min(import_times), IMPORT_TIME_BUDGET)
+
+    def test_generated_sample_file_should_be_valid_and_deterministic(self):
+        file_lines = benchmarks.generate_sample_file_lines(1000, seed=7)
+        data = buffer_parser.process_file(file_lines)
+
+        self.assertIsNone(data.error)
+        self.assertEqual(data.trailer.total_records, 1000)
+        self.assertTrue(0 < len(data.detail_records) < 1000)
+        self.assertEqual(
+            file_lines, benchmarks.generate_sample_file_lines(1000, seed=7)
+        )
+        self.assertNotEqual(
+            file_lines, benchmarks.generate_sample_file_lines(1000, seed=8)
+        )
+
+    def test_benchmark_suite_should_not_compare_without_baseline(self):
+        with tempfile.TemporaryDirectory() as path:
+            baseline_path = os.path.join(path, "benchmark_baseline.json")
+            with mock.patch.object(benchmarks, "run_suite") as run_suite, mock.patch(
+                "sys.stdout", new_callable=io.StringIO
+            ):
+                exit_code = benchmarks.main(["suite", "--baseline", baseline_path])
+
+            self.assertEqual(exit_code, benchmarks.NOT_COMPARED_EXIT_CODE)
+            self.assertFalse(os.path.exists(baseline_path))
+            run_suite.assert_not_called()
+
+    def test_benchmark_compare_should_use_suite_of_merge_base_as_baseline(self):
+        commands = []
+
+        def run(command, **kwargs):
+            commands.append(command)
+            if command[:2] == ["git", "merge-base"]:
+                return subprocess.CompletedProcess(command, 0, "0123456789abcdef\n")
+            if command[:2] == ["git", "rev-parse"]:
+                return subprocess.CompletedProcess(command, 0, "python/\n")
+            if "suite" in command:
+                baseline_path = command[command.index("--baseline") + 1]
+                with open(baseline_path, mode="wt") as file:
+                    json.dump(
+                        {
+                            "records": 100,
+                            "seed": 0,
+                            "process_buffer": {"records_per_second": 1000},
+                        },
+                        file,
+                    )
+            return subprocess.CompletedProcess(command, 0, "")
+
+        with mock.patch.object(
+            benchmarks.subprocess, "run", side_effect=run
+        ), mock.patch.object(
+            benchmarks,
+            "run_suite",
+            return_value={"process_buffer": {"records_per_second": 700}},
+        ), mock.patch(
+            "sys.stdout", new_callable=io.StringIO
+        ):
+            exit_code = benchmarks.main(["compare", "master", "--records", "100"])
+
+        self.assertEqual(exit_code, 1)
+        self.assertEqual(commands[0], ["git", "merge-base", "HEAD", "master"])
+        worktree = commands[2][-2]
+        self.assertEqual(
+            commands[2],
+            ["git", "worktree", "add", "--detach", worktree, "0123456789abcdef"],
+        )
+        self.assertEqual(
+            commands[3][1], os.path.join(worktree, "python/", "benchmarks.py")
+        )
+        self.assertEqual(
+            commands[4], ["git", "worktree", "remove", "--force", worktree]
+        )
+
+    def test_benchmark_regressions_should_be_found_below_baseline_tolerance(self):
+        baseline = {
+            "process_buffer": {"records_per_second": 1000},
+            "post": {"records_per_second": 1000},
+        }
+        results = {
+            "process_buffer": {"records_per_second": 850},
+            "post": {"records_per_second": 750},
+            "json_encoding": {"records_per_second": 10},
+        }
+
+        regressions = benchmarks.find_regressions(results, baseline, tolerance=0.2)
+
+        self.assertEqual(len(regressions), 1)
+        self.assertTrue(regressions[0].startswith("post:"))
+
+    def test_instrumented_run_should_write_metrics_summary_to_stdout(self):
+        with tempfile.TemporaryDirectory() as path:
+            with open("I_171021_T057.sw0", "rb") as source, open(
+                os.path.join(path, "I_171021_T057.sw0"), "wb"
+            ) as target:
+                target.write(source.read())
+            with ImportRatesStandIn(
+                status_codes=[HTTPStatus.SERVICE_UNAVAILABLE]
+            ) as stand_in, patch_runtime_context(
+                import_rates_url=stand_in.url,
+                import_rates_backoff_base=0,
+                import_metrics=True,
+            ), mock.patch.object(
+                cc, "CURRENCY_RATES_FILE_PATH", path + os.sep
+            ), mock.patch(
+                "sys.stdout", new_callable=io.StringIO
+            ) as stdout:
+                with instrumentation.instrumented_run(
+                    runtime.get_runtime_context().config, "import_rates"
+                ) as metrics:
+                    self.assertIs(instrumentation.get_run_metrics(), metrics)
+                    lambda_function.import_rates()
+
+        self.assertIs(
+            instrumentation.get_run_metrics(), instrumentation.DISABLED_RUN_METRICS
+        )
+        lines = stdout.getvalue().splitlines()
+        self.assertEqual(len(lines), 1)
+        summary = json.loads(lines[0])
+        self.assertEqual(summary["Operation"], "import_rates")
+        for stage in ["discovery", "parse", "serialization", "post", "run"]:
+            self.assertGreater(summary[f"{stage}_duration"], 0)
+        self.assertEqual(summary["download_bytes"], 28224)
+        self.assertEqual(summary["records_read"], 222)
+        self.assertEqual(summary["records_accepted"], 150)
+        self.assertEqual(
+            sum(
+                value
+                for name, value in summary.items()
+                if name.startswith("records_rejected_")
+            ),
+            72,
+        )
+        self.assertEqual(summary["api_retries"], 1)
+        self.assertEqual(summary["files_imported"], 1)
+        self.assertGreater(summary["post_bytes"], 0)
+        definitions = summary["_aws"]["CloudWatchMetrics"][0]
+        self.assertEqual(definitions["Namespace"], cc.IMPORT_METRICS_NAMESPACE)
+        units = {metric["Name"]: metric["Unit"] for metric in definitions["Metrics"]}
+        self.assertEqual(units["parse_duration"], "Milliseconds")
+        self.assertEqual(units["download_bytes"], "Bytes")
+        self.assertEqual(units["records_read"], "Count")
+
+    def test_instrumented_run_should_write_nothing_when_disabled(self):
+        with patch_runtime_context(), mock.patch(
+            "sys.stdout", new_callable=io.StringIO
+        ) as stdout:
+            with instrumentation.instrumented_run(
+                runtime.get_runtime_context().config, "import_rates"
+            ) as metrics:
+                with metrics.stage("parse"):
+                    metrics.count("records_read")
+
+        self.assertIs(metrics, instrumentation.DISABLED_RUN_METRICS)
+        self.assertEqual(stdout.getvalue(), "")
+
+    def test_instrumented_run_should_count_peak_memory_when_traced(self):
+        with patch_runtime_context(
+            import_metrics=True, import_profile="tracemalloc"
+        ), mock.patch("sys.stdout", new_callable=io.StringIO) as stdout:
+            with instrumentation.instrumented_run(
+                runtime.get_runtime_context().config, "import_rates"
+            ):
+                with open("I_171021_T057.sw0", "rt") as file:
+                    buffer_parser.process_file(file)
+
+        self.assertGreater(json.loads(stdout.getvalue())["peak_traced_memory_bytes"], 0)
+
+    def test_importer_config_should_reject_unknown_profiler(self):
+        with self.assertRaises(ValueError):
+            runtime.ImporterConfig({"IMPORT_PROFILE": "perf"})
+
+    def test_importer_config_should_reject_invalid_metrics_namespace(self):
+        for namespace in ("", " ", "x" * 256):
+            with self.assertRaisesRegex(ValueError, "IMPORT_METRICS_NAMESPACE"):
+                runtime.ImporterConfig({"IMPORT_METRICS_NAMESPACE": namespace})
 
 
 if __name__ == "__main__":